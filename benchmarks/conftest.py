@@ -0,0 +1,226 @@
+# shared setup for the loop benchmarks.
+#
+#     pytest benchmarks                       # just run them
+#     pytest benchmarks --check-baselines     # fail if anything got slower than baselines.json
+#     pytest benchmarks --update-baselines    # record the current numbers as the new baselines
+#
+# everything runs in wpilib simulation with the clock paused, so no robot is
+# needed. baselines are per machine, so they're only compared against when
+# asked: update them on the machine you compare on first.
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+import pytest
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+
+import hal.simulation  # noqa: E402
+from photonlibpy.targeting import (  # noqa: E402
+    MultiTargetPNPResult,
+    PhotonPipelineMetadata,
+    PhotonPipelineResult,
+    PhotonTrackedTarget,
+    PnpResult,
+)
+from wpilib.simulation import DriverStationSim  # noqa: E402
+from wpimath.geometry import Rotation3d, Transform3d, Translation3d  # noqa: E402
+
+from constants import AprilTagConstants  # noqa: E402
+
+BASELINES = Path(__file__).resolve().parent / "baselines.json"
+
+# calls made while counting allocations, separate from the timed runs
+ALLOCATION_CALLS = 200
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--check-baselines",
+        action="store_true",
+        help="fail benchmarks that got slower or allocate more than benchmarks/baselines.json says",
+    )
+    parser.addoption(
+        "--update-baselines",
+        action="store_true",
+        help="write this run's numbers to benchmarks/baselines.json",
+    )
+    parser.addoption(
+        "--baseline-tolerance",
+        type=float,
+        default=0.5,
+        help="how much slower than its baseline (as a fraction) a benchmark may get",
+    )
+    parser.addoption(
+        "--baseline-slack-us",
+        type=float,
+        default=5.0,
+        help="extra microseconds allowed on top of the tolerance, for the tiniest calls",
+    )
+
+
+class Baselines:
+    def __init__(self, check: bool, update: bool, tolerance: float, slack_us: float):
+        self.check_enabled = check
+        self.update = update
+        self.tolerance = tolerance
+        self.slack_us = slack_us
+        self.values: dict[str, dict[str, float]] = (
+            json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+        )
+
+    def check(self, name: str, median_us: float, peak_bytes: float) -> None:
+        if self.update:
+            self.values[name] = {
+                "median_us": round(median_us, 3),
+                "peak_bytes": round(peak_bytes),
+            }
+            return
+
+        if not self.check_enabled or (baseline := self.values.get(name)) is None:
+            return
+
+        # calls that only take a few microseconds jitter by more than the tolerance
+        limit = baseline["median_us"] * (1 + self.tolerance) + self.slack_us
+        assert median_us <= limit, (
+            f"{name} took {median_us:.1f}us per call, "
+            f"baseline is {baseline['median_us']:.1f}us (limit {limit:.1f}us)"
+        )
+        # a few bytes either way is just noise from the interpreter
+        byte_limit = baseline["peak_bytes"] * (1 + self.tolerance) + 256
+        assert peak_bytes <= byte_limit, (
+            f"{name} allocated up to {peak_bytes:.0f} bytes per call, "
+            f"baseline is {baseline['peak_bytes']:.0f} bytes"
+        )
+
+    def save(self) -> None:
+        BASELINES.write_text(json.dumps(self.values, indent=2, sort_keys=True) + "\n")
+
+
+@pytest.fixture(scope="session")
+def baselines(request: pytest.FixtureRequest):
+    baselines = Baselines(
+        request.config.getoption("--check-baselines"),
+        request.config.getoption("--update-baselines"),
+        request.config.getoption("--baseline-tolerance"),
+        request.config.getoption("--baseline-slack-us"),
+    )
+    yield baselines
+    if baselines.update:
+        baselines.save()
+
+
+def peak_bytes_per_call(function: Callable[[], Any]) -> float:
+    """
+    the most memory one call has allocated at once, on average. includes
+    temporaries that get freed before it returns.
+    """
+    # warm up caches and lazy imports first
+    function()
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(ALLOCATION_CALLS):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            function()
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return total / ALLOCATION_CALLS
+
+
+@pytest.fixture
+def measure(benchmark, baselines: Baselines, request: pytest.FixtureRequest):
+    """
+    benchmark `function`, report its allocations, and compare both against the baseline.
+    """
+
+    def run(function: Callable[[], Any]) -> Any:
+        result = benchmark(function)
+        if benchmark.disabled:
+            return result
+
+        peak = peak_bytes_per_call(function)
+        benchmark.extra_info["peak_bytes"] = round(peak)
+        baselines.check(request.node.name, benchmark.stats.stats.median * 1e6, peak)
+        return result
+
+    return run
+
+
+@pytest.fixture(scope="session", autouse=True)
+def simulation():
+    # nothing should see real time, benchmarks step the clock themselves.
+    # commands only run while enabled
+    hal.simulation.pauseTiming()
+    DriverStationSim.setEnabled(True)
+    DriverStationSim.notifyNewData()
+
+
+@pytest.fixture(scope="session")
+def robot():
+    import robot as robot_module
+
+    instance = robot_module.Robot()
+    # keep benchmark runs off the disk
+    instance.logger.enabled = False
+    return instance
+
+
+@pytest.fixture(scope="session")
+def core(robot):
+    return robot.core
+
+
+def synthetic_result(
+    tag_count: int, multitag: bool = True, timestamp_us: int = 1_000_000
+) -> PhotonPipelineResult:
+    """
+    a frame with `tag_count` hub tags spread across the image.
+
+    with `multitag` it also carries a coprocessor multi-tag solve, otherwise
+    the estimator has to fall back to single tags.
+    """
+    tag_ids = (AprilTagConstants.RED_HUB_TAGS + AprilTagConstants.BLUE_HUB_TAGS) * 2
+    targets = [
+        PhotonTrackedTarget(
+            yaw=-20.0 + 40.0 * index / max(1, tag_count - 1),
+            pitch=5.0 + index % 3,
+            area=1.0,
+            fiducialId=tag_ids[index % len(tag_ids)],
+            bestCameraToTarget=Transform3d(
+                Translation3d(3.0, 0.1 * index, 0.5), Rotation3d()
+            ),
+            altCameraToTarget=Transform3d(
+                Translation3d(3.0, -0.1 * index, 0.5), Rotation3d()
+            ),
+            poseAmbiguity=0.05 + 0.01 * index,
+        )
+        for index in range(tag_count)
+    ]
+
+    multitag_result = None
+    if multitag and tag_count > 1:
+        multitag_result = MultiTargetPNPResult(
+            estimatedPose=PnpResult(
+                best=Transform3d(Translation3d(4.0, 2.0, 0.0), Rotation3d()),
+                ambiguity=0.0,
+            ),
+            fiducialIDsUsed=[target.fiducialId for target in targets],
+        )
+
+    result = PhotonPipelineResult(
+        metadata=PhotonPipelineMetadata(
+            captureTimestampMicros=timestamp_us - 20_000,
+            publishTimestampMicros=timestamp_us,
+            sequenceID=1,
+        ),
+        targets=targets,
+        multitagResult=multitag_result,
+    )
+    result.ntReceiveTimestampMicros = timestamp_us
+    return result
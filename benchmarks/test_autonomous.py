@@ -0,0 +1,14 @@
+from array import array
+
+from src.trajectory import COLUMNS
+
+
+def test_sample_trajectory(core, measure):
+    trajectory = core.trajectories["leave_and_turn"]
+    out = array("d", bytes(8 * COLUMNS))
+    measure(lambda: trajectory.sample_into(1.234, out))
+
+
+def test_follower_calculate(core, measure):
+    trajectory = core.trajectories["leave_and_turn"]
+    measure(lambda: core.follower.calculate(core.pose, trajectory, 1.234))
@@ -0,0 +1,24 @@
+import hal.simulation
+import pytest
+
+from conftest import synthetic_result
+
+
+@pytest.mark.parametrize("target_count", [0, 1, 4, 16])
+def test_turret_auto_aim(core, measure, monkeypatch, target_count):
+    camera = core.vision.cameras[0]
+    monkeypatch.setattr(camera, "results", [synthetic_result(target_count)])
+    measure(core.turret_auto_aim)
+
+
+def test_robot_cycle(robot, measure):
+    def cycle():
+        hal.simulation.stepTimingAsync(20_000)
+        # reads sensors, runs the core and the command scheduler
+        robot.robotPeriodic()
+
+    measure(cycle)
+
+
+def test_driver_input_update(core, measure):
+    measure(core.driver.update)
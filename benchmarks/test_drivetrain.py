@@ -0,0 +1,23 @@
+from wpimath.kinematics import ChassisSpeeds
+
+
+def test_get_wheel_positions(core, measure):
+    measure(core.drivetrain.encoders.get_wheel_positions)
+
+
+def test_drive(core, measure):
+    measure(lambda: core.drivetrain.drive(0.5, -0.25, 0.1))
+
+
+def test_drive_relative(core, measure):
+    speeds = ChassisSpeeds(1.0, 0.5, 0.3)
+    measure(lambda: core.drivetrain.drive_relative(speeds))
+
+
+def test_drive_velocity(core, measure):
+    drivetrain = core.drivetrain
+    drivetrain.velocity_control = True
+    try:
+        measure(lambda: drivetrain.drive(0.5, -0.25, 0.1))
+    finally:
+        drivetrain.velocity_control = False
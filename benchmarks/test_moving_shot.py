@@ -0,0 +1,20 @@
+from array import array
+
+from wpimath.geometry import Pose2d, Rotation2d
+
+from config import config, script_path
+from src.moving_shot import MovingShot, generate, is_current
+
+
+def grid() -> MovingShot:
+    data = script_path.joinpath("moving_shot.grid").read_bytes()
+    if not is_current(data, config.moving_shot, config.shooter.table):
+        data = generate(config.moving_shot, config.shooter.table)
+    return MovingShot(data)
+
+
+def test_moving_shot_update(measure):
+    shot = grid()
+    pose = Pose2d(3.2, 2.5, Rotation2d(0.4))
+    velocity = array("d", (1.3, -0.7, 0.2))
+    measure(lambda: shot.update(pose, velocity, (4.6, 4.0)))
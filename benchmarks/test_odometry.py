@@ -0,0 +1,64 @@
+import hal.simulation
+import pytest
+from wpilib import Timer
+from wpimath.geometry import Pose2d, Rotation2d
+from wpimath.kinematics import MecanumDriveWheelPositions
+
+from config import OdometryConfig
+from src.subsystems.odometry import Odometry
+from src.subsystems.odometry_sampler import OdometrySampler
+from src.subsystems.vision import PhotonPoseEstimation
+
+
+@pytest.mark.parametrize("estimate_count", [0, 1, 4])
+def test_update_odometry(measure, estimate_count):
+    odometry = Odometry(0.0)
+    positions = MecanumDriveWheelPositions()
+    angle = 0.0
+
+    def update():
+        nonlocal angle
+        # every call is a new 20 ms cycle, so the history keeps filling up
+        hal.simulation.stepTimingAsync(20_000)
+        positions.frontLeft += 0.01
+        positions.frontRight += 0.01
+        positions.rearLeft += 0.01
+        positions.rearRight += 0.01
+        angle += 0.1
+
+        # frames from a little while ago, like the camera's latency
+        captured = Timer.getFPGATimestamp() - 0.05
+        estimates = [
+            PhotonPoseEstimation(
+                Pose2d(1.0, 2.0, Rotation2d(0.1)), captured, (0.2, 0.2, 0.4)
+            )
+            for _ in range(estimate_count)
+        ]
+        odometry.update_odometry(positions, angle, estimates)
+
+    measure(update)
+
+
+def test_update_from_samples(core, measure):
+    odometry = Odometry(0.0)
+    encoders = core.drivetrain.encoders
+    sampler = OdometrySampler(
+        OdometryConfig(threaded=True, frequency=200.0),
+        (
+            encoders.front_left_encoder,
+            encoders.front_right_encoder,
+            encoders.rear_left_encoder,
+            encoders.rear_right_encoder,
+        ),
+        core.gyro,
+    )
+
+    def update():
+        # a 20 ms cycle's worth of samples at 200 Hz, taken by hand instead of
+        # on the notifier so the timing is repeatable
+        for _ in range(4):
+            hal.simulation.stepTimingAsync(5_000)
+            sampler._sample()
+        odometry.update_from_samples(sampler)
+
+    measure(update)
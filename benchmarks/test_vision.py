@@ -0,0 +1,19 @@
+import pytest
+
+from conftest import synthetic_result
+
+
+@pytest.mark.parametrize("multitag", [True, False], ids=["multitag", "single"])
+@pytest.mark.parametrize("tag_count", [2, 8])
+def test_estimate_position(core, measure, monkeypatch, tag_count, multitag):
+    vision = core.vision
+    monkeypatch.setattr(vision, "threaded", False)
+    frames = [synthetic_result(tag_count, multitag)]
+    camera = vision.cameras[0].camera
+    monkeypatch.setattr(camera, "getAllUnreadResults", lambda: list(frames))
+
+    def estimate():
+        vision.update()
+        return vision.estimate_position()
+
+    assert measure(estimate) is not None
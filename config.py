@@ -1,82 +1,374 @@
 # define objects that represent configured constants
-# dataclasses keep this typed without an extra runtime dependency
-import os
-from dataclasses import dataclass
+# `config.toml` is decoded straight into these structs, which checks every type and
+# range in the same pass. every field has a default, so a bad or missing key gets
+# reported and replaced instead of keeping the robot from booting
+import re
 import tomllib
-from typing import Any, Mapping
 from pathlib import Path
+from typing import Annotated, Any, Literal, get_args, get_origin
 
-# we're freezing dataclasses to improve performance
+import msgspec
+from wpilib import reportWarning
+
+# we're freezing structs to improve performance
 # at the cost of mutability (the ability to edit)
-# which we don't need anyway
+# which we don't need anyway. live tuning changes the controllers, not the config
+
+# CAN ids a SparkMax can be given
+CanId = Annotated[int, msgspec.Meta(ge=1, le=62)]
+Port = Annotated[int, msgspec.Meta(ge=0)]
+PositiveInt = Annotated[int, msgspec.Meta(gt=0)]
+PositiveFloat = Annotated[float, msgspec.Meta(gt=0)]
+Gain = Annotated[float, msgspec.Meta(ge=0)]
+
+
+class PIDConfig(msgspec.Struct, frozen=True):
+    kP: Gain = msgspec.field(default=0.0, name="P")
+    kI: Gain = msgspec.field(default=0.0, name="I")
+    kD: Gain = msgspec.field(default=0.0, name="D")
+
+
+class PIDMotorConfig(msgspec.Struct, frozen=True):
+    port: CanId
+    pid: PIDConfig = msgspec.field(default_factory=PIDConfig)
+    # a second motor on the same mechanism that mirrors this one
+    follower_port: CanId | None = None
+    follower_inverted: bool = False
+
+
+class MotorConfig(msgspec.Struct, frozen=True):
+    front_right_port: CanId = 1
+    front_left_port: CanId = 2
+
+    rear_right_port: CanId = 3
+    rear_left_port: CanId = 4
+
+    shooter: PIDMotorConfig = msgspec.field(
+        default_factory=lambda: PIDMotorConfig(6, PIDConfig(0.0002))
+    )
+
+    turret: PIDMotorConfig = msgspec.field(
+        default_factory=lambda: PIDMotorConfig(7, PIDConfig(0.05))
+    )
+    intake: PIDMotorConfig = msgspec.field(
+        default_factory=lambda: PIDMotorConfig(8, PIDConfig(0.05), follower_port=10)
+    )
+
+
+class SparkConfig(msgspec.Struct, frozen=True):
+    idle_mode: Literal["brake", "coast"] = "brake"
+    current_limit: Annotated[int, msgspec.Meta(gt=0, le=80)] = 40  # in amps
+    # status frame periods, in milliseconds
+    status_period_ms: PositiveInt = 20
+    encoder_period_ms: PositiveInt = 20
+    faults_period_ms: PositiveInt = 250
+
+
+class SparksConfig(msgspec.Struct, frozen=True):
+    persist: bool = True
+
+    drive: SparkConfig = msgspec.field(default_factory=SparkConfig)
+    shooter: SparkConfig = msgspec.field(default_factory=SparkConfig)
+    turret: SparkConfig = msgspec.field(default_factory=SparkConfig)
+    intake: SparkConfig = msgspec.field(default_factory=SparkConfig)
+    follower: SparkConfig = msgspec.field(default_factory=SparkConfig)
+
+
+class CameraConfig(msgspec.Struct, frozen=True):
+    name: str = "main"
+    # where the camera is on the robot. meters from the center of the robot on the
+    # floor (+x forward, +y left, +z up), and degrees
+    x: float = 0.0
+    y: float = 0.0
+    z: float = 0.0
+    roll: float = 0.0
+    pitch: float = 0.0
+    yaw: float = 0.0
+
+
+# x and y in meters, heading in radians
+StdDevs = tuple[PositiveFloat, PositiveFloat, PositiveFloat]
+
+
+class PhotonVisionConfig(msgspec.Struct, frozen=True):
+    # the first camera is the one the turret aims with
+    cameras: list[CameraConfig] = msgspec.field(
+        default_factory=lambda: [CameraConfig()]
+    )
+    threaded: bool = False
+    queue_size: PositiveInt = 16
+    poll_period: PositiveFloat = 0.005
+
+    # how much to trust an estimate from tags right in front of the camera
+    single_tag_std_devs: StdDevs = (0.5, 0.5, 1.0)
+    multi_tag_std_devs: StdDevs = (0.15, 0.15, 0.3)
+    # trust falls off with the square of the average tag distance, doubling at
+    # sqrt(distance_scale) meters
+    distance_scale: PositiveFloat = 30.0
+    # single tags further away than this (meters) are too noisy to use at all
+    single_tag_max_distance: PositiveFloat = 4.0
+
+
+class DriverConfig(msgspec.Struct, frozen=True):
+    # stick movement smaller than this is ignored
+    deadband: Annotated[float, msgspec.Meta(ge=0, lt=1)] = 0.02
+    # drive sticks are raised to this power (keeping their sign). 1 is linear
+    exponent: Annotated[float, msgspec.Meta(ge=1)] = 2.0
+    # points in the precomputed curve
+    curve_points: Annotated[int, msgspec.Meta(ge=2)] = 65
+    # how fast (in full sticks per second) the drive inputs may change. 0 doesn't limit
+    slew_rate: Annotated[float, msgspec.Meta(ge=0)] = 0.0
+    # the right stick has to move further than this to turn the turret by hand
+    turret_deadband: Annotated[float, msgspec.Meta(ge=0, lt=1)] = 0.1
+
+
+class DrivetrainConfig(msgspec.Struct, frozen=True):
+    field_relative: bool = False
+    # hold wheel speeds with the sparks' onboard pid instead of sending duty cycles
+    velocity_control: bool = False
+    # duty cycle per rpm of wheel speed error
+    velocity_pid: PIDConfig = msgspec.field(default_factory=lambda: PIDConfig(0.0002))
+    # feedforward, in volts and volts per m/s
+    kS: Gain = 0.1
+    kV: Gain = 1.34
+
+
+class TurretConfig(msgspec.Struct, frozen=True):
+    # follow a trapezoidal profile to each angle, instead of jumping at it
+    motion_profile: bool = True
+    max_velocity: PositiveFloat = 360.0  # degrees per second
+    max_acceleration: PositiveFloat = 1440.0  # degrees per second squared
+    # how close counts as on target, in degrees and degrees per second
+    tolerance: PositiveFloat = 1.5
+    velocity_tolerance: PositiveFloat = 10.0
+
+
+class ShooterConfig(msgspec.Struct, frozen=True):
+    # hold flywheel rpm with the spark's velocity pid, instead of a fixed duty cycle
+    velocity_control: bool = False
+    # feedforward, in volts and volts per rpm
+    kS: Gain = 0.1
+    kV: Gain = 0.0021
+    # how close to the setpoint (in rpm) counts as at speed
+    tolerance: PositiveFloat = 100.0
+    # [distance to the hub in meters, flywheel rpm], measured on the practice field
+    table: Annotated[
+        list[tuple[Annotated[float, msgspec.Meta(ge=0)], PositiveFloat]],
+        msgspec.Meta(min_length=1),
+    ] = msgspec.field(
+        default_factory=lambda: [
+            (1.5, 2500.0),
+            (3.0, 3200.0),
+            (4.5, 3900.0),
+            (6.0, 4600.0),
+        ]
+    )
+
+
+class MovingShotConfig(msgspec.Struct, frozen=True):
+    # lead the turret and adjust the flywheel for the robot's motion
+    enabled: bool = False
+    # the grid covers these distances to the hub (meters), and robot speeds
+    # towards/away from and across the hub (m/s) from -max_speed to max_speed
+    min_distance: PositiveFloat = 1.0
+    max_distance: PositiveFloat = 7.0
+    distance_step: PositiveFloat = 0.25
+    max_speed: PositiveFloat = 4.0
+    speed_step: PositiveFloat = 0.5
+    # fixed point iterations when solving each cell
+    iterations: PositiveInt = 8
+    # [distance to the hub in meters, seconds the ball is in the air]
+    time_of_flight: Annotated[
+        list[tuple[Annotated[float, msgspec.Meta(ge=0)], PositiveFloat]],
+        msgspec.Meta(min_length=1),
+    ] = msgspec.field(
+        default_factory=lambda: [(1.5, 0.6), (3.0, 0.8), (4.5, 1.0), (6.0, 1.2)]
+    )
+
+
+class OdometryConfig(msgspec.Struct, frozen=True):
+    # sample the drive encoders and gyro on their own thread, faster than the loop
+    threaded: bool = False
+    frequency: Annotated[float, msgspec.Meta(gt=0, le=1000)] = 200.0  # in Hz
+    # samples held until the loop picks them up
+    buffer_size: Annotated[int, msgspec.Meta(ge=8)] = 64
+
+
+class TargetingConfig(msgspec.Struct, frozen=True):
+    switch_margin: Annotated[float, msgspec.Meta(gt=0, le=1)] = 0.7
+    # how long (in seconds) a correction from a tag is kept after it was seen
+    correction_timeout: PositiveFloat = 0.5
+
+
+class RateConfig(msgspec.Struct, frozen=True):
+    hz: PositiveFloat
+    # how long (in milliseconds) one run is allowed before it counts as an overrun
+    budget_ms: PositiveFloat
+
+
+class RatesConfig(msgspec.Struct, frozen=True):
+    # run vision and telemetry at their own rates instead of every loop
+    multi_rate: bool = False
+    # the main loop: sensors, odometry, commands and logging
+    control: RateConfig = msgspec.field(default_factory=lambda: RateConfig(100.0, 6.0))
+    vision: RateConfig = msgspec.field(default_factory=lambda: RateConfig(30.0, 3.0))
+    telemetry: RateConfig = msgspec.field(default_factory=lambda: RateConfig(10.0, 2.0))
+
+
+class ProfilerConfig(msgspec.Struct, frozen=True):
+    enabled: bool = True
+    sample_count: PositiveInt = 256
+    publish_interval: PositiveFloat = 1.0
+    channel_budget_ms: PositiveFloat = 5.0
+
+
+class GCConfig(msgspec.Struct, frozen=True):
+    # freeze the startup heap and only collect when the loop has time for it
+    managed: bool = False
+    # while enabled, only collect if this much (ms) of the loop is left
+    spare_ms: PositiveFloat = 8.0
+    # a collection pause longer than this counts as an overrun
+    pause_budget_ms: PositiveFloat = 1.0
+
+
+class TelemetryConfig(msgspec.Struct, frozen=True):
+    competition: bool = False
+
+
+class LoggerConfig(msgspec.Struct, frozen=True):
+    enabled: bool = True
+    directory: str = "/U/logs"
+    sim_directory: str = "logs"
+    vision_packets: bool = True
+    batch_size: PositiveInt = 50
+    queue_size: PositiveInt = 32
+    max_file_bytes: PositiveInt = 16_000_000
+    max_files: PositiveInt = 50
+
 
+class TuningConfig(msgspec.Struct, frozen=True):
+    enabled: bool = False
 
-@dataclass(frozen=True)
-class PIDConfig:
-    kP: float
-    kI: float
-    kD: float
 
+class AutonomousConfig(msgspec.Struct, frozen=True):
+    # the name of a trajectory in `trajectories/`, empty to do nothing
+    routine: str = "leave_start"
+    # start odometry at the trajectory's first pose
+    reset_pose: bool = True
+    # how hard the follower corrects drift, (m/s)/m and (rad/s)/rad
+    translation_kP: Gain = 1.0
+    rotation_kP: Gain = 1.0
 
-@dataclass(frozen=True)
-class PIDMotorConfig:
-    port: int
-    pid: PIDConfig
 
+class ConfigFile(msgspec.Struct, frozen=True):
+    controller_port: Port = 0
+    gyro_port: Port = 0
+    history_size: PositiveInt = 100
+    driver: DriverConfig = msgspec.field(default_factory=DriverConfig)
 
-@dataclass(frozen=True)
-class MotorConfig:
-    front_right_port: int
-    front_left_port: int
+    motors: MotorConfig = msgspec.field(default_factory=MotorConfig)
+    sparks: SparksConfig = msgspec.field(default_factory=SparksConfig)
+    drivetrain: DrivetrainConfig = msgspec.field(default_factory=DrivetrainConfig)
+    turret: TurretConfig = msgspec.field(default_factory=TurretConfig)
+    shooter: ShooterConfig = msgspec.field(default_factory=ShooterConfig)
+    moving_shot: MovingShotConfig = msgspec.field(default_factory=MovingShotConfig)
+    odometry: OdometryConfig = msgspec.field(default_factory=OdometryConfig)
+    vision: PhotonVisionConfig = msgspec.field(default_factory=PhotonVisionConfig)
+    targeting: TargetingConfig = msgspec.field(default_factory=TargetingConfig)
+    rates: RatesConfig = msgspec.field(default_factory=RatesConfig)
+    profiler: ProfilerConfig = msgspec.field(default_factory=ProfilerConfig)
+    gc: GCConfig = msgspec.field(default_factory=GCConfig)
+    telemetry: TelemetryConfig = msgspec.field(default_factory=TelemetryConfig)
+    logger: LoggerConfig = msgspec.field(default_factory=LoggerConfig)
+    tuning: TuningConfig = msgspec.field(default_factory=TuningConfig)
+    autonomous: AutonomousConfig = msgspec.field(default_factory=AutonomousConfig)
 
-    rear_right_port: int
-    rear_left_port: int
 
-    shooter: PIDMotorConfig
+def _is_struct(field_type: Any) -> bool:
+    return isinstance(field_type, type) and issubclass(field_type, msgspec.Struct)
 
-    turret: PIDMotorConfig
-    intake: PIDMotorConfig
 
+def _unknown_keys(data: dict[str, Any], struct: type, path: str = "$") -> list[str]:
+    """
+    every key in `data` that `struct` doesn't have a field for. these are usually typos.
+    """
+    fields = {field.encode_name: field for field in msgspec.structs.fields(struct)}
+    unknown = []
+    for key, value in data.items():
+        if (field := fields.get(key)) is None:
+            unknown.append(f"{path}.{key}")
+            continue
+        # look inside nested tables too. `| None` fields are never tables here
+        if _is_struct(field.type):
+            if isinstance(value, dict):
+                unknown.extend(_unknown_keys(value, field.type, f"{path}.{key}"))
+        # and arrays of tables, like the cameras
+        elif get_origin(field.type) is list and _is_struct(
+            item_type := get_args(field.type)[0]
+        ):
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    if isinstance(item, dict):
+                        unknown.extend(
+                            _unknown_keys(item, item_type, f"{path}.{key}[{index}]")
+                        )
+    return unknown
 
-@dataclass(frozen=True)
-class PhotonVisionConfig:
-    camera_name: str
 
+def _remove_at(data: dict[str, Any], error: msgspec.ValidationError) -> bool:
+    """
+    remove the value a validation error points at, so its default gets used.
 
-@dataclass(frozen=True)
-class ConfigFile:
-    controller_port: int
-    gyro_port: int
+    returns `False` if the error doesn't point at anything that can be removed.
+    """
+    if (match := re.search(r"at `\$((?:\.\w+|\[\d+\])+)", str(error))) is None:
+        return False
+    # keys of tables and indices of arrays, like `.vision.cameras[1].x`
+    *parents, last = (
+        key if index == "" else int(index)
+        for key, index in re.findall(r"\.(\w+)|\[(\d+)\]", match.group(1))
+    )
+    container: Any = data
+    for parent in parents:
+        try:
+            container = container[parent]
+        except (KeyError, IndexError, TypeError):
+            return False
 
-    motors: MotorConfig
-    vision: PhotonVisionConfig
+    if isinstance(container, dict) and isinstance(last, str):
+        return container.pop(last, None) is not None
+    if isinstance(container, list) and isinstance(last, int) and last < len(container):
+        container.pop(last)
+        return True
+    return False
 
 
-def _build_pid_config(data: Mapping[str, Any]) -> PIDConfig:
-    return PIDConfig(kP=data["P"], kI=data["I"], kD=data["D"])
+def load_config(path: Path) -> ConfigFile:
+    """
+    decode and validate a config file. never raises: anything wrong gets reported
+    and replaced with its default.
+    """
+    try:
+        with open(path, "rb") as config_file:
+            raw_config = tomllib.load(config_file)
+    except (OSError, tomllib.TOMLDecodeError) as error:
+        reportWarning(
+            f"couldn't read {path.name}, using the defaults for everything: {error}"
+        )
+        return ConfigFile()
 
+    for key in _unknown_keys(raw_config, ConfigFile):
+        reportWarning(f"{path.name}: ignoring unknown key {key}")
 
-def _build_pid_motor_config(data: Mapping[str, Any]) -> PIDMotorConfig:
-    return PIDMotorConfig(port=data["port"], pid=_build_pid_config(data["pid"]))
+    while True:
+        try:
+            return msgspec.convert(raw_config, ConfigFile)
+        except msgspec.ValidationError as error:
+            reportWarning(f"{path.name}: {error}, using the default instead")
+            if not _remove_at(raw_config, error):
+                return ConfigFile()
 
 
 # be aware of the current working directory
 script_path = Path(__file__).resolve().parent
-with open(script_path.joinpath("config.toml"), "rb") as config_file:
-    raw_config = tomllib.load(config_file)
-
-motors = raw_config["motors"]
-config = ConfigFile(
-    controller_port=raw_config["controller_port"],
-    gyro_port=raw_config["gyro_port"],
-    motors=MotorConfig(
-        front_right_port=motors["front_right_port"],
-        front_left_port=motors["front_left_port"],
-        rear_right_port=motors["rear_right_port"],
-        rear_left_port=motors["rear_left_port"],
-        shooter=_build_pid_motor_config(motors["shooter"]),
-        turret=_build_pid_motor_config(motors["turret"]),
-        intake=_build_pid_motor_config(motors["intake"]),
-    ),
-    vision=PhotonVisionConfig(camera_name=raw_config["vision"]["camera_name"]),
-)
+config = load_config(script_path.joinpath("config.toml"))
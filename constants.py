@@ -1,66 +1,106 @@
-from math import pi, sqrt
+# mechanical constants as plain floats (SI units unless noted).
+#
+# the values are written with units in `unit_constants.py` and compiled ahead
+# of time into `constants_generated.py`, so booting the robot never loads pint.
+# set `CONSTANTS_MODE=units` to evaluate `unit_constants.py` directly instead.
+import os
+from hashlib import sha256
+from pathlib import Path
 
-from pint import UnitRegistry
-from wpimath.geometry import Transform3d, Translation2d
+from wpimath.geometry import Translation2d
 from wpimath.kinematics import MecanumDriveKinematics
 
-units = UnitRegistry()
+
+def source_hash() -> str:
+    """
+    hash of `unit_constants.py`, used to notice when the compiled values are stale.
+    """
+    source = Path(__file__).resolve().parent.joinpath("unit_constants.py")
+    return sha256(source.read_bytes()).hexdigest()
+
+
+def _warn(message: str) -> None:
+    # importing wpilib isn't free, so only once something's wrong
+    from wpilib import reportWarning
+
+    reportWarning(message)
+
+
+def _load_values() -> dict[str, dict[str, float]]:
+    if os.environ.get("CONSTANTS_MODE") != "units":
+        try:
+            from constants_generated import SOURCE_HASH, VALUES
+
+            if SOURCE_HASH == source_hash():
+                return VALUES
+            _warn(
+                "constants_generated.py is out of date, "
+                "run `python tools/compile_constants.py`. falling back to pint"
+            )
+        except ImportError:
+            _warn("constants_generated.py is missing, falling back to pint")
+
+    from unit_constants import evaluate
+
+    return evaluate()
+
+
+_values = _load_values()
+_motor = _values["VortexMotorConstants"]
+_turret = _values["TurretConstants"]
+_apriltag = _values["AprilTagConstants"]
+_chassis = _values["Chassis"]
 
 
 class VortexMotorConstants:
-    FREE_SPEED = 5676 * units.rpm
-    ENCODER_RESOLUTION = (
-        42 * units.counts / units.revolution
-    )  # in counts per revolution
+    FREE_SPEED: float = _motor["FREE_SPEED"]  # in rpm
+    ENCODER_RESOLUTION: float = _motor["ENCODER_RESOLUTION"]  # in counts per revolution
+
+
+class TurretConstants:
+    GEAR_RATIO: float = _turret["GEAR_RATIO"]
+    ## how far the turret turns per motor rotation, in degrees
+    DEGREES_PER_ROTATION: float = _turret["DEGREES_PER_ROTATION"]
 
 
 class AprilTagConstants:
-    # this is necessary to make it not angry
-    APRILTAG_WIDTH = units.Quantity(8.125 * units.inch).to(units.meter)
+    APRILTAG_WIDTH: float = _apriltag["APRILTAG_WIDTH"]
+
+    # tags around each alliance's hub
+    RED_HUB_TAGS = (2, 3, 4, 5, 8, 9, 10, 11)
+    BLUE_HUB_TAGS = (18, 19, 20, 21, 24, 25, 26, 27)
 
     # TODO: add other stuff like locations
 
 
 class Chassis:
     # body
-    LENGTH = units.Quantity(0.82 * units.meter)
-    WIDTH = units.Quantity(0.67 * units.meter)
+    LENGTH: float = _chassis["LENGTH"]
+    WIDTH: float = _chassis["WIDTH"]
 
     # wheel and track
-    WHEEL_RADIUS = units.Quantity(5 * units.inch).to(units.meter)
-    WHEEL_DIAMETER = WHEEL_RADIUS * 2  # in meters
-    WHEEL_CIRCUMFERENCE = WHEEL_DIAMETER * pi
-
-    ## distance between left and right wheels, in meters
-    TRACK_WIDTH = units.Quantity(5 * units.inch).to(units.meter)
-    ## distance from front wheels to back wheels, in meters
-    WHEEL_BASE = units.Quantity(5 * units.inch).to(units.meter)
+    WHEEL_RADIUS: float = _chassis["WHEEL_RADIUS"]
+    WHEEL_DIAMETER: float = _chassis["WHEEL_DIAMETER"]
+    WHEEL_CIRCUMFERENCE: float = _chassis["WHEEL_CIRCUMFERENCE"]
+
+    ## distance between left and right wheels
+    TRACK_WIDTH: float = _chassis["TRACK_WIDTH"]
+    ## distance from front wheels to back wheels
+    WHEEL_BASE: float = _chassis["WHEEL_BASE"]
     ## gear ratio of the drivetrain. from the kitbot datasheet
-    GEAR_RATIO: float = 8.450
+    GEAR_RATIO: float = _chassis["GEAR_RATIO"]
 
     # derived from other things
-    LINEAR_SPEED = ((WHEEL_RADIUS * VortexMotorConstants.FREE_SPEED) / GEAR_RATIO).to(
-        units.mps
-    )  # in m/s
-    ROBOT_RADIUS = (
-        sqrt(((LENGTH.magnitude / 2) ** 2) + ((WIDTH.magnitude / 2) ** 2))
-    ) * units.meter  # in meters
-    ANGULAR_SPEED = (LINEAR_SPEED / ROBOT_RADIUS).to(units("rad/s"))  # in rad/s
-
-    # TODO: actually set this
-    CAMERA_POSITION = Transform3d()
+    LINEAR_SPEED: float = _chassis["LINEAR_SPEED"]  # in m/s
+    ROBOT_RADIUS: float = _chassis["ROBOT_RADIUS"]
+    ANGULAR_SPEED: float = _chassis["ANGULAR_SPEED"]  # in rad/s
+    ## distance a wheel travels per motor rotation
+    METERS_PER_ROTATION: float = _chassis["METERS_PER_ROTATION"]
 
+    # wpilib uses +x forward and +y left
     KINEMATICS = MecanumDriveKinematics(
-        frontRightWheel=Translation2d(
-            TRACK_WIDTH.magnitude / 2, WHEEL_BASE.magnitude / 2
-        ),
-        frontLeftWheel=Translation2d(
-            -TRACK_WIDTH.magnitude / 2, WHEEL_BASE.magnitude / 2
-        ),
-        rearRightWheel=Translation2d(
-            TRACK_WIDTH.magnitude / 2, -WHEEL_BASE.magnitude / 2
-        ),
-        rearLeftWheel=Translation2d(
-            -TRACK_WIDTH.magnitude / 2, -WHEEL_BASE.magnitude / 2
-        ),
+        frontLeftWheel=Translation2d(WHEEL_BASE / 2, TRACK_WIDTH / 2),
+        frontRightWheel=Translation2d(WHEEL_BASE / 2, -TRACK_WIDTH / 2),
+        rearLeftWheel=Translation2d(-WHEEL_BASE / 2, TRACK_WIDTH / 2),
+        rearRightWheel=Translation2d(-WHEEL_BASE / 2, -TRACK_WIDTH / 2),
     )
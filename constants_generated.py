@@ -0,0 +1,20 @@
+# generated by tools/compile_constants.py from unit_constants.py. do not edit.
+# values are plain floats in the units listed in `unit_constants.EXPORTS`.
+
+SOURCE_HASH = '885f515da7a2bf38ad4b5f65b0d40f8587254227e632eea13faa7156e976afa9'
+
+VALUES = {'VortexMotorConstants': {'FREE_SPEED': 5676.0, 'ENCODER_RESOLUTION': 42.0},
+ 'TurretConstants': {'GEAR_RATIO': 25.0, 'DEGREES_PER_ROTATION': 14.4},
+ 'AprilTagConstants': {'APRILTAG_WIDTH': 0.206375},
+ 'Chassis': {'LENGTH': 0.82,
+             'WIDTH': 0.67,
+             'WHEEL_RADIUS': 0.127,
+             'WHEEL_DIAMETER': 0.254,
+             'WHEEL_CIRCUMFERENCE': 0.7979645340118074,
+             'TRACK_WIDTH': 0.127,
+             'WHEEL_BASE': 0.127,
+             'GEAR_RATIO': 8.45,
+             'LINEAR_SPEED': 8.93342543402568,
+             'ROBOT_RADIUS': 0.5294572692862003,
+             'ANGULAR_SPEED': 16.872797772839114,
+             'METERS_PER_ROTATION': 0.09443367266411923}}
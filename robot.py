@@ -1,20 +1,113 @@
-from commands2 import CommandScheduler
-from commands2.timedcommandrobot import TimedCommandRobot
+from time import perf_counter
 
+from commands2 import Command, CommandScheduler
+from wpilib import TimedRobot
+
+from config import config
 from src.core import RobotCore
+from src.cycle_log import CycleLogger
+from src.gc_manager import GCManager
+from src.profiler import LoopProfiler
+from src.rates import RateSlots
+
+
+class Robot(TimedRobot):
+    """
+    the main loop. a plain `TimedRobot` rather than `TimedCommandRobot`, which
+    would run the command scheduler a second time on its own notifier slot.
+    """
+
+    __slots__ = (
+        "core",
+        "rates",
+        "logger",
+        "profiler",
+        "gc",
+        "sensors_update",
+        "driver_update",
+        "core_periodic",
+        "scheduler_run",
+        "autonomous_command",
+    )
 
+    def __init__(self, multi_rate: bool | None = None):
+        """
+        `multi_rate` overrides `[rates] multi_rate`, replaying forces it off.
+        """
+        rates = config.rates
+        if multi_rate is None:
+            multi_rate = rates.multi_rate
+        super().__init__(1.0 / rates.control.hz if multi_rate else 0.02)
 
-class Robot(TimedCommandRobot):
-    __slots__ = "core"
+        self.core = RobotCore(
+            1.0 / rates.telemetry.hz if multi_rate else self.getPeriod()
+        )
+        self.core.motors.report(self.getPeriod())
+        self.logger = CycleLogger(config.logger, self.core)
+        # built in `autonomousInit()`, once the alliance is known
+        self.autonomous_command: Command | None = None
 
-    def __init__(self):
-        super().__init__()
+        # when the profiler is disabled these are just the plain methods
+        scheduler = CommandScheduler.getInstance()
+        self.profiler = LoopProfiler(config.profiler, self.getPeriod())
+        self.sensors_update = self.profiler.wrap(
+            "SensorSnapshot.update", self.core.sensors.update
+        )
+        self.driver_update = self.profiler.wrap(
+            "DriverInput.update", self.core.driver.update
+        )
+        if multi_rate:
+            self.core_periodic = self.profiler.wrap(
+                "RobotCore.update_pose", self.core.update_pose
+            )
+        else:
+            self.core_periodic = self.profiler.wrap(
+                "RobotCore.periodic", self.core.periodic
+            )
+        self.scheduler_run = self.profiler.wrap(
+            "CommandScheduler.run", scheduler.run, blameable=False
+        )
+        for subsystem in self.core.subsystems():
+            self.profiler.instrument_subsystem(subsystem)
+        self.profiler.instrument_commands(scheduler)
 
-        self.core = RobotCore()
+        # the main loop keeps sensors, odometry, commands and logging,
+        # the slower work moves out into its own slots
+        self.rates = RateSlots(self, self.profiler)
+        if multi_rate:
+            self.rates.add("vision", rates.vision, self.core.update_vision)
+            self.rates.add("telemetry", rates.telemetry, self.core.update_dashboard)
+            self.rates.start()
+
+        # last, so everything above is in the frozen startup heap
+        self.gc = GCManager(config.gc, self.getPeriod(), self.profiler)
+        self.gc.freeze()
 
     def robotPeriodic(self) -> None:
-        self.core.periodic()
-        CommandScheduler.getInstance().run()
+        start = perf_counter()
+        self.profiler.begin_cycle()
+        # read every device and the controller once, before anything else looks at them
+        self.sensors_update()
+        self.driver_update()
+        self.core_periodic()
+        self.scheduler_run()
+        # after the scheduler, so this cycle's commands are in the record
+        self.logger.record_cycle()
+        # in whatever time the loop has left. inside the cycle, so the
+        # profiler counts the pause as part of the loop
+        self.gc.after_loop(perf_counter() - start)
+        self.profiler.end_cycle()
+
+    def disabledInit(self) -> None:
+        # nothing much is going on, get the last partial batch onto the disk
+        self.logger.flush()
+
+    def autonomousInit(self) -> None:
+        self.autonomous_command = self.core.autonomous_command()
+        if self.autonomous_command is not None:
+            self.autonomous_command.schedule()
 
-    def autonomousPeriodic(self) -> None:
-        self.core.drivetrain.drive(-0.5, 0, 0)
+    def teleopInit(self) -> None:
+        # the driver takes over, even if the routine didn't finish
+        if self.autonomous_command is not None:
+            self.autonomous_command.cancel()
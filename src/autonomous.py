@@ -0,0 +1,141 @@
+from array import array
+from math import pi
+from typing import Callable
+
+from commands2 import Command
+from wpilib import Timer
+from wpimath.controller import PIDController
+from wpimath.geometry import Pose2d, Rotation2d
+from wpimath.kinematics import ChassisSpeeds
+
+from config import AutonomousConfig
+from src.subsystems.drivetrain import Drivetrain
+from src.trajectory import (
+    COLUMNS,
+    HEADING,
+    OMEGA,
+    VX,
+    VY,
+    X,
+    Y,
+    PackedTrajectory,
+    rotate_row,
+)
+
+
+class HolonomicFollower:
+    """
+    works out the chassis speeds that keep the robot on a trajectory.
+
+    the trajectory's own velocities do most of the work, and a proportional
+    controller on each of x, y and heading corrects whatever drift is left.
+
+    members
+    -------
+    `reset(field)` to clear the controllers before starting a new trajectory
+    `initial_pose(trajectory)` gets where a trajectory starts
+    `calculate(pose, trajectory, t)` gets robot relative speeds for `t` seconds in
+    """
+
+    __slots__ = (
+        "x_controller",
+        "y_controller",
+        "heading_controller",
+        "sample",
+        "field",
+    )
+
+    def __init__(self, config: AutonomousConfig):
+        self.x_controller = PIDController(config.translation_kP, 0, 0)
+        self.y_controller = PIDController(config.translation_kP, 0, 0)
+        self.heading_controller = PIDController(config.rotation_kP, 0, 0)
+        # the trajectory heading is unwrapped, this makes the error take the short way
+        self.heading_controller.enableContinuousInput(-pi, pi)
+
+        self.sample = array("d", bytes(8 * COLUMNS))
+        # the field's length and width when following from the red side
+        self.field: tuple[float, float] | None = None
+
+    def reset(self, field: tuple[float, float] | None = None) -> None:
+        """
+        pass the field's length and width to follow trajectories from the red
+        side, turned around the center of the field.
+        """
+        self.x_controller.reset()
+        self.y_controller.reset()
+        self.heading_controller.reset()
+        self.field = field
+
+    def _sample(self, trajectory: PackedTrajectory, t: float) -> array:
+        sample = self.sample
+        trajectory.sample_into(t, sample)
+        if self.field is not None:
+            rotate_row(sample, *self.field)
+        return sample
+
+    def initial_pose(self, trajectory: PackedTrajectory) -> Pose2d:
+        sample = self._sample(trajectory, 0.0)
+        return Pose2d(sample[X], sample[Y], Rotation2d(sample[HEADING]))
+
+    def calculate(
+        self, pose: Pose2d, trajectory: PackedTrajectory, t: float
+    ) -> ChassisSpeeds:
+        sample = self._sample(trajectory, t)
+
+        rotation = pose.rotation()
+        vx = sample[VX] + self.x_controller.calculate(pose.X(), sample[X])
+        vy = sample[VY] + self.y_controller.calculate(pose.Y(), sample[Y])
+        omega = sample[OMEGA] + self.heading_controller.calculate(
+            rotation.radians(), sample[HEADING]
+        )
+        return ChassisSpeeds.fromFieldRelativeSpeeds(vx, vy, omega, rotation)
+
+
+class FollowTrajectory(Command):
+    """
+    drives a trajectory from start to finish, then stops.
+
+    pass `reset_pose` to tell odometry the robot is at the trajectory's start when
+    the command begins. leave it out when vision already knows where we are.
+    on the red alliance, pass the field's length and width as `field` to drive
+    the trajectory turned around to the red side.
+    """
+
+    def __init__(
+        self,
+        trajectory: PackedTrajectory,
+        follower: HolonomicFollower,
+        drivetrain: Drivetrain,
+        get_pose: Callable[[], Pose2d],
+        reset_pose: Callable[[Pose2d], None] | None = None,
+        field: tuple[float, float] | None = None,
+    ):
+        super().__init__()
+        self.trajectory = trajectory
+        self.follower = follower
+        self.drivetrain = drivetrain
+        self.get_pose = get_pose
+        self.reset_pose = reset_pose
+        self.field = field
+        self.timer = Timer()
+
+        self.setName(f"FollowTrajectory[{trajectory.name}]")
+        self.addRequirements(drivetrain)
+
+    def initialize(self) -> None:
+        self.follower.reset(self.field)
+        if self.reset_pose is not None:
+            self.reset_pose(self.follower.initial_pose(self.trajectory))
+        self.timer.restart()
+
+    def execute(self) -> None:
+        speeds = self.follower.calculate(
+            self.get_pose(), self.trajectory, self.timer.get()
+        )
+        self.drivetrain.drive_relative(speeds)
+
+    def isFinished(self) -> bool:
+        return self.timer.hasElapsed(self.trajectory.duration)
+
+    def end(self, interrupted: bool) -> None:
+        self.drivetrain.stop()
@@ -1,30 +1,34 @@
-from photonlibpy.targeting import PhotonTrackedTarget
-from commands2 import ConditionalCommand
-from commands2.button import CommandXboxController
+import msgspec
+from commands2 import Command, ConditionalCommand, Subsystem
+from commands2.button import Trigger
 from commands2.runcommand import RunCommand
-from wpilib import ADIS16470_IMU, SmartDashboard, RobotController, DriverStation
+from wpilib import DriverStation, SmartDashboard, RobotController, reportWarning
+from wpimath.geometry import Pose2d
 
-from config import config
+from config import config, script_path
+from src.autonomous import FollowTrajectory, HolonomicFollower
+from src.moving_shot import MovingShot, load_moving_shot
+from src.subsystems.driver_input import (
+    LEFT_BUMPER,
+    LEFT_STICK,
+    RIGHT_BUMPER,
+    RIGHT_TRIGGER,
+    DriverInput,
+)
 from src.subsystems.drivetrain import Drivetrain
+from src.subsystems.gyro import Gyro
 from src.subsystems.odometry import Odometry
+from src.subsystems.odometry_sampler import OdometrySampler
+from src.subsystems.sensors import SensorSnapshot
 from src.subsystems.shooter import Shooter
 from src.subsystems.intake import Intake
+from src.subsystems.motors import MotorConfigurator
+from src.subsystems.targeting import HubAimer, TargetSelector
 from src.subsystems.vision import Vision
 from src.subsystems.turret import Turret
-from math import sqrt
-
-
-def deadband(value: float, threshold=0.02) -> float:
-    """
-    returns zero if the value is less than 0.02
-
-    helps combat slight stick drift
-    """
-    return value if abs(value) > threshold else 0
-
-
-def target_distance_from_camera_center(target: PhotonTrackedTarget) -> float:
-    return sqrt(target.getYaw() ** 2 + target.getPitch() ** 2)
+from src.telemetry import Telemetry
+from src.trajectory import load_trajectories
+from src.tuning import PIDTuner
 
 
 class RobotCore:
@@ -33,81 +37,226 @@ class RobotCore:
     """
 
     __slots__ = (
-        "controller",
+        "driver",
         "gyro",
+        "sensors",
+        "motors",
         "drivetrain",
         "odometry",
+        "odometry_sampler",
         "vision",
         "shooter",
         "pose",
         "turret",
         "intake",
+        "targeting",
+        "hub_aimer",
+        "moving_shot",
+        "vision_fresh",
+        "vision_updates",
+        "telemetry",
+        "channels",
+        "tuner",
+        "trajectories",
+        "follower",
     )
 
-    def __init__(self):
-        self.controller = CommandXboxController(config.controller_port)
-        self.gyro = ADIS16470_IMU()
-        self.gyro.configCalTime(self.gyro.CalibrationTime(5))
-        self.gyro.calibrate()
-        # self.gyro.setSensitivity()
-        self.gyro.reset()
-
-        self.drivetrain = Drivetrain(config.motors, self.gyro)
-        self.odometry = Odometry(self.gyro.getAngle())
-        self.vision = Vision(config.vision.camera_name)
-        self.shooter = Shooter(config.motors.shooter)
-        self.turret = Turret(config.motors.turret)
-        self.intake = Intake(config.motors.intake)
+    def __init__(self, telemetry_period: float = 0.02):
+        """
+        `telemetry_period` is how often (in seconds) `publish_telemetry()` gets called.
+        """
+        # read once per cycle, before anything looks at it
+        self.driver = DriverInput(config.controller_port, config.driver)
+        # calibrates in the background. until it's done, the drivetrain
+        # drives robot relative and odometry uses wheel-only heading
+        self.gyro = Gyro()
+        self.gyro.start_calibration()
+
+        # every device read for a cycle happens in `sensors.update()`
+        self.sensors = SensorSnapshot(self.gyro)
+        # subsystems register their motors here, then they're all configured at once
+        sparks = config.sparks
+        if config.odometry.threaded:
+            # sampling faster than the encoders report would just repeat positions
+            period_ms = max(1, int(1000 / config.odometry.frequency))
+            if sparks.drive.encoder_period_ms > period_ms:
+                sparks = msgspec.structs.replace(
+                    sparks,
+                    drive=msgspec.structs.replace(
+                        sparks.drive, encoder_period_ms=period_ms
+                    ),
+                )
+        self.motors = MotorConfigurator(sparks)
+
+        self.drivetrain = Drivetrain(
+            config.motors, self.sensors, self.motors, config.drivetrain
+        )
+        self.odometry = Odometry(self.gyro.get_angle(), config.history_size)
+        self.odometry_sampler: OdometrySampler | None = None
+        if config.odometry.threaded:
+            encoders = self.drivetrain.encoders
+            self.odometry_sampler = OdometrySampler(
+                config.odometry,
+                (
+                    encoders.front_left_encoder,
+                    encoders.front_right_encoder,
+                    encoders.rear_left_encoder,
+                    encoders.rear_right_encoder,
+                ),
+                self.gyro,
+            )
+            self.odometry_sampler.start()
+        self.vision = Vision(config.vision)
+        # whether this cycle's estimates haven't been fused yet
+        self.vision_fresh = False
+        # how many times vision has been read, so the logger can tell
+        # which cycles have new frames
+        self.vision_updates = 0
+        self.shooter = Shooter(
+            config.motors.shooter, config.shooter, self.sensors, self.motors
+        )
+        self.turret = Turret(
+            config.motors.turret,
+            config.turret,
+            self.sensors,
+            self.motors,
+            config.history_size,
+        )
+        self.intake = Intake(config.motors.intake, self.sensors, self.motors)
+        self.motors.apply()
+
+        # only does anything with `[tuning] enabled`
+        self.tuner = PIDTuner(config.tuning)
+        self.tuner.add("drive", config.drivetrain.velocity_pid, self.drivetrain.set_pid)
+        self.tuner.add("shooter", config.motors.shooter.pid, self.shooter.set_pid)
+        self.tuner.add("turret", config.motors.turret.pid, self.turret.set_pid)
+        self.targeting = TargetSelector(config.targeting.switch_margin)
+        self.hub_aimer = HubAimer(
+            self.vision.field_layout,
+            Turret.MIN_ANGLE_DEG,
+            Turret.MAX_ANGLE_DEG,
+            config.targeting.correction_timeout,
+        )
+        self.hub_aimer.set_alliance(self.targeting.alliance)
+        # solved ahead of time by `tools/generate_moving_shot.py`
+        self.moving_shot: MovingShot | None = None
+        if config.moving_shot.enabled:
+            self.moving_shot = load_moving_shot(
+                script_path.joinpath("moving_shot.grid"),
+                config.moving_shot,
+                config.shooter.table,
+            )
 
         self.pose = self.odometry.get_position()
 
+        # mapped now, so starting autonomous doesn't touch the disk
+        self.trajectories = load_trajectories(script_path.joinpath("trajectories"))
+        self.follower = HolonomicFollower(config.autonomous)
+
         SmartDashboard.putData("pose", self.odometry.get_field())
-        SmartDashboard.putData("gyro", self.gyro)
         self.configure_bindings()
-        SmartDashboard.putNumber("voltage", RobotController.getBatteryVoltage())
+
+        # channels are created once here, `publish_telemetry()` only sets values
+        self.telemetry = Telemetry(config.telemetry, telemetry_period)
+        telemetry = self.telemetry
+        self.channels = (
+            telemetry.struct("pose", Pose2d, essential=True),
+            # the field widget is for people watching, it doesn't need 50 Hz
+            telemetry.custom("field", self.odometry.get_field().setRobotPose, every=5),
+            telemetry.double("voltage", every=25, essential=True),
+            telemetry.integer("vision/dropped estimates", every=25),
+            telemetry.integer("vision/skipped frames", every=25),
+            telemetry.integer("vision/worker errors", every=25),
+            telemetry.boolean("turret/at target", every=5),
+            telemetry.boolean("shooter/at speed", every=5),
+            telemetry.double("shooter/spin up seconds", every=25),
+        )
+
+    def subsystems(self) -> tuple[Subsystem, ...]:
+        """
+        every command-based subsystem the core owns.
+        """
+        return (self.drivetrain, self.shooter, self.turret, self.intake)
+
+    def reset_pose(self, pose: Pose2d) -> None:
+        self.odometry.reset_position(
+            pose, self.sensors.wheel_positions, self.sensors.gyro_angle
+        )
+        self.pose = pose
+
+    def autonomous_command(self) -> Command | None:
+        """
+        the command for the configured autonomous routine, if there is one.
+
+        build it when autonomous starts, the alliance often isn't known at boot.
+        """
+        routine = config.autonomous.routine
+        if not routine:
+            return None
+        if (trajectory := self.trajectories.get(routine)) is None:
+            reportWarning(f"autonomous: no trajectory named {routine!r}, not moving")
+            return None
+
+        # trajectories are written from the blue side
+        field = None
+        alliance = DriverStation.getAlliance()
+        if alliance == DriverStation.Alliance.kRed:
+            layout = self.vision.field_layout
+            field = (layout.getFieldLength(), layout.getFieldWidth())
+        elif alliance is None:
+            reportWarning(
+                "autonomous: alliance unknown, following the blue side trajectory"
+            )
+
+        return FollowTrajectory(
+            trajectory,
+            self.follower,
+            self.drivetrain,
+            lambda: self.pose,
+            self.reset_pose if config.autonomous.reset_pose else None,
+            field,
+        )
 
     def turret_auto_aim(self):
-        targets = self.vision.get_latest_targets()
-        if not targets:
-            return
+        lead = self.moving_shot.lead if self.moving_shot is not None else 0.0
 
-        # sort targets by distance from camera center
-        targets.sort(key=target_distance_from_camera_center)
-        focused_target = targets[0]
-        self.turret.aim_at_target(focused_target)
+        # only set on cycles with a new frame. a tag corrects the odometry angle
+        # as of when the frame was captured, and the correction is held after that
+        result = self.vision.get_latest_result()
+        if result and (focused_target := self.targeting.select(result.getTargets())):
+            timestamp = result.getTimestampSeconds()
+            pose = self.odometry.get_position_at(timestamp)
+            if pose is not None:
+                self.hub_aimer.observe(
+                    focused_target,
+                    pose,
+                    self.turret.get_position_at(timestamp),
+                    timestamp,
+                )
+
+        # always aim from odometry, so the setpoint doesn't jump between
+        # cycles with and without a frame
+        self.turret.set_position(self.hub_aimer.turret_angle(self.pose, lead))
 
     def configure_bindings(self):
-        # define drivetrain command.
+        # everything here reads the driver's input from this cycle's snapshot
+        driver = self.driver
+
+        # define drivetrain command. the inputs are already shaped
         self.drivetrain.setDefaultCommand(
             RunCommand(
                 lambda: self.drivetrain.drive(
-                    deadband(self.controller.getLeftY()),
-                    deadband(-self.controller.getLeftX()),
-                    deadband(
-                        -self.controller.getRightX()
-                        if not self.controller.getLeftTriggerAxis() > 0.5
-                        else 0
-                    ),
+                    driver.forward, driver.sideways, driver.rotation
                 ),
                 self.drivetrain,
             )
         )
 
-        blue_targets = [18, 19, 20, 21, 24, 25, 26, 27]
-        red_targets = [2, 3, 4, 5, 8, 9, 10, 11]
-        alliance = DriverStation.getAlliance()
-        target_ids: list[int] = []
-        if alliance:
-            target_ids.extend(
-                red_targets if alliance == DriverStation.Alliance.kRed else blue_targets
-            )
-        else:
-            target_ids.extend(blue_targets + red_targets)
         self.turret.setDefaultCommand(
             ConditionalCommand(
                 RunCommand(
-                    lambda: self.turret.rotate(self.controller.getRightX())
-                    if self.controller.getRightX() > 0.1
+                    lambda: self.turret.rotate(driver.turret)
+                    if driver.turret
                     else self.turret.set_position(0),
                     self.turret,
                 ),
@@ -115,7 +264,7 @@ class RobotCore:
                     self.turret_auto_aim,
                     self.turret,
                 ),
-                lambda: self.controller.getHID().getRawButton(9),
+                lambda: driver.pressed(LEFT_STICK),
             )
         )
         # self.controller.leftTrigger().whileTrue(
@@ -125,21 +274,105 @@ class RobotCore:
         #     )
         # ).onFalse(RunCommand(self.turret.stop, self.turret))
 
-        # set shooter and hood commands
-        self.controller.leftBumper().onTrue(
-            RunCommand(lambda: self.intake.shoot(-0.5), self.shooter),
-        ).onFalse(RunCommand(self.shooter.stop, self.shooter))
+        # set shooter and hood commands.
+        # the intake commands only require the intake, so feeding doesn't
+        # interrupt the flywheel spinning up
+        Trigger(lambda: driver.pressed(LEFT_BUMPER)).onTrue(
+            RunCommand(lambda: self.intake.shoot(-0.5), self.intake),
+        ).onFalse(RunCommand(self.intake.stop, self.intake))
 
-        self.controller.rightBumper().onTrue(
-            RunCommand(lambda: self.intake.shoot(0.5), self.shooter),
-        ).onFalse(RunCommand(self.shooter.stop, self.shooter))
+        Trigger(lambda: driver.pressed(RIGHT_BUMPER)).onTrue(
+            RunCommand(self.feed_shooter, self.intake),
+        ).onFalse(RunCommand(self.intake.stop, self.intake))
 
-        self.controller.rightTrigger().onTrue(
-            RunCommand(self.shooter.shoot, self.shooter)
+        Trigger(lambda: driver.axis(RIGHT_TRIGGER) > 0.5).onTrue(
+            RunCommand(self.spin_up_shooter, self.shooter)
         ).onFalse(RunCommand(self.shooter.stop, self.shooter))
 
+    def spin_up_shooter(self):
+        # vision is fused into the pose, so this is as good as the tags we can see
+        if self.moving_shot is not None and self.shooter.velocity_control:
+            self.shooter.set_speed(self.moving_shot.rpm)
+        else:
+            self.shooter.shoot_from(self.hub_aimer.distance(self.pose))
+
+    def feed_shooter(self):
+        # a ball fed before the flywheel is up to speed falls short
+        if self.shooter.ready_to_feed():
+            self.intake.shoot(0.5)
+        else:
+            self.intake.stop()
+
     def periodic(self):
-        wheel_positions = self.drivetrain.encoders.get_wheel_positions()
-        self.pose = self.odometry.update_odometry(
-            wheel_positions, self.gyro.getAngle(), None
-        )
+        """
+        everything the core does each loop, when running single rate.
+        """
+        self.tuner.update()
+        self.update_vision()
+        self.update_pose()
+        self.publish_telemetry()
+
+    def update_vision(self):
+        # the only place the camera gets read. everything else uses this cycle's cache
+        self.vision.update()
+        self.vision_fresh = True
+        self.vision_updates += 1
+        if self.targeting.update_alliance():
+            self.hub_aimer.set_alliance(self.targeting.alliance)
+
+    def update_pose(self):
+        # running multi rate, this runs more often than vision.
+        # each estimate must only be fused once
+        estimates = self.vision.get_estimates() if self.vision_fresh else ()
+        self.vision_fresh = False
+
+        if self.odometry_sampler is not None:
+            self.pose = self.odometry.update_from_samples(
+                self.odometry_sampler, estimates
+            )
+        else:
+            self.pose = self.odometry.update_odometry(
+                self.sensors.wheel_positions, self.sensors.gyro_angle, estimates
+            )
+        if self.moving_shot is not None:
+            self.moving_shot.update(
+                self.pose,
+                self.odometry.velocity,
+                self.hub_aimer.goal_for(self.pose.X()),
+            )
+
+    def update_dashboard(self):
+        """
+        the slow half of the loop, when running multi rate.
+        """
+        self.tuner.update()
+        self.publish_telemetry()
+
+    def publish_telemetry(self):
+        (
+            pose,
+            field,
+            voltage,
+            dropped,
+            skipped,
+            errors,
+            turret_at_target,
+            shooter_at_speed,
+            spin_up_time,
+        ) = self.channels
+        pose.set(self.pose)
+        field.set(self.pose)
+        if voltage.due():
+            voltage.send(RobotController.getBatteryVoltage())
+
+        # these add up every camera's worker, only do it when they're being sent
+        if dropped.due():
+            dropped.send(self.vision.dropped())
+        if skipped.due():
+            skipped.send(self.vision.skipped())
+        if errors.due():
+            errors.send(self.vision.errors())
+        turret_at_target.set(self.turret.at_target())
+        shooter_at_speed.set(self.shooter.at_speed())
+        if self.shooter.spin_up_time is not None:
+            spin_up_time.set(self.shooter.spin_up_time)
@@ -0,0 +1,402 @@
+from os import listdir, makedirs, path, remove
+from queue import Empty, Full, Queue
+from struct import Struct as BinaryStruct
+from threading import Thread
+from time import strftime
+from traceback import print_exc
+from typing import TYPE_CHECKING, BinaryIO, Iterator, Optional
+
+import msgspec
+from photonlibpy.targeting import PhotonPipelineResult
+from wpilib import DriverStation, RobotBase, reportWarning
+
+from config import LoggerConfig
+
+if TYPE_CHECKING:
+    from src.core import RobotCore
+
+# every batch on disk is prefixed with its length
+LENGTH_PREFIX = BinaryStruct("<I")
+
+
+# array_like structs are encoded without field names, which keeps records small
+class ControllerFrame(msgspec.Struct, array_like=True):
+    axes: list[float]
+    buttons: int  # bitmask, button 1 is bit 0
+    pov: int  # in degrees, -1 when not pressed
+
+
+class DriverStationFrame(msgspec.Struct, array_like=True):
+    enabled: bool
+    autonomous: bool
+    alliance: int  # -1 unknown, 0 red, 1 blue
+    location: int  # driver station 1-3, 0 unknown
+
+
+class SensorFrame(msgspec.Struct, array_like=True):
+    # meters, in the same order as `MecanumDriveWheelPositions`
+    front_left: float
+    front_right: float
+    rear_left: float
+    rear_right: float
+    gyro_angle: Optional[float]  # degrees, `None` before calibration
+    turret_position: float  # degrees
+
+
+class VisionFrame(msgspec.Struct, array_like=True):
+    timestamp: float
+    tag_ids: list[int]
+    # when networktables received the frame, in FPGA microseconds
+    received_us: int
+    # the whole result as photonvision sent it, so it can be replayed.
+    # `None` when `vision_packets` is turned off
+    packet: Optional[bytes]
+    # which of `[[vision.cameras]]` took it. logs from before there were several
+    # cameras don't have this, they all came from the first one
+    camera: int = 0
+
+
+class EstimateFrame(msgspec.Struct, array_like=True):
+    timestamp: float
+    x: float
+    y: float
+    heading: float  # radians
+
+
+class OutputFrame(msgspec.Struct, array_like=True):
+    # the last `Drivetrain.drive()` inputs
+    drive_x: float
+    drive_y: float
+    drive_rotation: float
+    shooter: float
+    # the turret is driven either by speed or to a setpoint
+    turret_speed: float
+    turret_setpoint: Optional[float]
+    intake: float
+    # the flywheel velocity setpoint, 0 when it's run by duty cycle
+    shooter_rpm: float = 0.0
+
+
+class CycleRecord(msgspec.Struct, array_like=True):
+    cycle: int
+    timestamp: float  # FPGA time, in seconds
+    driver_station: DriverStationFrame
+    controller: ControllerFrame
+    sensors: SensorFrame
+    vision: list[VisionFrame]
+    estimates: list[EstimateFrame]
+    outputs: OutputFrame
+
+
+def output_frame(core: "RobotCore") -> OutputFrame:
+    """
+    everything the subsystems were last told to do.
+    """
+    drive_x, drive_y, drive_rotation = core.drivetrain.commanded
+    return OutputFrame(
+        drive_x,
+        drive_y,
+        drive_rotation,
+        core.shooter.output,
+        core.turret.commanded_speed,
+        core.turret.commanded_angle,
+        core.intake.output,
+        core.shooter.target_rpm,
+    )
+
+
+def read_log(file: BinaryIO) -> Iterator[CycleRecord]:
+    """
+    read every record from a log file, in the order they were written.
+    """
+    decoder = msgspec.msgpack.Decoder(list[CycleRecord])
+    while header := file.read(LENGTH_PREFIX.size):
+        if len(header) < LENGTH_PREFIX.size:
+            return  # cut off mid-write
+        (length,) = LENGTH_PREFIX.unpack(header)
+        batch = file.read(length)
+        if len(batch) < length:
+            return
+        yield from decoder.decode(batch)
+
+
+class LogWriter:
+    """
+    writes encoded batches to rotating files on a background thread.
+
+    the loop only ever calls `submit()`, which never waits: when the queue is full
+    the batch is dropped and counted instead. if the disk can't be written to,
+    everything after that is dropped too.
+
+    members
+    -------
+    `start()` to start the writer thread
+    `submit(batch, records)` to queue an encoded batch (main thread)
+    `dropped` records turned away by `submit()`
+    `lost` records the writer thread failed to write
+    """
+
+    __slots__ = (
+        "directory",
+        "max_file_bytes",
+        "max_files",
+        "queue",
+        "dropped",
+        "lost",
+        "failed",
+        "file",
+        "file_bytes",
+        "file_index",
+        "session",
+        "thread",
+    )
+
+    def __init__(
+        self, directory: str, queue_size: int, max_file_bytes: int, max_files: int
+    ):
+        self.directory = directory
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+
+        self.queue: Queue[tuple[bytes, int]] = Queue(queue_size)
+        # each counter only gets written by one thread
+        self.dropped = 0
+        self.lost = 0
+        self.failed = False
+
+        self.file: Optional[BinaryIO] = None
+        self.file_bytes = 0
+        self.file_index = 0
+        # the rio's clock isn't set until the driver station connects,
+        # so the index is what actually keeps files in order
+        self.session = strftime("%Y%m%d-%H%M%S")
+        self.thread: Thread | None = None
+
+    def start(self) -> None:
+        self.thread = Thread(target=self._run, name="log writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, batch: bytes, records: int) -> None:
+        if self.failed:
+            self.dropped += records
+            return
+        try:
+            self.queue.put_nowait((batch, records))
+        except Full:
+            self.dropped += records
+
+    def _fail(self) -> None:
+        print_exc()
+        reportWarning(f"logger: couldn't write to {self.directory}, not logging")
+        self.failed = True
+        # nothing still queued is going to make it either
+        while True:
+            try:
+                _, records = self.queue.get_nowait()
+            except Empty:
+                return
+            self.lost += records
+
+    def _run(self) -> None:
+        try:
+            makedirs(self.directory, exist_ok=True)
+        except OSError:
+            self._fail()
+            return
+
+        while True:
+            try:
+                batch, records = self.queue.get(timeout=1.0)
+            except Empty:
+                continue
+
+            try:
+                self._write(batch)
+            except OSError:
+                self.lost += records
+                self._fail()
+                return
+
+    def _write(self, batch: bytes) -> None:
+        if self.file is None or self.file_bytes >= self.max_file_bytes:
+            self._rotate()
+        file = self.file
+        assert file is not None
+
+        file.write(LENGTH_PREFIX.pack(len(batch)))
+        file.write(batch)
+        # don't lose more than a batch if the power goes out
+        file.flush()
+        self.file_bytes += LENGTH_PREFIX.size + len(batch)
+
+    def _rotate(self) -> None:
+        if self.file is not None:
+            self.file.close()
+
+        name = f"cycles-{self.session}-{self.file_index:04}.msgpack"
+        self.file = open(path.join(self.directory, name), "wb")
+        self.file_bytes = 0
+        self.file_index += 1
+
+        # keep the stick from filling up, oldest files go first
+        logs = sorted(
+            entry
+            for entry in listdir(self.directory)
+            if entry.startswith("cycles-") and entry.endswith(".msgpack")
+        )
+        for old in logs[: max(0, len(logs) - self.max_files)]:
+            remove(path.join(self.directory, old))
+
+
+def _on_mounted_volume(directory: str) -> bool:
+    """
+    whether `directory` is on something mounted at its top level, like the usb
+    stick at /U. an absent stick just leaves /U as a plain folder (or nothing).
+    """
+    parts = path.abspath(directory).split(path.sep)
+    return len(parts) > 1 and path.ismount(path.sep + parts[1])
+
+
+class CycleLogger:
+    """
+    records what the robot saw and commanded every cycle.
+
+    records are built and encoded on the main thread, `batch_size` cycles at a
+    time, and the writer thread does all of the disk I/O.
+
+    members
+    -------
+    `record_cycle()` to log the current cycle, call it after the scheduler runs
+    `flush()` to send off a partial batch, e.g. when the robot gets disabled
+    `dropped` records that were lost before reaching the disk
+    """
+
+    __slots__ = (
+        "enabled",
+        "vision_packets",
+        "core",
+        "batch_size",
+        "pending",
+        "encoder",
+        "writer",
+        "cycle",
+        "vision_updates",
+        "dropped_channel",
+    )
+
+    def __init__(self, config: LoggerConfig, core: "RobotCore"):
+        self.enabled = config.enabled
+        self.vision_packets = config.vision_packets
+        self.core = core
+        self.batch_size = config.batch_size
+        self.pending: list[CycleRecord] = []
+        self.encoder = msgspec.msgpack.Encoder()
+        self.cycle = 0
+        # the core's count the last time vision was logged
+        self.vision_updates = core.vision_updates
+
+        directory = config.directory if RobotBase.isReal() else config.sim_directory
+        if self.enabled and RobotBase.isReal() and not _on_mounted_volume(directory):
+            # writing anyway would fill up the roborio's own flash instead
+            reportWarning(f"logger: no usb stick mounted for {directory}, not logging")
+            self.enabled = False
+
+        self.writer = LogWriter(
+            directory,
+            config.queue_size,
+            config.max_file_bytes,
+            config.max_files,
+        )
+        self.dropped_channel = core.telemetry.integer(
+            "logger/dropped records", every=25, essential=True
+        )
+        if self.enabled:
+            self.writer.start()
+
+    @property
+    def dropped(self) -> int:
+        return self.writer.dropped + self.writer.lost
+
+    def _driver_station(self) -> DriverStationFrame:
+        alliance = DriverStation.getAlliance()
+        return DriverStationFrame(
+            DriverStation.isEnabled(),
+            DriverStation.isAutonomous(),
+            -1 if alliance is None else int(alliance == DriverStation.Alliance.kBlue),
+            DriverStation.getLocation() or 0,
+        )
+
+    def _controller(self) -> ControllerFrame:
+        # the same snapshot the commands saw this cycle
+        driver = self.core.driver
+        return ControllerFrame(
+            driver.axes[: driver.axis_count].tolist(), driver.buttons, driver.pov
+        )
+
+    def record_cycle(self) -> None:
+        if not self.enabled:
+            return
+
+        core = self.core
+        sensors = core.sensors
+        wheels = sensors.wheel_positions
+        pack = PhotonPipelineResult.photonStruct.pack if self.vision_packets else None
+
+        # running multi rate, vision is read less often than this runs.
+        # its frames only belong to the first cycle after, or replay would fuse
+        # them again every cycle until the next read
+        vision: list[VisionFrame] = []
+        estimates: list[EstimateFrame] = []
+        if core.vision_updates != self.vision_updates:
+            self.vision_updates = core.vision_updates
+            vision = [
+                VisionFrame(
+                    result.getTimestampSeconds(),
+                    [target.fiducialId for target in result.getTargets()],
+                    result.ntReceiveTimestampMicros,
+                    None if pack is None else pack(result).getData(),
+                    camera.index,
+                )
+                for camera in core.vision.cameras
+                for result in camera.results
+            ]
+            estimates = [
+                EstimateFrame(
+                    estimate.timestamp,
+                    estimate.pose.X(),
+                    estimate.pose.Y(),
+                    estimate.pose.rotation().radians(),
+                )
+                for estimate in core.vision.get_estimates()
+            ]
+
+        record = CycleRecord(
+            cycle=self.cycle,
+            timestamp=sensors.timestamp,
+            driver_station=self._driver_station(),
+            controller=self._controller(),
+            sensors=SensorFrame(
+                wheels.frontLeft,
+                wheels.frontRight,
+                wheels.rearLeft,
+                wheels.rearRight,
+                sensors.gyro_angle,
+                core.turret.get_position(),
+            ),
+            vision=vision,
+            estimates=estimates,
+            outputs=output_frame(core),
+        )
+        self.cycle += 1
+
+        self.pending.append(record)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        self.dropped_channel.set(self.dropped)
+
+    def flush(self) -> None:
+        pending = self.pending
+        if not pending:
+            return
+        self.writer.submit(self.encoder.encode(pending), len(pending))
+        self.pending = []
@@ -0,0 +1,106 @@
+import gc
+from array import array
+from time import perf_counter
+from typing import Any
+
+from wpilib import DriverStation, SmartDashboard
+
+from config import GCConfig
+from src.profiler import LoopProfiler, TimingChannel
+
+
+class GCManager:
+    """
+    keeps python's garbage collector from pausing the middle of a loop.
+
+    when managed, everything built at startup is frozen (it lives for the whole
+    match, so scanning it is wasted time) and automatic collection is turned off.
+    instead, `after_loop()` collects at most one generation per loop: while
+    enabled only the young generations and only when the loop has time to spare,
+    while disabled whatever is due.
+
+    every collection's pause is counted, managed or not. with the profiler enabled
+    each generation gets a channel under `gc/`, so a pause that makes the loop
+    overrun gets blamed like anything else.
+
+    members
+    -------
+    `freeze()` once the robot is built
+    `after_loop(elapsed)` with how long (in seconds) the loop took, call it at the end of every loop
+    `collections` and `paused_ms` per generation
+    """
+
+    __slots__ = (
+        "managed",
+        "period",
+        "spare",
+        "thresholds",
+        "profiler",
+        "channels",
+        "started",
+        "collections",
+        "paused_ms",
+    )
+
+    def __init__(self, config: GCConfig, period: float, profiler: LoopProfiler):
+        self.managed = config.managed
+        self.period = period
+        self.spare = config.spare_ms / 1000.0
+        # what automatic collection would have used, before it's turned off
+        self.thresholds = gc.get_threshold()
+
+        self.profiler = profiler
+        self.channels: tuple[TimingChannel, ...] = ()
+        if profiler.enabled:
+            self.channels = tuple(
+                profiler.channel(f"gc/gen{generation}", config.pause_budget_ms)
+                for generation in range(3)
+            )
+
+        self.started = 0.0
+        self.collections = array("q", bytes(8 * 3))
+        self.paused_ms = array("d", bytes(8 * 3))
+        gc.callbacks.append(self._on_collect)
+
+    def _on_collect(self, phase: str, info: dict[str, Any]) -> None:
+        if phase == "start":
+            self.started = perf_counter()
+            return
+
+        elapsed = (perf_counter() - self.started) * 1000.0
+        generation = info["generation"]
+        self.collections[generation] += 1
+        self.paused_ms[generation] += elapsed
+        if self.channels:
+            self.channels[generation].record(elapsed, self.profiler.cycle)
+
+    def freeze(self) -> None:
+        if not self.managed:
+            return
+
+        # clear out startup garbage first, frozen objects are never collected
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+        SmartDashboard.putNumber("gc/frozen objects", gc.get_freeze_count())
+
+    def after_loop(self, elapsed: float) -> None:
+        if not self.managed:
+            return
+
+        young, middle, old = gc.get_count()
+        young_threshold, middle_threshold, old_threshold = self.thresholds
+
+        if DriverStation.isEnabled():
+            # a full collection is never worth it mid match. if there's been
+            # no spare time for a long while, collect anyway before memory runs away
+            if self.period - elapsed < self.spare and young < young_threshold * 10:
+                return
+            old = 0
+
+        if old >= old_threshold:
+            gc.collect(2)
+        elif middle >= middle_threshold:
+            gc.collect(1)
+        elif young >= young_threshold:
+            gc.collect(0)
@@ -0,0 +1,134 @@
+from array import array
+from math import pi, tau
+
+
+class TimeHistory:
+    """
+    a fixed-capacity ring of timestamped samples, for asking "what was this at time t".
+
+    every sample has the same number of float values (`width`). storage is two flat
+    preallocated arrays, lookups are a binary search plus a linear interpolation
+    between the two neighbouring samples, and nothing allocates after construction.
+
+    columns listed in `angular` hold angles in radians and interpolate the short way
+    around. lookups outside the recorded range clamp to the oldest/newest sample.
+
+    members
+    -------
+    `record(timestamp, *values)` to add a sample (timestamps must increase)
+    `sample(timestamp, column)` gets one interpolated value, or `None` if empty
+    `sample_into(timestamp, out)` writes every interpolated value into `out`
+    """
+
+    __slots__ = ("capacity", "width", "times", "values", "start", "count", "angular")
+
+    def __init__(self, capacity: int, width: int, angular: tuple[int, ...] = ()):
+        self.capacity = capacity
+        self.width = width
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity * width))
+        # physical index of the oldest sample
+        self.start = 0
+        self.count = 0
+        self.angular = frozenset(angular)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def clear(self) -> None:
+        self.start = 0
+        self.count = 0
+
+    def record(self, timestamp: float, *values: float) -> None:
+        capacity = self.capacity
+        count = self.count
+        # out of order samples would break the binary search
+        if count and timestamp <= self.times[(self.start + count - 1) % capacity]:
+            return
+
+        if count < capacity:
+            index = (self.start + count) % capacity
+            self.count = count + 1
+        else:
+            # full, overwrite the oldest
+            index = self.start
+            self.start = (index + 1) % capacity
+
+        self.times[index] = timestamp
+        stored = self.values
+        offset = index * self.width
+        for value in values:
+            stored[offset] = value
+            offset += 1
+
+    def oldest_timestamp(self) -> float | None:
+        return self.times[self.start] if self.count else None
+
+    def newest_timestamp(self) -> float | None:
+        if not self.count:
+            return None
+        return self.times[(self.start + self.count - 1) % self.capacity]
+
+    def _bracket(self, timestamp: float) -> tuple[int, int, float]:
+        """
+        find the physical indices of the samples around `timestamp`, and how far
+        between them it is (0 at the first, 1 at the second).
+        """
+        times = self.times
+        start = self.start
+        capacity = self.capacity
+        count = self.count
+
+        # binary search for the first sample at or after the timestamp
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) >> 1
+            if times[(start + middle) % capacity] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low == 0:
+            return start, start, 0.0
+        if low == count:
+            newest = (start + count - 1) % capacity
+            return newest, newest, 0.0
+
+        after = (start + low) % capacity
+        before = (start + low - 1) % capacity
+        span = times[after] - times[before]
+        return before, after, (timestamp - times[before]) / span
+
+    def _interpolate(self, before: int, after: int, t: float, column: int) -> float:
+        width = self.width
+        first = self.values[before * width + column]
+        if t == 0.0:
+            return first
+
+        delta = self.values[after * width + column] - first
+        if column in self.angular:
+            # go the short way around
+            delta = (delta + pi) % tau - pi
+        return first + delta * t
+
+    def sample(self, timestamp: float, column: int = 0) -> float | None:
+        """
+        get a single column interpolated at `timestamp`, or `None` if nothing is recorded.
+        """
+        if not self.count:
+            return None
+        before, after, t = self._bracket(timestamp)
+        return self._interpolate(before, after, t, column)
+
+    def sample_into(self, timestamp: float, out: array) -> bool:
+        """
+        write every column interpolated at `timestamp` into `out`.
+
+        returns `False` (and leaves `out` alone) if nothing is recorded.
+        """
+        if not self.count:
+            return False
+        before, after, t = self._bracket(timestamp)
+        for column in range(self.width):
+            out[column] = self._interpolate(before, after, t, column)
+        return True
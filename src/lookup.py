@@ -0,0 +1,43 @@
+from array import array
+from bisect import bisect_right
+from typing import Iterable
+
+
+class InterpolatingTable:
+    """
+    a table of measured points, looked up with linear interpolation between them.
+
+    points are sorted once when it's built. a lookup is a binary search for the
+    two neighbouring keys, and keys outside the table clamp to its first/last value.
+
+    members
+    -------
+    `get(key)` gets the interpolated value at `key`
+    """
+
+    __slots__ = ("keys", "values")
+
+    def __init__(self, points: Iterable[tuple[float, float]]):
+        ordered = sorted(points)
+        if not ordered:
+            raise ValueError("an interpolating table needs at least one point")
+        self.keys = array("d", (key for key, _ in ordered))
+        self.values = array("d", (value for _, value in ordered))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def get(self, key: float) -> float:
+        keys = self.keys
+        values = self.values
+        index = bisect_right(keys, key)
+        if index == 0:
+            return values[0]
+        if index == len(keys):
+            return values[-1]
+
+        # keys[index - 1] <= key < keys[index], so this never divides by zero
+        before = keys[index - 1]
+        fraction = (key - before) / (keys[index] - before)
+        value = values[index - 1]
+        return value + (values[index] - value) * fraction
@@ -0,0 +1,39 @@
+from typing import Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Mailbox(Generic[T]):
+    """
+    a single-slot, latest-value mailbox for handing data from one thread to another.
+
+    the writer replaces the slot with a `(sequence, value)` tuple in one assignment,
+    which is atomic in python, so neither side ever takes a lock or waits on the other.
+    the reader only gets values it hasn't seen yet; anything overwritten before it
+    was taken counts as skipped.
+
+    members
+    -------
+    `post(value)` to replace the value (writer thread only)
+    `take()` gets the newest value if it's new, otherwise `None` (reader thread only)
+    """
+
+    __slots__ = ("slot", "last_taken", "skipped")
+
+    def __init__(self):
+        self.slot: tuple[int, Optional[T]] = (0, None)
+        self.last_taken = 0
+        # values that were overwritten before anyone took them
+        self.skipped = 0
+
+    def post(self, value: T) -> None:
+        self.slot = (self.slot[0] + 1, value)
+
+    def take(self) -> Optional[T]:
+        sequence, value = self.slot
+        if sequence == self.last_taken:
+            return None
+
+        self.skipped += sequence - self.last_taken - 1
+        self.last_taken = sequence
+        return value
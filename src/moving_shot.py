@@ -0,0 +1,279 @@
+from array import array
+from hashlib import sha256
+from math import cos, hypot, sin
+from pathlib import Path
+from struct import Struct
+
+import msgspec
+from wpilib import reportWarning
+from wpimath.geometry import Pose2d
+
+from config import MovingShotConfig
+
+# a grid file is this header, then the lead grid and the rpm grid as float32s.
+# both are indexed [distance][radial speed][tangential speed]
+HEADER = Struct("<4sH32s3I4d")
+MAGIC = b"SHOT"
+VERSION = 1
+
+
+def axes(config: MovingShotConfig) -> tuple[int, int]:
+    """
+    how many distances and speeds the grid has cells for.
+    """
+    if config.max_distance <= config.min_distance:
+        raise ValueError("[moving_shot] max_distance has to be more than min_distance")
+    distances = (
+        round((config.max_distance - config.min_distance) / config.distance_step) + 1
+    )
+    # the same number of speeds either side of zero
+    speeds = 2 * round(config.max_speed / config.speed_step) + 1
+    return max(2, distances), max(3, speeds)
+
+
+def digest(config: MovingShotConfig, rpm_points: list[tuple[float, float]]) -> bytes:
+    """
+    a hash of everything the grid is solved from, so a stale file can be spotted.
+    """
+    inputs = (
+        config.min_distance,
+        config.max_distance,
+        config.distance_step,
+        config.max_speed,
+        config.speed_step,
+        config.iterations,
+        sorted(config.time_of_flight),
+        sorted(rpm_points),
+    )
+    return sha256(msgspec.json.encode(inputs)).digest()
+
+
+def generate(config: MovingShotConfig, rpm_points: list[tuple[float, float]]) -> bytes:
+    """
+    solve every cell of the grid and encode it in the grid file format.
+
+    the ball leaves with the robot's velocity on top of its own, so aiming at the
+    hub misses by however far the robot moves while the ball is in the air. this
+    aims at a virtual goal shifted back by that much instead. the shift depends on
+    the time of flight, which depends on the distance to the virtual goal, so
+    it's refined a few times.
+    """
+    # only needed here, the robot doesn't pay for importing it unless the file is stale
+    import numpy as np
+
+    distance_count, speed_count = axes(config)
+    speed_min = -config.speed_step * (speed_count // 2)
+
+    distances = config.min_distance + config.distance_step * np.arange(distance_count)
+    speeds = speed_min + config.speed_step * np.arange(speed_count)
+    distance, radial, tangential = np.meshgrid(distances, speeds, speeds, indexing="ij")
+
+    flight = np.array(sorted(config.time_of_flight), dtype=np.float64)
+    shots = np.array(sorted(rpm_points), dtype=np.float64)
+
+    # radial speed is towards the hub, tangential is to the left of it.
+    # in a frame with the hub straight ahead, the virtual goal is at (ahead, side)
+    ahead = distance
+    side = np.zeros_like(distance)
+    effective = distance
+    for _ in range(config.iterations):
+        time = np.interp(effective, flight[:, 0], flight[:, 1])
+        ahead = distance - radial * time
+        side = -tangential * time
+        effective = np.hypot(ahead, side)
+
+    lead = np.degrees(np.arctan2(side, ahead))
+    rpm = np.interp(effective, shots[:, 0], shots[:, 1])
+
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        digest(config, rpm_points),
+        distance_count,
+        speed_count,
+        speed_count,
+        config.min_distance,
+        config.distance_step,
+        speed_min,
+        config.speed_step,
+    )
+    return header + lead.astype("<f4").tobytes() + rpm.astype("<f4").tobytes()
+
+
+def is_current(
+    data: bytes, config: MovingShotConfig, rpm_points: list[tuple[float, float]]
+) -> bool:
+    """
+    whether `data` is a grid solved from this config.
+    """
+    if len(data) < HEADER.size:
+        return False
+    magic, version, file_digest, *_ = HEADER.unpack_from(data)
+    return (
+        magic == MAGIC
+        and version == VERSION
+        and file_digest == digest(config, rpm_points)
+    )
+
+
+def _cell(value: float, start: float, step: float, count: int) -> tuple[int, float]:
+    """
+    the cell `value` falls in along one axis, and how far through it.
+    values off either end are clamped to it.
+    """
+    position = (value - start) / step
+    if position <= 0.0:
+        return 0, 0.0
+    if position >= count - 1:
+        return count - 2, 1.0
+    index = int(position)
+    return index, position - index
+
+
+class MovingShot:
+    """
+    corrects shots for the robot's motion, from a grid solved ahead of time.
+
+    the grid is indexed by distance to the hub and the robot's speed towards and
+    across it, and holds the turret lead and flywheel rpm for each. a lookup
+    interpolates between the 8 cells around the robot's state, so nothing gets
+    solved while the robot runs.
+
+    members
+    -------
+    `update(pose, velocity, goal)` to work out this cycle's shot, call it once per cycle
+    `lead` how far (in degrees, positive is CCW) to turn the turret past the hub
+    `rpm` the flywheel speed for the shot
+    """
+
+    __slots__ = (
+        "data",
+        "distance_count",
+        "speed_count",
+        "distance_min",
+        "distance_step",
+        "speed_min",
+        "speed_step",
+        "rpm_offset",
+        "lead",
+        "rpm",
+    )
+
+    def __init__(self, data: bytes):
+        (
+            magic,
+            version,
+            _,
+            distance_count,
+            radial_count,
+            tangential_count,
+            self.distance_min,
+            self.distance_step,
+            self.speed_min,
+            self.speed_step,
+        ) = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION or radial_count != tangential_count:
+            raise ValueError(f"not a version {VERSION} moving shot grid")
+
+        self.distance_count = distance_count
+        self.speed_count = radial_count
+        cells = distance_count * radial_count * tangential_count
+        self.data = array("f", data[HEADER.size :])
+        if len(self.data) != 2 * cells:
+            raise ValueError("moving shot grid is the wrong size")
+        self.rpm_offset = cells
+
+        self.lead = 0.0
+        self.rpm = 0.0
+
+    def solve(self, distance: float, radial: float, tangential: float) -> None:
+        """
+        look up the shot for a distance (meters) to the hub and robot speeds (m/s)
+        towards it and to the left of it. sets `lead` and `rpm`.
+        """
+        speeds = self.speed_count
+        i, fd = _cell(
+            distance, self.distance_min, self.distance_step, self.distance_count
+        )
+        j, fr = _cell(radial, self.speed_min, self.speed_step, speeds)
+        k, ft = _cell(tangential, self.speed_min, self.speed_step, speeds)
+
+        data = self.data
+        # the 8 corners are this cell and the next one along each axis
+        base = (i * speeds + j) * speeds + k
+        next_d = speeds * speeds
+        corners = (
+            base,
+            base + 1,
+            base + speeds,
+            base + speeds + 1,
+            base + next_d,
+            base + next_d + 1,
+            base + next_d + speeds,
+            base + next_d + speeds + 1,
+        )
+        weights = (
+            (1 - fd) * (1 - fr) * (1 - ft),
+            (1 - fd) * (1 - fr) * ft,
+            (1 - fd) * fr * (1 - ft),
+            (1 - fd) * fr * ft,
+            fd * (1 - fr) * (1 - ft),
+            fd * (1 - fr) * ft,
+            fd * fr * (1 - ft),
+            fd * fr * ft,
+        )
+
+        rpm_offset = self.rpm_offset
+        lead = rpm = 0.0
+        for corner, weight in zip(corners, weights):
+            lead += data[corner] * weight
+            rpm += data[rpm_offset + corner] * weight
+        self.lead = lead
+        self.rpm = rpm
+
+    def update(self, pose: Pose2d, velocity: array, goal: tuple[float, float]) -> None:
+        """
+        work out the shot from `pose`, the robot relative `velocity` (vx, vy in m/s)
+        and the field position of the hub.
+        """
+        x = pose.X()
+        y = pose.Y()
+        dx = goal[0] - x
+        dy = goal[1] - y
+        distance = hypot(dx, dy)
+        if distance == 0.0:
+            self.solve(0.0, 0.0, 0.0)
+            return
+
+        # robot relative to field relative
+        heading = pose.rotation().radians()
+        c = cos(heading)
+        s = sin(heading)
+        vx = velocity[0] * c - velocity[1] * s
+        vy = velocity[0] * s + velocity[1] * c
+
+        # split along the direction to the hub, and 90 degrees CCW from it
+        ux = dx / distance
+        uy = dy / distance
+        self.solve(distance, vx * ux + vy * uy, vy * ux - vx * uy)
+
+
+def load_moving_shot(
+    path: Path, config: MovingShotConfig, rpm_points: list[tuple[float, float]]
+) -> MovingShot:
+    """
+    load the grid from `path`, solving (and trying to save) a new one if it's
+    missing or was solved from a different config.
+    """
+    data = path.read_bytes() if path.exists() else b""
+    if not is_current(data, config, rpm_points):
+        reportWarning(
+            f"moving shot: {path.name} is out of date, solving it now. "
+            "run `python tools/generate_moving_shot.py` and commit the result"
+        )
+        data = generate(config, rpm_points)
+        try:
+            path.write_bytes(data)
+        except OSError as error:
+            reportWarning(f"moving shot: couldn't save {path.name}: {error}")
+    return MovingShot(data)
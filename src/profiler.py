@@ -0,0 +1,249 @@
+from array import array
+from time import perf_counter
+from typing import Any, Callable, TypeVar
+
+from commands2 import Command, CommandScheduler, Subsystem
+from ntcore import NetworkTable, NetworkTableInstance
+
+from config import ProfilerConfig
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class TimingChannel:
+    """
+    timing samples (in milliseconds) for a single piece of loop code.
+
+    samples live in a preallocated ring buffer, so recording never allocates.
+    """
+
+    __slots__ = (
+        "samples",
+        "capacity",
+        "index",
+        "count",
+        "budget",
+        "overruns",
+        "blamed",
+        "last",
+        "last_cycle",
+        "blameable",
+        "publishers",
+    )
+
+    def __init__(
+        self,
+        table: NetworkTable,
+        capacity: int,
+        budget_ms: float,
+        blameable: bool = True,
+    ):
+        self.samples = array("d", bytes(8 * capacity))
+        self.capacity = capacity
+        self.index = 0
+        self.count = 0
+
+        # samples slower than the budget
+        self.budget = budget_ms
+        self.overruns = 0
+        # loop overruns where this channel was the slowest thing that ran
+        self.blamed = 0
+
+        self.last = 0.0
+        self.last_cycle = -1
+        # channels that wrap other channels shouldn't take the blame for them
+        self.blameable = blameable
+
+        self.publishers = (
+            table.getDoubleTopic("p50_ms").publish(),
+            table.getDoubleTopic("p99_ms").publish(),
+            table.getDoubleTopic("max_ms").publish(),
+            table.getIntegerTopic("overruns").publish(),
+            table.getIntegerTopic("blamed").publish(),
+            # p99 as a fraction of the budget
+            table.getDoubleTopic("budget_used").publish(),
+        )
+
+    def record(self, elapsed_ms: float, cycle: int) -> None:
+        self.samples[self.index] = elapsed_ms
+        self.index = (self.index + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+        if elapsed_ms > self.budget:
+            self.overruns += 1
+
+        self.last = elapsed_ms
+        self.last_cycle = cycle
+
+    def publish(self) -> None:
+        """
+        publish percentiles of the buffered samples. this sorts, so keep it out of every cycle.
+        """
+        if not self.count:
+            return
+
+        ordered = sorted(self.samples[: self.count])
+        last_index = self.count - 1
+        p50, p99, maximum, overruns, blamed, budget_used = self.publishers
+        slow = ordered[(last_index * 99) // 100]
+        p50.set(ordered[last_index // 2])
+        p99.set(slow)
+        budget_used.set(slow / self.budget)
+        maximum.set(ordered[last_index])
+        overruns.set(self.overruns)
+        blamed.set(self.blamed)
+
+
+class LoopProfiler:
+    """
+    times the main loop and everything that runs inside of it.
+
+    when disabled nothing gets wrapped, so the only cost left in the loop is
+    the two early returns in `begin_cycle()` and `end_cycle()`.
+
+    members
+    -------
+    `wrap(name, function)` to time a callable under its own channel
+    `instrument_subsystem(subsystem)` to time a subsystem's `periodic()`
+    `instrument_commands(scheduler)` to time every command's `execute()` as it gets scheduled
+    `begin_cycle()` and `end_cycle()` to time the whole loop
+    """
+
+    __slots__ = (
+        "enabled",
+        "table",
+        "capacity",
+        "channel_budget",
+        "channels",
+        "ordered",
+        "loop",
+        "cycle",
+        "cycle_start",
+        "cycles_per_publish",
+        "instrumented",
+    )
+
+    def __init__(self, config: ProfilerConfig, period: float):
+        self.enabled = config.enabled
+        self.table = NetworkTableInstance.getDefault().getTable("profiler")
+        self.capacity = config.sample_count
+        self.channel_budget = config.channel_budget_ms
+
+        self.channels: dict[str, TimingChannel] = {}
+        # the same channels, rebuilt only when one is added so publishing can index it
+        self.ordered: tuple[TimingChannel, ...] = ()
+        self.cycle = 0
+        self.cycle_start = 0.0
+        # every channel gets published once per interval, each on its own cycle
+        self.cycles_per_publish = max(1, round(config.publish_interval / period))
+        self.instrumented: set[int] = set()
+
+        # the whole loop is allowed the full period
+        self.loop = self.channel("loop", period * 1000.0, blameable=False)
+
+    def channel(
+        self, name: str, budget_ms: float | None = None, blameable: bool = True
+    ) -> TimingChannel:
+        """
+        get (or create) the channel with the given name.
+        """
+        if (channel := self.channels.get(name)) is None:
+            channel = TimingChannel(
+                self.table.getSubTable(name),
+                self.capacity,
+                self.channel_budget if budget_ms is None else budget_ms,
+                blameable,
+            )
+            self.channels[name] = channel
+            self.ordered = tuple(self.channels.values())
+        return channel
+
+    def wrap(
+        self,
+        name: str,
+        function: F,
+        blameable: bool = True,
+        budget_ms: float | None = None,
+    ) -> F:
+        """
+        time every call of `function` under the channel `name`.
+
+        pass `blameable=False` for functions that call other timed functions, or
+        run outside the main loop. returns `function` untouched when the profiler
+        is disabled.
+        """
+        if not self.enabled:
+            return function
+
+        record = self.channel(name, budget_ms, blameable).record
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record((perf_counter() - start) * 1000.0, self.cycle)
+
+        return timed  # type: ignore[return-value]
+
+    def instrument_subsystem(self, subsystem: Subsystem) -> None:
+        if not self.enabled:
+            return
+        subsystem.periodic = self.wrap(
+            f"{subsystem.getName()}.periodic", subsystem.periodic
+        )
+
+    def instrument_command(self, command: Command) -> None:
+        # default commands get initialized over and over, only wrap them once
+        if id(command) in self.instrumented:
+            return
+        self.instrumented.add(id(command))
+
+        # plenty of commands share a class name, so tell them apart by requirements
+        requirements = ",".join(
+            sorted(requirement.getName() for requirement in command.getRequirements())
+        )
+        command.execute = self.wrap(
+            f"{command.getName()}({requirements}).execute", command.execute
+        )
+
+    def instrument_commands(self, scheduler: CommandScheduler) -> None:
+        if not self.enabled:
+            return
+        scheduler.onCommandInitialize(self.instrument_command)
+
+    def begin_cycle(self) -> None:
+        if not self.enabled:
+            return
+        self.cycle_start = perf_counter()
+
+    def end_cycle(self) -> None:
+        if not self.enabled:
+            return
+
+        elapsed = (perf_counter() - self.cycle_start) * 1000.0
+        cycle = self.cycle
+        loop = self.loop
+        loop.record(elapsed, cycle)
+
+        if elapsed > loop.budget:
+            # blame whatever took the longest during this cycle
+            slowest = None
+            for channel in self.ordered:
+                if not channel.blameable or channel.last_cycle != cycle:
+                    continue
+                if slowest is None or channel.last > slowest.last:
+                    slowest = channel
+            if slowest is not None:
+                slowest.blamed += 1
+
+        # publish at most one channel per cycle to keep the sorting cost spread out.
+        # channels take turns, spaced so each comes up about once per interval.
+        # with more channels than cycles in an interval, they come up less often
+        ordered = self.ordered
+        spacing = max(1, self.cycles_per_publish // len(ordered))
+        if cycle % spacing == 0:
+            ordered[(cycle // spacing) % len(ordered)].publish()
+
+        self.cycle = cycle + 1
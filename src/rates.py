@@ -0,0 +1,51 @@
+from typing import Callable
+
+from wpilib import SmartDashboard, TimedRobot
+
+from config import RateConfig
+from src.profiler import LoopProfiler
+
+
+class RateSlots:
+    """
+    runs parts of the loop at their own rates, next to the main loop.
+
+    each slot runs on the robot's own notifier through `addPeriodic()`, so slots
+    never run at the same time as the main loop or each other. slot periods are
+    rounded to a whole number of main loops, and each slot is offset into its own
+    part of the main period, so no two slots (or a slot and the main loop) ever
+    start on the same tick.
+
+    with the profiler enabled, each slot is timed under `rate/<name>` against
+    its own budget. the rate and offset each slot ends up with are published
+    under `rates/`.
+
+    members
+    -------
+    `add(name, rate, callback)` to run `callback` at `rate`
+    `start()` to register every slot with the robot, once they're all added
+    """
+
+    __slots__ = ("robot", "profiler", "slots")
+
+    def __init__(self, robot: TimedRobot, profiler: LoopProfiler):
+        self.robot = robot
+        self.profiler = profiler
+        self.slots: list[tuple[str, RateConfig, Callable[[], None]]] = []
+
+    def add(self, name: str, rate: RateConfig, callback: Callable[[], None]) -> None:
+        self.slots.append((name, rate, callback))
+
+    def start(self) -> None:
+        main_period = self.robot.getPeriod()
+        count = len(self.slots)
+        for index, (name, rate, callback) in enumerate(self.slots):
+            loops = max(1, round(1.0 / (rate.hz * main_period)))
+            # the main loop sits at an offset of 0, share out the rest of its period
+            offset = main_period * (index + 1) / (count + 1)
+            timed = self.profiler.wrap(
+                f"rate/{name}", callback, blameable=False, budget_ms=rate.budget_ms
+            )
+            self.robot.addPeriodic(timed, main_period * loops, offset)
+            SmartDashboard.putNumber(f"rates/{name} hz", 1.0 / (main_period * loops))
+            SmartDashboard.putNumber(f"rates/{name} offset ms", offset * 1000.0)
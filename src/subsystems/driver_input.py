@@ -0,0 +1,169 @@
+from array import array
+
+from wpilib import DriverStation
+from wpimath.filter import SlewRateLimiter
+
+from config import DriverConfig
+
+# axes of an xbox controller
+LEFT_X, LEFT_Y, LEFT_TRIGGER, RIGHT_TRIGGER, RIGHT_X, RIGHT_Y = range(6)
+# buttons of an xbox controller, numbered from 1 like the driver station does
+(
+    A,
+    B,
+    X,
+    Y,
+    LEFT_BUMPER,
+    RIGHT_BUMPER,
+    BACK,
+    START,
+    LEFT_STICK,
+    RIGHT_STICK,
+) = range(1, 11)
+
+# the most axes the driver station reports for a single controller
+MAX_AXES = 12
+
+
+class ResponseCurve:
+    """
+    `|x| ** exponent` (keeping the sign of x), precomputed into a table.
+
+    members
+    -------
+    `apply(value)` gets the shaped value, for -1 to 1
+    """
+
+    __slots__ = ("table", "last")
+
+    def __init__(self, exponent: float, points: int):
+        self.last = points - 1
+        self.table = array(
+            "d", ((index / self.last) ** exponent for index in range(points))
+        )
+
+    def apply(self, value: float) -> float:
+        position = min(abs(value), 1.0) * self.last
+        index = int(position)
+        if index == self.last:
+            shaped = self.table[index]
+        else:
+            before = self.table[index]
+            shaped = before + (self.table[index + 1] - before) * (position - index)
+        return shaped if value >= 0 else -shaped
+
+
+def deadband(value: float, threshold: float) -> float:
+    """
+    zero inside the threshold, and rescaled outside of it so the output still
+    starts from 0 instead of jumping.
+
+    helps combat slight stick drift
+    """
+    magnitude = abs(value)
+    if magnitude <= threshold:
+        return 0.0
+    scaled = (magnitude - threshold) / (1.0 - threshold)
+    return scaled if value > 0 else -scaled
+
+
+class DriverInput:
+    """
+    the driver's controller, read exactly once at the start of each cycle.
+
+    every axis, the buttons and the pov are sampled together in `update()`, and
+    the drive inputs are shaped in the same pass: deadband, then the response
+    curve, then slew limiting. commands and triggers read from here instead of
+    the controller, so they all see the same input and nothing reads the
+    driver station twice.
+
+    members
+    -------
+    `update()` to read the controller, call it once at the start of a cycle
+    `forward`, `sideways` and `rotation` the shaped drive inputs, -1 to 1
+    `turret` the right stick's x for turning the turret by hand, 0 inside its deadband
+    `pressed(button)` whether a button is held, by its number
+    `axis(index)` gets an axis' raw value
+    `axes`, `axis_count`, `buttons` and `pov` the raw values, as the driver station reported them
+    """
+
+    __slots__ = (
+        "port",
+        "deadband",
+        "turret_deadband",
+        "curve",
+        "limiters",
+        "axes",
+        "axis_count",
+        "buttons",
+        "pov",
+        "forward",
+        "sideways",
+        "rotation",
+        "turret",
+    )
+
+    def __init__(self, port: int, config: DriverConfig):
+        self.port = port
+        self.deadband = config.deadband
+        self.turret_deadband = config.turret_deadband
+        self.curve = ResponseCurve(config.exponent, config.curve_points)
+        # forward, sideways and rotation
+        self.limiters: tuple[SlewRateLimiter, ...] = ()
+        if config.slew_rate > 0:
+            self.limiters = tuple(SlewRateLimiter(config.slew_rate) for _ in range(3))
+
+        self.axes = array("d", bytes(8 * MAX_AXES))
+        self.axis_count = 0
+        self.buttons = 0
+        self.pov = -1
+
+        self.forward = 0.0
+        self.sideways = 0.0
+        self.rotation = 0.0
+        self.turret = 0.0
+
+    def update(self) -> None:
+        port = self.port
+        axes = self.axes
+        count = min(DriverStation.getStickAxisCount(port), MAX_AXES)
+        for index in range(count):
+            axes[index] = DriverStation.getStickAxis(port, index)
+        # a controller that unplugged shouldn't leave its last values behind
+        for index in range(count, self.axis_count):
+            axes[index] = 0.0
+        self.axis_count = count
+        self.buttons = DriverStation.getStickButtons(port)
+        self.pov = (
+            DriverStation.getStickPOV(port, 0)
+            if DriverStation.getStickPOVCount(port)
+            else -1
+        )
+
+        threshold = self.deadband
+        curve = self.curve
+        forward = curve.apply(deadband(axes[LEFT_Y], threshold))
+        sideways = curve.apply(deadband(-axes[LEFT_X], threshold))
+        # holding the left trigger keeps the robot from turning
+        rotation = (
+            curve.apply(deadband(-axes[RIGHT_X], threshold))
+            if not axes[LEFT_TRIGGER] > 0.5
+            else 0.0
+        )
+        if self.limiters:
+            forward_limiter, sideways_limiter, rotation_limiter = self.limiters
+            forward = forward_limiter.calculate(forward)
+            sideways = sideways_limiter.calculate(sideways)
+            rotation = rotation_limiter.calculate(rotation)
+        self.forward = forward
+        self.sideways = sideways
+        self.rotation = rotation
+
+        turret = axes[RIGHT_X]
+        self.turret = turret if abs(turret) > self.turret_deadband else 0.0
+
+    def pressed(self, button: int) -> bool:
+        return bool((self.buttons >> (button - 1)) & 1)
+
+    def axis(self, index: int) -> float:
+        return self.axes[index]
@@ -1,28 +1,45 @@
-from math import copysign
 from typing import NamedTuple, Tuple
 
 from commands2 import Subsystem
-from rev import SparkLowLevel, SparkMax, SparkRelativeEncoder, SparkBaseConfig
-from wpilib import AnalogGyro, SmartDashboard, ADIS16470_IMU
+from rev import (
+    ClosedLoopSlot,
+    PersistMode,
+    ResetMode,
+    SparkClosedLoopController,
+    SparkLowLevel,
+    SparkMax,
+    SparkMaxConfig,
+    SparkRelativeEncoder,
+)
+from wpilib import SmartDashboard
 from wpilib.drive import MecanumDrive
-from wpimath.filter import SlewRateLimiter
+from wpimath.controller import SimpleMotorFeedforwardMeters
+from wpimath.geometry import Rotation2d
 from wpimath.kinematics import (
     ChassisSpeeds,
     MecanumDriveWheelPositions,
     MecanumDriveWheelSpeeds,
 )
 
-from config import MotorConfig
+from config import DrivetrainConfig, MotorConfig
 from constants import Chassis
+from src.subsystems.motors import MotorConfigurator
+from src.subsystems.sensors import SensorSnapshot
+
+# the sparks measure velocity in motor rpm
+RPM_PER_METER_PER_SECOND = 60.0 / Chassis.METERS_PER_ROTATION
 
 
 class Encoders(NamedTuple):
     """
     a simple structure to hold the drivetrain encoders.
 
+    these read the devices directly. the main loop should use the wheel
+    positions in `SensorSnapshot` instead, which are only read once per cycle.
+
     members
     -------
-    `get_wheel_positions()` gets the current wheel positions in rotations
+    `get_wheel_positions()` gets the current wheel positions in meters
     `get_wheel_speeds()` gets the current wheel speeds in RPM
     """
 
@@ -34,15 +51,23 @@ class Encoders(NamedTuple):
 
     def get_wheel_positions(self) -> MecanumDriveWheelPositions:
         """
-        get current wheel positions (in rotations)
+        get current wheel positions (in meters)
         """
         positions = MecanumDriveWheelPositions()
 
-        positions.frontRight = self.front_right_encoder.getPosition()
-        positions.frontLeft = self.front_left_encoder.getPosition()
+        positions.frontRight = (
+            self.front_right_encoder.getPosition() * Chassis.METERS_PER_ROTATION
+        )
+        positions.frontLeft = (
+            self.front_left_encoder.getPosition() * Chassis.METERS_PER_ROTATION
+        )
 
-        positions.rearRight = self.rear_right_encoder.getPosition()
-        positions.rearLeft = self.rear_left_encoder.getPosition()
+        positions.rearRight = (
+            self.rear_right_encoder.getPosition() * Chassis.METERS_PER_ROTATION
+        )
+        positions.rearLeft = (
+            self.rear_left_encoder.getPosition() * Chassis.METERS_PER_ROTATION
+        )
 
         return positions
 
@@ -64,8 +89,15 @@ class Drivetrain(Subsystem):
 
     members
     -------
-    `drive(forward, sideways, rotation)` to drive with controller inputs
+    `drive(forward, sideways, rotation)` to drive with shaped controller inputs
     `drive_relative(speeds)` to drive with a `ChassisSpeeds` object
+    `stop()` to stop all four wheels
+    `set_pid(kP, kI, kD)` to change the wheel velocity gains while running
+
+    with `velocity_control` enabled, both drive methods turn the requested motion
+    into wheel velocities, and each spark holds its wheel at that speed with its
+    own pid (running at 1 kHz, on top of a voltage feedforward). otherwise they
+    send duty cycles, so the speed sags with the battery.
     """
 
     # using slots gives faster lookups and better memory efficiency.
@@ -77,20 +109,30 @@ class Drivetrain(Subsystem):
         "rear_left",
         "encoders",
         "drivetrain",
-        "forward_limiter",
-        "sideways_limiter",
-        "gyro",
+        "sensors",
+        "field_relative",
+        "velocity_control",
+        "controllers",
+        "feedforward",
+        "commanded",
     )
 
     def __init__(
         self,
         config: MotorConfig,
-        gyro: ADIS16470_IMU | None,
+        sensors: SensorSnapshot,
+        motors: MotorConfigurator,
+        drive_config: DrivetrainConfig,
         motor_type=SparkLowLevel.MotorType.kBrushless,
     ):
         super().__init__()
 
-        self.gyro = gyro
+        # field relative driving only kicks in once the gyro is calibrated
+        self.sensors = sensors
+        self.field_relative = drive_config.field_relative
+        self.velocity_control = drive_config.velocity_control
+        # the last inputs passed to `drive()`, for logging
+        self.commanded = (0.0, 0.0, 0.0)
 
         # initialize motors
         self.front_right = SparkMax(config.front_right_port, motor_type)
@@ -100,7 +142,29 @@ class Drivetrain(Subsystem):
 
         self.rear_right = SparkMax(config.rear_right_port, motor_type)
         self.rear_left = SparkMax(config.rear_left_port, motor_type)
-        self.rear_left.setInverted(True)
+
+        # configured later, all at once with every other motor
+        settings = motors.config.drive
+        pid = drive_config.velocity_pid
+        for motor, inverted in (
+            (self.front_right, False),
+            (self.front_left, False),
+            (self.rear_right, False),
+            (self.rear_left, True),
+        ):
+            motors.add(motor, settings, inverted).closedLoop.pid(pid.kP, pid.kI, pid.kD)
+
+        # in `MecanumDriveWheelSpeeds` order
+        self.controllers: tuple[SparkClosedLoopController, ...] = (
+            self.front_left.getClosedLoopController(),
+            self.front_right.getClosedLoopController(),
+            self.rear_left.getClosedLoopController(),
+            self.rear_right.getClosedLoopController(),
+        )
+        # volts to hold a wheel at a speed, so the pid only fixes what's left over
+        self.feedforward = SimpleMotorFeedforwardMeters(
+            drive_config.kS, drive_config.kV
+        )
 
         # create encoder object
         self.encoders = Encoders(
@@ -109,6 +173,9 @@ class Drivetrain(Subsystem):
             self.rear_right.getEncoder(),
             self.rear_left.getEncoder(),
         )
+        sensors.track_drive(
+            self.front_right, self.front_left, self.rear_right, self.rear_left
+        )
 
         # initialize inner drivetrain
         self.drivetrain = MecanumDrive(
@@ -117,29 +184,33 @@ class Drivetrain(Subsystem):
         self.drivetrain.setExpiration(0.1)
         SmartDashboard.putData("drivetrain", self.drivetrain)
 
-        # initialize slew rate limiters to soften acceleration
-        self.forward_limiter = SlewRateLimiter(1, -9999999)
-        self.sideways_limiter = SlewRateLimiter(1, -9999999)
-
     def drive(self, x_speed: float, y_speed: float, z_rotation: float):
         """
-        drive the robot using controller inputs.
+        drive the robot using controller inputs, -1 to 1.
 
-        automatically applies ratelimits to x/y motion and softens rotation.
+        inputs are used as they are, shaping (deadband, response curve and slew
+        limiting) happens in `DriverInput`. drives field relative if enabled and
+        the gyro is ready, robot relative otherwise.
         """
+        self.commanded = (x_speed, y_speed, z_rotation)
+        angle = self.sensors.gyro_angle if self.field_relative else None
 
-        if self.gyro:
-            self.drivetrain.driveCartesian(
-                xSpeed=copysign(x_speed**2, x_speed),
-                ySpeed=copysign(y_speed**2, y_speed),
-                zRotation=copysign(z_rotation**2, z_rotation),
-                # gyroAngle=self.gyro.getRotation2d(),
+        if self.velocity_control:
+            vx = x_speed * Chassis.LINEAR_SPEED
+            vy = y_speed * Chassis.LINEAR_SPEED
+            omega = z_rotation * Chassis.ANGULAR_SPEED
+            self.set_wheel_speeds(
+                ChassisSpeeds(vx, vy, omega)
+                if angle is None
+                else ChassisSpeeds.fromFieldRelativeSpeeds(
+                    vx, vy, omega, Rotation2d.fromDegrees(angle)
+                )
             )
+        elif angle is None:
+            self.drivetrain.driveCartesian(x_speed, y_speed, z_rotation)
         else:
             self.drivetrain.driveCartesian(
-                xSpeed=copysign(x_speed**2, x_speed),
-                ySpeed=copysign(y_speed**2, y_speed),
-                zRotation=copysign(z_rotation**2, z_rotation),
+                x_speed, y_speed, z_rotation, Rotation2d.fromDegrees(angle)
             )
 
     @classmethod
@@ -157,6 +228,63 @@ class Drivetrain(Subsystem):
 
     def drive_relative(self, speeds: ChassisSpeeds):
         """
-        drives the robot using a pre-existing `ChassisSpeeds`.
+        drives the robot using a pre-existing robot relative `ChassisSpeeds`.
+
+        unlike `drive()` nothing gets squared or limited, the speeds are already
+        what the robot should do (e.g. from a trajectory follower).
+        """
+        x_speed, y_speed, z_rotation = self.normalize_chassis_speeds(speeds)
+        self.commanded = (x_speed, y_speed, z_rotation)
+        if self.velocity_control:
+            self.set_wheel_speeds(speeds)
+        else:
+            self.drivetrain.driveCartesian(x_speed, y_speed, z_rotation)
+
+    def set_wheel_speeds(self, speeds: ChassisSpeeds):
+        """
+        hand each spark the velocity its wheel needs for robot relative `speeds`.
+
+        if a wheel can't go that fast, every wheel slows down by the same ratio,
+        so the robot still moves in the requested direction.
+        """
+        wheel_speeds = Chassis.KINEMATICS.toWheelSpeeds(speeds)
+        wheel_speeds.desaturate(Chassis.LINEAR_SPEED)
+
+        front_left, front_right, rear_left, rear_right = self.controllers
+        self._set_wheel_speed(front_left, wheel_speeds.frontLeft)
+        self._set_wheel_speed(front_right, wheel_speeds.frontRight)
+        self._set_wheel_speed(rear_left, wheel_speeds.rearLeft)
+        self._set_wheel_speed(rear_right, wheel_speeds.rearRight)
+        # the motors are driven directly, so tell motor safety we're still here
+        self.drivetrain.feed()
+
+    def _set_wheel_speed(self, controller: SparkClosedLoopController, speed: float):
+        controller.setSetpoint(
+            speed * RPM_PER_METER_PER_SECOND,
+            SparkLowLevel.ControlType.kVelocity,
+            ClosedLoopSlot.kSlot0,
+            self.feedforward.calculate(speed),
+        )
+
+    def set_pid(self, kP: float, kI: float, kD: float) -> None:
         """
-        self.drive(*self.normalize_chassis_speeds(speeds))
+        change the gains of every wheel's onboard velocity controller while running.
+        """
+        spark_config = SparkMaxConfig()
+        spark_config.closedLoop.pid(kP, kI, kD)
+        # async so the loop doesn't wait on the sparks to acknowledge it
+        for motor in (
+            self.front_right,
+            self.front_left,
+            self.rear_right,
+            self.rear_left,
+        ):
+            motor.configureAsync(
+                spark_config,
+                ResetMode.kNoResetSafeParameters,
+                PersistMode.kNoPersistParameters,
+            )
+
+    def stop(self):
+        self.commanded = (0.0, 0.0, 0.0)
+        self.drivetrain.stopMotor()
@@ -0,0 +1,116 @@
+from enum import Enum
+from threading import Thread
+from time import monotonic, sleep
+from traceback import print_exc
+
+from wpilib import ADIS16470_IMU, RobotBase, SmartDashboard
+from wpimath.geometry import Rotation2d
+
+
+class CalibrationState(Enum):
+    PENDING = "pending"
+    CALIBRATING = "calibrating"
+    READY = "ready"
+    FAILED = "failed"
+
+
+def calibration_seconds(calibration_time: ADIS16470_IMU.CalibrationTime) -> float:
+    """
+    how long the IMU averages samples for a given calibration time setting.
+    """
+    # same formula wpilib uses: 2^n samples, decimated by 64 at 2 kHz
+    return (2 ** int(calibration_time)) / 2000 * 64
+
+
+class Gyro:
+    """
+    the ADIS16470, calibrated on a background thread so it never holds up robot startup.
+
+    until calibration finishes, `is_ready()` is `False` and `get_angle()` returns
+    `None`. anything that uses the gyro should fall back to working without it.
+
+    members
+    -------
+    `start_calibration()` to kick off calibration in the background
+    `is_ready()` to check if the gyro can be trusted yet
+    `get_angle()` gets the yaw in degrees (CCW positive), or `None` if not ready
+    `get_rotation()` gets the yaw as a `Rotation2d`, or `None` if not ready
+    """
+
+    __slots__ = ("imu", "state", "calibration_time", "started_at", "finished_at")
+
+    def __init__(
+        self,
+        calibration_time: ADIS16470_IMU.CalibrationTime = ADIS16470_IMU.CalibrationTime._1s,
+    ):
+        # the constructor talks to the IMU too, so it happens on the thread as well
+        self.imu: ADIS16470_IMU | None = None
+        self.state = CalibrationState.PENDING
+        self.calibration_time = calibration_time
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self._publish()
+
+    def start_calibration(self) -> None:
+        if self.state is CalibrationState.CALIBRATING:
+            return
+        self.started_at = monotonic()
+        self._set_state(CalibrationState.CALIBRATING)
+        Thread(target=self._calibrate, name="gyro calibration", daemon=True).start()
+
+    def _calibrate(self) -> None:
+        try:
+            if self.imu is None:
+                self.imu = ADIS16470_IMU()
+            imu = self.imu
+
+            # the simulated IMU has no SPI to talk to and doesn't drift
+            if RobotBase.isReal():
+                imu.configCalTime(self.calibration_time)
+                imu.calibrate()
+                # the IMU keeps averaging after `calibrate()` returns.
+                # give it an extra 10% like wpilib does
+                sleep(calibration_seconds(self.calibration_time) * 1.1)
+            imu.reset()
+
+            if not imu.isConnected():
+                raise RuntimeError("ADIS16470 is not connected")
+        except Exception:
+            print_exc()
+            self.finished_at = monotonic()
+            self._set_state(CalibrationState.FAILED)
+            return
+
+        self.finished_at = monotonic()
+        SmartDashboard.putData("gyro", imu)
+        # flip this last, it's what the main thread is watching
+        self._set_state(CalibrationState.READY)
+
+    def _set_state(self, state: CalibrationState) -> None:
+        self.state = state
+        self._publish()
+
+    def _publish(self) -> None:
+        SmartDashboard.putString("gyro calibration/state", self.state.value)
+        SmartDashboard.putNumber(
+            "gyro calibration/seconds",
+            max(0.0, self.finished_at - self.started_at),
+        )
+
+    def is_ready(self) -> bool:
+        return self.state is CalibrationState.READY
+
+    def get_angle(self) -> float | None:
+        """
+        get the yaw in degrees (CCW positive). `None` until calibration is done.
+        """
+        if self.state is not CalibrationState.READY:
+            return None
+        return self.imu.getAngle()  # type: ignore[union-attr]
+
+    def get_rotation(self) -> Rotation2d | None:
+        """
+        get the yaw as a `Rotation2d`. `None` until calibration is done.
+        """
+        angle = self.get_angle()
+        return None if angle is None else Rotation2d.fromDegrees(angle)
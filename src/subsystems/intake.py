@@ -1,48 +1,60 @@
-from wpilib import MotorControllerGroup
 from commands2 import Subsystem
 from rev import SparkLowLevel, SparkMax
-from wpimath.controller import PIDController
 
 from config import PIDMotorConfig
+from src.subsystems.motors import MotorConfigurator
+from src.subsystems.sensors import SensorSnapshot
 
 
 class Intake(Subsystem):
-    __slots__ = ("intake", "auto", "master")
-
-    def __init__(self, config: PIDMotorConfig):
+    __slots__ = (
+        "intake",
+        "upper_intake",
+        "auto",
+        "output",
+        "reading",
+        "upper_reading",
+    )
+
+    def __init__(
+        self,
+        config: PIDMotorConfig,
+        sensors: SensorSnapshot,
+        motors: MotorConfigurator,
+    ):
         self.intake = SparkMax(config.port, SparkLowLevel.MotorType.kBrushless)
-        self.upper_intake = SparkMax(10, SparkLowLevel.MotorType.kBrushless)
-        self.master = MotorControllerGroup(self.intake, self.upper_intake)
+        self.reading = sensors.track(self.intake)
+        motors.add(self.intake, motors.config.intake)
+
+        # the upper roller, if there is one, follows on the controller itself,
+        # so only one setpoint goes over CAN
+        self.upper_intake = None
+        self.upper_reading = None
+        if config.follower_port is not None:
+            self.upper_intake = SparkMax(
+                config.follower_port, SparkLowLevel.MotorType.kBrushless
+            )
+            self.upper_reading = sensors.track(self.upper_intake)
+            motors.add_follower(
+                self.upper_intake,
+                self.intake,
+                motors.config.follower,
+                config.follower_inverted,
+            )
 
         # this will be `True` when actively moving to a
         # setpoint and `False` otherwise
         self.auto = False
-
-        # this should become a ProfiledPIDController later
-        self.bcontroller = self.intake.getClosedLoopController()
-        # also these constants are entirely made up if you cant tell
-        pid_constants = config.pid
-        self.controller = PIDController(
-            pid_constants.kP, pid_constants.kI, pid_constants.kD
-        )
+        # the last duty cycle we set, for logging
+        self.output = 0.0
 
     def stop(self) -> None:
-        self.master.set(0)
+        self.output = 0.0
+        self.intake.set(0)
 
     def shoot(self, power: float = 0.5) -> None:
         """
         activate shooter
         """
-        self.master.set(power)
-
-    # def set_setpoint(self, setpoint: float) -> None:
-    #     self.bcontroller.setSetpoint(
-    #         setpoint, SparkLowLevel.ControlType.kVelocity
-    #     )
-
-    # def get_setpoint(self) -> float:
-    #     return self.controller.getSetpoint()
-
-    # def periodic(self) -> None:
-    #     measurement = self.intake.getEncoder().getPosition()
-    #     self.intake.set(self.controller.calculate(measurement))
+        self.output = power
+        self.intake.set(power)
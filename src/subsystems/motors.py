@@ -0,0 +1,156 @@
+from typing import NamedTuple
+
+from rev import PersistMode, ResetMode, SparkBaseConfig, SparkMax, SparkMaxConfig
+from wpilib import SmartDashboard, reportWarning
+
+from config import SparkConfig, SparksConfig
+
+IDLE_MODES = {
+    "brake": SparkBaseConfig.IdleMode.kBrake,
+    "coast": SparkBaseConfig.IdleMode.kCoast,
+}
+
+# an extended-id CAN frame with 8 data bytes, plus the gap between frames.
+# bit stuffing is ignored, so treat the estimate as a lower bound
+BITS_PER_FRAME = 131
+CAN_BITRATE = 1_000_000
+# past this, the sparks alone leave little of the bus for the gyro and the rest
+CAN_WARNING_UTILIZATION = 0.7
+
+# signals we never read get their frames slowed to this, in ms
+UNUSED_PERIOD_MS = 500
+
+
+class MotorEntry(NamedTuple):
+    motor: SparkMax
+    settings: SparkConfig
+    config: SparkMaxConfig
+    # followers don't get sent a setpoint every loop
+    follower: bool
+
+
+def build_config(settings: SparkConfig) -> SparkMaxConfig:
+    """
+    turn a motor's settings from `config.toml` into a `SparkMaxConfig`.
+    """
+    spark_config = SparkMaxConfig()
+    spark_config.setIdleMode(IDLE_MODES[settings.idle_mode])
+    spark_config.smartCurrentLimit(settings.current_limit)
+
+    signals = spark_config.signals
+    # status 0: everything `SparkReading` reads besides the encoder
+    signals.appliedOutputPeriodMs(settings.status_period_ms)
+    signals.busVoltagePeriodMs(settings.status_period_ms)
+    signals.outputCurrentPeriodMs(settings.status_period_ms)
+    # status 1
+    signals.faultsPeriodMs(settings.faults_period_ms)
+    signals.warningsPeriodMs(settings.faults_period_ms)
+    # status 2
+    signals.primaryEncoderPositionPeriodMs(settings.encoder_period_ms)
+    signals.primaryEncoderVelocityPeriodMs(settings.encoder_period_ms)
+
+    # nothing is plugged into the data port, so don't spend bus time on it
+    signals.analogPositionPeriodMs(UNUSED_PERIOD_MS)
+    signals.analogVelocityPeriodMs(UNUSED_PERIOD_MS)
+    signals.analogVoltagePeriodMs(UNUSED_PERIOD_MS)
+    signals.externalOrAltEncoderPosition(UNUSED_PERIOD_MS)
+    signals.externalOrAltEncoderVelocity(UNUSED_PERIOD_MS)
+    signals.absoluteEncoderPositionPeriodMs(UNUSED_PERIOD_MS)
+    signals.absoluteEncoderVelocityPeriodMs(UNUSED_PERIOD_MS)
+
+    return spark_config
+
+
+class MotorConfigurator:
+    """
+    sets up every SparkMax from `config.toml` in one go.
+
+    subsystems `add()` their motors when they're built. once everything exists,
+    `apply()` sends each controller its whole configuration in a single
+    `configure()` call (optionally persisted to flash), instead of a trickle of
+    individual setter calls.
+
+    members
+    -------
+    `add(motor, settings)` to register a motor, returns its config for extra tweaks
+    `add_follower(motor, leader, settings)` to register a motor that mirrors another
+    `apply()` to configure every registered motor, returns the ones that failed
+    `estimated_can_utilization(loop_period)` gets the fraction of the bus our sparks use
+    """
+
+    __slots__ = ("config", "entries")
+
+    def __init__(self, config: SparksConfig):
+        self.config = config
+        self.entries: list[MotorEntry] = []
+
+    def add(
+        self, motor: SparkMax, settings: SparkConfig, inverted: bool = False
+    ) -> SparkMaxConfig:
+        spark_config = build_config(settings)
+        spark_config.inverted(inverted)
+        self.entries.append(MotorEntry(motor, settings, spark_config, False))
+        return spark_config
+
+    def add_follower(
+        self,
+        motor: SparkMax,
+        leader: SparkMax,
+        settings: SparkConfig,
+        inverted: bool = False,
+    ) -> SparkMaxConfig:
+        """
+        make `motor` mirror `leader`'s output. `inverted` spins it the opposite way.
+        """
+        spark_config = build_config(settings)
+        spark_config.follow(leader, inverted)
+        self.entries.append(MotorEntry(motor, settings, spark_config, True))
+        return spark_config
+
+    def apply(self) -> list[int]:
+        """
+        configure every registered motor. returns the CAN ids that reported an error.
+        """
+        persist = (
+            PersistMode.kPersistParameters
+            if self.config.persist
+            else PersistMode.kNoPersistParameters
+        )
+
+        failed: list[int] = []
+        for entry in self.entries:
+            error = entry.motor.configure(
+                entry.config, ResetMode.kResetSafeParameters, persist
+            )
+            if error != error.kOk:
+                failed.append(entry.motor.getDeviceId())
+
+        if failed:
+            reportWarning(f"failed to configure sparks {failed}")
+        return failed
+
+    def estimated_can_utilization(self, loop_period: float) -> float:
+        """
+        rough fraction (0-1) of the CAN bus used by our sparks.
+
+        counts the three status frames we use from each controller, and one
+        setpoint frame per loop for every motor that isn't a follower.
+        """
+        frames_per_second = 0.0
+        for entry in self.entries:
+            settings = entry.settings
+            frames_per_second += 1000.0 / settings.status_period_ms
+            frames_per_second += 1000.0 / settings.faults_period_ms
+            frames_per_second += 1000.0 / settings.encoder_period_ms
+            if not entry.follower:
+                frames_per_second += 1.0 / loop_period
+
+        return frames_per_second * BITS_PER_FRAME / CAN_BITRATE
+
+    def report(self, loop_period: float) -> None:
+        utilization = self.estimated_can_utilization(loop_period)
+        SmartDashboard.putNumber("can/estimated utilization", utilization)
+        if utilization > CAN_WARNING_UTILIZATION:
+            reportWarning(
+                f"sparks alone are estimated to use {utilization:.1%} of the CAN bus"
+            )
@@ -1,42 +1,246 @@
-from wpilib import Field2d
+from array import array
+from typing import Iterable
+
+from wpilib import Field2d, Timer
 from wpimath.estimator import MecanumDrivePoseEstimator
-from wpimath.geometry import Pose2d, Rotation2d
+from wpimath.geometry import Pose2d, Rotation2d, Twist2d
 from wpimath.kinematics import MecanumDriveWheelPositions
 
 from constants import Chassis
+from src.history import TimeHistory
+from src.subsystems.odometry_sampler import (
+    FRONT_LEFT,
+    FRONT_RIGHT,
+    REAR_LEFT,
+    REAR_RIGHT,
+    TIME,
+    OdometrySampler,
+)
 from src.subsystems.vision import PhotonPoseEstimation
 
+# columns of `Odometry.history`. pose is field relative (meters, radians),
+# velocity is robot relative (m/s, rad/s)
+X, Y, HEADING, VX, VY, OMEGA = range(6)
+
 
 class Odometry:
-    __slots__ = ("pose_estimator", "field")
+    """
+    keeps track of where the robot is on the field.
+
+    works without a gyro: until one is available, heading comes from the wheels
+    alone. once a gyro angle shows up the estimator is re-anchored to it without
+    moving the current pose.
+
+    every update is also recorded into `history`, so latency compensation can ask
+    where the robot was (and how fast it was going) when a frame was captured.
+
+    with an `OdometrySampler`, `update_from_samples()` steps the estimator through
+    every sample taken since the last cycle instead of once per cycle. history
+    still gets one entry per cycle.
+
+    `velocity` holds the robot relative vx, vy (m/s) and omega (rad/s) averaged
+    over the last cycle.
+    """
+
+    __slots__ = (
+        "pose_estimator",
+        "field",
+        "using_gyro",
+        "wheel_heading",
+        "previous_positions",
+        "previous_timestamp",
+        "history",
+        "scratch",
+        "moved",
+        "sample_positions",
+        "velocity",
+    )
+
+    def __init__(self, starting_angle: float | None = None, history_size: int = 100):
+        """
+        `starting_angle` is the gyro angle in degrees, or `None` if the gyro isn't ready.
+        """
+        self.using_gyro = starting_angle is not None
+        self.wheel_heading = 0.0  # in radians
+        self.previous_positions = MecanumDriveWheelPositions()
+        self.previous_timestamp = 0.0
+        self.history = TimeHistory(history_size, 6, angular=(HEADING,))
+        self.scratch = array("d", bytes(8 * 6))
+        # how far the robot moved (robot relative) since the last history entry
+        self.moved = array("d", bytes(8 * 3))
+        self.velocity = array("d", bytes(8 * 3))
+        # reused for every replayed sample
+        self.sample_positions = MecanumDriveWheelPositions()
 
-    def __init__(self, starting_angle: float = 0):
         self.pose_estimator = MecanumDrivePoseEstimator(
             kinematics=Chassis.KINEMATICS,
-            gyroAngle=Rotation2d(starting_angle),
+            gyroAngle=Rotation2d.fromDegrees(starting_angle or 0),
             wheelPositions=MecanumDriveWheelPositions(),
             initialPose=Pose2d(),
         )
         self.field = Field2d()
 
-    def update_odometry(
+    def _integrate_wheels(self, wheel_positions: MecanumDriveWheelPositions) -> Twist2d:
+        """
+        work out how far the wheels moved since the last update, and keep the
+        wheel-only heading up to date.
+        """
+        previous = self.previous_positions
+        twist = Chassis.KINEMATICS.toTwist2d(previous, wheel_positions)
+        self.wheel_heading += twist.dtheta
+
+        previous.frontLeft = wheel_positions.frontLeft
+        previous.frontRight = wheel_positions.frontRight
+        previous.rearLeft = wheel_positions.rearLeft
+        previous.rearRight = wheel_positions.rearRight
+        return twist
+
+    def _step(
         self,
+        timestamp: float,
         wheel_positions: MecanumDriveWheelPositions,
-        angle: float,
-        vision_estimate: PhotonPoseEstimation | None,
+        angle: float | None,
+    ) -> None:
+        """
+        move the estimator forward to one set of wheel positions and gyro angle.
+        """
+        twist = self._integrate_wheels(wheel_positions)
+        moved = self.moved
+        moved[0] += twist.dx
+        moved[1] += twist.dy
+        moved[2] += twist.dtheta
+
+        if angle is None:
+            heading = Rotation2d(self.wheel_heading)
+        else:
+            heading = Rotation2d.fromDegrees(angle)
+            if not self.using_gyro:
+                # the gyro just came up. keep the pose we have and
+                # let the estimator work out the new gyro offset
+                self.pose_estimator.resetPosition(
+                    heading, wheel_positions, self.get_position()
+                )
+                self.using_gyro = True
+
+        self.pose_estimator.updateWithTime(timestamp, heading, wheel_positions)
+
+    def _finish(
+        self, timestamp: float, vision_estimates: Iterable[PhotonPoseEstimation]
     ) -> Pose2d:
-        # TODO: custom vision measurement type that bundles these together
-        if vision_estimate:
+        """
+        fuse this cycle's vision and record where the robot ended up.
+        """
+        # odometry has to be updated first so the estimator has
+        # history covering the time each frame was captured
+        for estimate in vision_estimates:
             self.pose_estimator.addVisionMeasurement(
-                vision_estimate.pose, vision_estimate.timestamp
+                estimate.pose, estimate.timestamp, estimate.std_devs
             )
-        result = self.pose_estimator.update(Rotation2d(angle), wheel_positions)
-        self.field.setRobotPose(result)
+        result = self.pose_estimator.getEstimatedPosition()
+
+        moved = self.moved
+        dt = timestamp - self.previous_timestamp
+        if self.previous_timestamp and dt > 0:
+            vx, vy, omega = moved[0] / dt, moved[1] / dt, moved[2] / dt
+        else:
+            vx = vy = omega = 0.0
+        moved[0] = moved[1] = moved[2] = 0.0
+        velocity = self.velocity
+        velocity[0], velocity[1], velocity[2] = vx, vy, omega
+        self.previous_timestamp = timestamp
+        self.history.record(
+            timestamp,
+            result.X(),
+            result.Y(),
+            result.rotation().radians(),
+            vx,
+            vy,
+            omega,
+        )
+
         return result
 
+    def update_odometry(
+        self,
+        wheel_positions: MecanumDriveWheelPositions,
+        angle: float | None,
+        vision_estimates: Iterable[PhotonPoseEstimation] = (),
+    ) -> Pose2d:
+        """
+        update the pose with new wheel positions (in meters) and the gyro angle (in degrees).
+
+        pass `None` as the angle while the gyro isn't ready. `vision_estimates` should be
+        oldest first; each one is fused at the time its frame was captured, weighted
+        by its std devs.
+        """
+        timestamp = Timer.getFPGATimestamp()
+        self._step(timestamp, wheel_positions, angle)
+        return self._finish(timestamp, vision_estimates)
+
+    def update_from_samples(
+        self,
+        sampler: OdometrySampler,
+        vision_estimates: Iterable[PhotonPoseEstimation] = (),
+    ) -> Pose2d:
+        """
+        like `update_odometry()`, but replays every sample the sampler took since
+        the last cycle instead of using a single reading.
+        """
+        positions = self.sample_positions
+        data = sampler.data
+        timestamp = 0.0
+        for sequence in sampler.drain():
+            offset = sampler.row(sequence)
+            timestamp = data[offset + TIME]
+            positions.frontLeft = data[offset + FRONT_LEFT]
+            positions.frontRight = data[offset + FRONT_RIGHT]
+            positions.rearLeft = data[offset + REAR_LEFT]
+            positions.rearRight = data[offset + REAR_RIGHT]
+            self._step(timestamp, positions, sampler.angle(offset))
+
+        if not timestamp:
+            # nothing new, e.g. before the sampler's first run
+            timestamp = Timer.getFPGATimestamp()
+        return self._finish(timestamp, vision_estimates)
+
+    def reset_position(
+        self,
+        pose: Pose2d,
+        wheel_positions: MecanumDriveWheelPositions,
+        angle: float | None,
+    ) -> None:
+        """
+        tell the estimator the robot is at `pose`, e.g. at the start of autonomous.
+        `angle` is the current gyro angle in degrees, or `None` if it isn't ready.
+        """
+        if angle is None:
+            self.wheel_heading = pose.rotation().radians()
+            heading = Rotation2d(self.wheel_heading)
+        else:
+            heading = Rotation2d.fromDegrees(angle)
+        self.pose_estimator.resetPosition(heading, wheel_positions, pose)
+        # the old poses would make latency compensation jump across the reset
+        self.history.clear()
+
     def get_position(self) -> Pose2d:
         return self.pose_estimator.getEstimatedPosition()
 
+    def get_position_at(self, timestamp: float) -> Pose2d | None:
+        """
+        where the robot was at `timestamp` (FPGA time, in seconds), from the recorded history.
+        """
+        sample = self.scratch
+        if not self.history.sample_into(timestamp, sample):
+            return None
+        return Pose2d(sample[X], sample[Y], Rotation2d(sample[HEADING]))
+
+    def sample_at(self, timestamp: float, out: array) -> bool:
+        """
+        write the pose and velocity at `timestamp` into `out`, indexed by the
+        column constants in this module. returns `False` if there's no history yet.
+        """
+        return self.history.sample_into(timestamp, out)
+
     def get_field(self) -> Field2d:
         """
         get the robot's current position as a Field2d
@@ -0,0 +1,123 @@
+from array import array
+from math import isnan, nan
+
+from rev import SparkRelativeEncoder
+from wpilib import Notifier, Timer
+
+from config import OdometryConfig
+from constants import Chassis
+from src.subsystems.gyro import Gyro
+
+# columns of a sample. wheel positions are in meters, the gyro angle is in
+# degrees (nan until the gyro is ready)
+TIME, FRONT_LEFT, FRONT_RIGHT, REAR_LEFT, REAR_RIGHT, GYRO = range(6)
+WIDTH = 6
+
+# rows the writer might be filling in while the loop reads. anything this close
+# to being overwritten gets skipped instead
+SAFETY_MARGIN = 2
+
+
+class OdometrySampler:
+    """
+    samples the drive encoders and gyro faster than the main loop, on a `Notifier`.
+
+    samples go into a preallocated ring that only this thread writes. the main
+    loop `drain()`s the new ones each cycle and replays them into odometry, so the
+    estimator sees every little turn without the loop reading anything extra.
+
+    the writer bumps `written` after a row is complete, and that single int is
+    all the two threads share, so neither ever waits on the other. if the loop
+    stalls long enough for the ring to lap it, the samples it missed are counted
+    in `overruns`.
+
+    the sparks only send new encoder positions every `encoder_period_ms`, so the
+    drive motors need a period at least as short as the sampling one.
+
+    members
+    -------
+    `start()` and `stop()` to run and stop sampling
+    `drain()` gets the sequence numbers of every sample since the last drain
+    `row(sequence)` gets where a sample starts in `data`
+    `angle(offset)` gets a sample's gyro angle, or `None` if the gyro wasn't ready
+    """
+
+    __slots__ = (
+        "encoders",
+        "gyro",
+        "period",
+        "capacity",
+        "data",
+        "written",
+        "read",
+        "overruns",
+        "notifier",
+    )
+
+    def __init__(
+        self,
+        config: OdometryConfig,
+        encoders: tuple[SparkRelativeEncoder, ...],
+        gyro: Gyro,
+    ):
+        """
+        `encoders` are the front left, front right, rear left and rear right drive encoders.
+        """
+        self.encoders = encoders
+        self.gyro = gyro
+        self.period = 1.0 / config.frequency
+
+        self.capacity = config.buffer_size
+        self.data = array("d", bytes(8 * WIDTH * self.capacity))
+        # samples ever written, and ever handed to the loop
+        self.written = 0
+        self.read = 0
+        self.overruns = 0
+
+        self.notifier = Notifier(self._sample)
+        self.notifier.setName("odometry sampler")
+
+    def start(self) -> None:
+        self.notifier.startPeriodic(self.period)
+
+    def stop(self) -> None:
+        self.notifier.stop()
+
+    def _sample(self) -> None:
+        front_left, front_right, rear_left, rear_right = self.encoders
+        angle = self.gyro.get_angle()
+
+        data = self.data
+        offset = (self.written % self.capacity) * WIDTH
+        data[offset + TIME] = Timer.getFPGATimestamp()
+        data[offset + FRONT_LEFT] = (
+            front_left.getPosition() * Chassis.METERS_PER_ROTATION
+        )
+        data[offset + FRONT_RIGHT] = (
+            front_right.getPosition() * Chassis.METERS_PER_ROTATION
+        )
+        data[offset + REAR_LEFT] = rear_left.getPosition() * Chassis.METERS_PER_ROTATION
+        data[offset + REAR_RIGHT] = (
+            rear_right.getPosition() * Chassis.METERS_PER_ROTATION
+        )
+        data[offset + GYRO] = nan if angle is None else angle
+        # publish the row only once it's complete
+        self.written += 1
+
+    def drain(self) -> range:
+        """
+        the sequence numbers of every sample since the last drain, oldest first.
+        """
+        written = self.written
+        start = max(self.read, written - self.capacity + SAFETY_MARGIN)
+        if start > self.read:
+            self.overruns += start - self.read
+        self.read = written
+        return range(start, written)
+
+    def row(self, sequence: int) -> int:
+        return (sequence % self.capacity) * WIDTH
+
+    def angle(self, offset: int) -> float | None:
+        angle = self.data[offset + GYRO]
+        return None if isnan(angle) else angle
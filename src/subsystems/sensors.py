@@ -0,0 +1,114 @@
+from rev import SparkMax
+from wpilib import Timer
+from wpimath.kinematics import MecanumDriveWheelPositions
+
+from constants import Chassis
+from src.subsystems.gyro import Gyro
+
+
+class SparkReading:
+    """
+    the values read from a single SparkMax during the last `SensorSnapshot.update()`.
+    """
+
+    __slots__ = (
+        "motor",
+        "encoder",
+        "position",
+        "velocity",
+        "applied_output",
+        "bus_voltage",
+        "current",
+    )
+
+    def __init__(self, motor: SparkMax):
+        self.motor = motor
+        self.encoder = motor.getEncoder()
+
+        # in rotations and RPM, unless the spark has conversion factors set
+        self.position = 0.0
+        self.velocity = 0.0
+        self.applied_output = 0.0  # duty cycle, -1 to 1
+        self.bus_voltage = 0.0  # in volts
+        self.current = 0.0  # in amps
+
+    def read(self) -> None:
+        motor = self.motor
+        encoder = self.encoder
+        self.position = encoder.getPosition()
+        self.velocity = encoder.getVelocity()
+        self.applied_output = motor.getAppliedOutput()
+        self.bus_voltage = motor.getBusVoltage()
+        self.current = motor.getOutputCurrent()
+
+
+class SensorSnapshot:
+    """
+    every sensor value the loop uses, read exactly once at the start of each cycle.
+
+    subsystems `track()` their motors when they're built and keep the returned
+    `SparkReading`, then read from it instead of the device. all storage is created
+    up front and updated in place, so a cycle doesn't allocate any objects.
+
+    members
+    -------
+    `track(motor)` gets the `SparkReading` that will hold a motor's values
+    `track_drive(front_right, front_left, rear_right, rear_left)` to also keep `wheel_positions` up to date
+    `update()` to read every device, call it once at the very start of a cycle
+    `gyro_angle` the yaw in degrees, `None` until the gyro is calibrated
+    `wheel_positions` the drivetrain wheel positions in meters
+    `timestamp` FPGA time (in seconds) of the last update
+    """
+
+    __slots__ = (
+        "gyro",
+        "readings",
+        "drive",
+        "wheel_positions",
+        "gyro_angle",
+        "timestamp",
+    )
+
+    def __init__(self, gyro: Gyro):
+        self.gyro = gyro
+        self.readings: list[SparkReading] = []
+        self.drive: tuple[SparkReading, ...] = ()
+
+        self.wheel_positions = MecanumDriveWheelPositions()
+        self.gyro_angle: float | None = None
+        self.timestamp = 0.0
+
+    def track(self, motor: SparkMax) -> SparkReading:
+        reading = SparkReading(motor)
+        self.readings.append(reading)
+        return reading
+
+    def track_drive(
+        self,
+        front_right: SparkMax,
+        front_left: SparkMax,
+        rear_right: SparkMax,
+        rear_left: SparkMax,
+    ) -> tuple[SparkReading, ...]:
+        self.drive = (
+            self.track(front_right),
+            self.track(front_left),
+            self.track(rear_right),
+            self.track(rear_left),
+        )
+        return self.drive
+
+    def update(self) -> None:
+        self.timestamp = Timer.getFPGATimestamp()
+
+        for reading in self.readings:
+            reading.read()
+        self.gyro_angle = self.gyro.get_angle()
+
+        if self.drive:
+            front_right, front_left, rear_right, rear_left = self.drive
+            positions = self.wheel_positions
+            positions.frontRight = front_right.position * Chassis.METERS_PER_ROTATION
+            positions.frontLeft = front_left.position * Chassis.METERS_PER_ROTATION
+            positions.rearRight = rear_right.position * Chassis.METERS_PER_ROTATION
+            positions.rearLeft = rear_left.position * Chassis.METERS_PER_ROTATION
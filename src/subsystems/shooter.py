@@ -1,43 +1,166 @@
 from commands2 import Subsystem
-from rev import SparkLowLevel, SparkMax
-from wpimath.controller import PIDController
+from rev import (
+    ClosedLoopSlot,
+    PersistMode,
+    ResetMode,
+    SparkLowLevel,
+    SparkMax,
+    SparkMaxConfig,
+)
+from wpilib import Timer
 
-from config import PIDMotorConfig
+from config import PIDMotorConfig, ShooterConfig
+from src.lookup import InterpolatingTable
+from src.subsystems.motors import MotorConfigurator
+from src.subsystems.sensors import SensorSnapshot
 
 
 class Shooter(Subsystem):
-    __slots__ = ("shooter", "auto")
+    """
+    the flywheel.
 
-    def __init__(self, config: PIDMotorConfig):
+    with `velocity_control`, the spark holds the flywheel at an rpm with its own
+    pid (plus a voltage feedforward), so shots don't change as the battery sags.
+    the rpm for a shot comes from the distance table in `config.toml`. without
+    it, the flywheel just runs at a duty cycle like it always has.
+
+    members
+    -------
+    `shoot(power)` to run at a duty cycle
+    `set_speed(rpm)` to hold the flywheel at a speed
+    `shoot_from(distance)` to spin up for a shot from `distance` meters away
+    `at_speed()` whether the flywheel is within tolerance of its setpoint
+    `ready_to_feed()` whether feeding a ball now would make a good shot
+    `spin_up_time` how long (in seconds) the last spin up took, `None` before the first
+    """
+
+    __slots__ = (
+        "shooter",
+        "follower",
+        "auto",
+        "output",
+        "reading",
+        "controller",
+        "velocity_control",
+        "table",
+        "kS",
+        "kV",
+        "tolerance",
+        "target_rpm",
+        "spin_up_started",
+        "spin_up_time",
+    )
+
+    def __init__(
+        self,
+        config: PIDMotorConfig,
+        control: ShooterConfig,
+        sensors: SensorSnapshot,
+        motors: MotorConfigurator,
+    ):
         self.shooter = SparkMax(config.port, SparkLowLevel.MotorType.kBrushless)
+        self.reading = sensors.track(self.shooter)
+        pid = config.pid
+        motors.add(self.shooter, motors.config.shooter).closedLoop.pid(
+            pid.kP, pid.kI, pid.kD
+        )
+
+        # a second flywheel motor, if there is one, just mirrors the first
+        self.follower = None
+        if config.follower_port is not None:
+            self.follower = SparkMax(
+                config.follower_port, SparkLowLevel.MotorType.kBrushless
+            )
+            motors.add_follower(
+                self.follower,
+                self.shooter,
+                motors.config.follower,
+                config.follower_inverted,
+            )
 
         # this will be `True` when actively moving to a
         # setpoint and `False` otherwise
         self.auto = False
+        # the last duty cycle we set, for logging. 0 in velocity control
+        self.output = 0.0
 
-        # this should become a ProfiledPIDController later
-        # also these constants are entirely made up if you cant tell
-        pid_constants = config.pid
-        self.controller = PIDController(
-            pid_constants.kP, pid_constants.kI, pid_constants.kD
-        )
+        self.controller = self.shooter.getClosedLoopController()
+        self.velocity_control = control.velocity_control
+        # rpm for each distance (in meters) to the hub
+        self.table = InterpolatingTable(control.table)
+        self.kS = control.kS
+        self.kV = control.kV
+        self.tolerance = control.tolerance
+
+        # what the spark is holding, 0 when it isn't in velocity control
+        self.target_rpm = 0.0
+        # FPGA time the current spin up started, `None` once it's at speed
+        self.spin_up_started: float | None = None
+        self.spin_up_time: float | None = None
 
     def stop(self) -> None:
+        self.output = 0.0
+        self.target_rpm = 0.0
+        self.spin_up_started = None
         self.shooter.set(0)
 
     def shoot(self, power: float = 1.0) -> None:
         """
         activate shooter
         """
+        self.output = power
+        self.target_rpm = 0.0
         self.shooter.set(power)
 
-    def set_setpoint(self, setpoint: float) -> None:
-        self.controller.setSetpoint(setpoint)
+    def set_speed(self, rpm: float) -> None:
+        """
+        hold the flywheel at `rpm` with the spark's velocity pid.
+        """
+        if self.target_rpm == 0.0 and rpm > 0.0:
+            self.spin_up_started = Timer.getFPGATimestamp()
+        self.target_rpm = rpm
+        # volts to keep it spinning at that speed, the pid only makes up the difference
+        feedforward = self.kS + self.kV * rpm if rpm > 0.0 else 0.0
+        self.output = 0.0
+        self.controller.setSetpoint(
+            rpm, SparkLowLevel.ControlType.kVelocity, ClosedLoopSlot.kSlot0, feedforward
+        )
+
+    def shoot_from(self, distance: float) -> None:
+        """
+        spin up for a shot at the hub from `distance` meters away. without
+        `velocity_control` this is the same as `shoot()`.
+        """
+        if self.velocity_control:
+            self.set_speed(self.table.get(distance))
+        else:
+            self.shoot()
+
+    def at_speed(self) -> bool:
+        target = self.target_rpm
+        return target > 0.0 and abs(self.reading.velocity - target) <= self.tolerance
+
+    def ready_to_feed(self) -> bool:
+        """
+        in velocity control, only once the flywheel is at speed. otherwise always,
+        there's no setpoint to wait for.
+        """
+        return not self.velocity_control or self.at_speed()
 
-    def get_setpoint(self) -> float:
-        return self.controller.getSetpoint()
+    def set_pid(self, kP: float, kI: float, kD: float) -> None:
+        """
+        change the gains of the onboard velocity controller while running.
+        """
+        spark_config = SparkMaxConfig()
+        spark_config.closedLoop.pid(kP, kI, kD)
+        # async so the loop doesn't wait on the spark to acknowledge it
+        self.shooter.configureAsync(
+            spark_config,
+            ResetMode.kNoResetSafeParameters,
+            PersistMode.kNoPersistParameters,
+        )
 
     def periodic(self) -> None:
-        # measurement = self.shooter.getEncoder().getPosition()
-        # self.shooter.set(self.controller.calculate(measurement))
-        ...
+        if self.spin_up_started is not None and self.at_speed():
+            self.spin_up_time = Timer.getFPGATimestamp() - self.spin_up_started
+            self.spin_up_started = None
@@ -0,0 +1,273 @@
+from math import atan2, degrees, hypot
+from typing import Iterable, Optional
+
+from photonlibpy.targeting import PhotonTrackedTarget
+from robotpy_apriltag import AprilTagFieldLayout
+from wpilib import DriverStation, Timer
+from wpimath.geometry import Pose2d
+
+from constants import AprilTagConstants
+
+
+def tag_mask(tag_ids: Iterable[int]) -> int:
+    """
+    pack tag ids into a bitmask, one bit per id.
+    """
+    mask = 0
+    for tag_id in tag_ids:
+        mask |= 1 << tag_id
+    return mask
+
+
+RED_MASK = tag_mask(AprilTagConstants.RED_HUB_TAGS)
+BLUE_MASK = tag_mask(AprilTagConstants.BLUE_HUB_TAGS)
+
+
+class TargetSelector:
+    """
+    picks which tag the turret should aim at.
+
+    only our alliance's hub tags count (both alliances' until the FMS tells us which
+    we are). the best target is the one closest to the camera's center, and the
+    current target is kept unless another one is clearly better, so the turret
+    doesn't thrash between two tags.
+
+    members
+    -------
+    `update_alliance()` to pick up alliance changes, call it once per cycle.
+    returns `True` if the alliance changed
+    `select(targets)` gets the target to aim at, or `None`
+    """
+
+    __slots__ = ("alliance", "valid_mask", "switch_ratio", "current_id")
+
+    def __init__(self, switch_margin: float):
+        """
+        `switch_margin` is how much closer to the center (as a fraction of the current
+        target's distance) another target has to be before we switch to it.
+        """
+        # compare squared distances, so no square roots are needed
+        self.switch_ratio = switch_margin * switch_margin
+        self.current_id = -1
+
+        self.alliance: Optional[DriverStation.Alliance] = None
+        self.valid_mask = RED_MASK | BLUE_MASK
+        self.update_alliance()
+
+    def update_alliance(self) -> bool:
+        alliance = DriverStation.getAlliance()
+        if alliance == self.alliance:
+            return False
+
+        self.alliance = alliance
+        if alliance == DriverStation.Alliance.kRed:
+            self.valid_mask = RED_MASK
+        elif alliance == DriverStation.Alliance.kBlue:
+            self.valid_mask = BLUE_MASK
+        else:
+            self.valid_mask = RED_MASK | BLUE_MASK
+        self.current_id = -1
+        return True
+
+    def select(
+        self, targets: Iterable[PhotonTrackedTarget]
+    ) -> Optional[PhotonTrackedTarget]:
+        valid_mask = self.valid_mask
+        current_id = self.current_id
+
+        best = None
+        best_score = 0.0
+        current = None
+        current_score = 0.0
+
+        for target in targets:
+            tag_id = target.fiducialId
+            # non-fiducial targets have an id of -1
+            if tag_id < 0 or not (valid_mask >> tag_id) & 1:
+                continue
+
+            yaw = target.yaw
+            pitch = target.pitch
+            score = yaw * yaw + pitch * pitch
+
+            if best is None or score < best_score:
+                best = target
+                best_score = score
+            if tag_id == current_id:
+                current = target
+                current_score = score
+
+        # stick with what we had unless the new one is clearly better
+        if current is not None and not best_score < current_score * self.switch_ratio:
+            return current
+
+        self.current_id = best.fiducialId if best is not None else -1
+        return best
+
+
+def tag_centroid(
+    layout: AprilTagFieldLayout, tag_ids: Iterable[int]
+) -> tuple[float, float]:
+    """
+    the average field position (x, y in meters) of a group of tags.
+    tags missing from the layout are skipped, but at least one has to be there.
+    """
+    tag_ids = tuple(tag_ids)
+    x = y = 0.0
+    count = 0
+    for tag_id in tag_ids:
+        if (pose := layout.getTagPose(tag_id)) is None:
+            continue
+        x += pose.X()
+        y += pose.Y()
+        count += 1
+    if count == 0:
+        raise ValueError(
+            f"none of the tags {sorted(tag_ids)} are in the field layout, "
+            "is it for a different year?"
+        )
+    return x / count, y / count
+
+
+def wrap_degrees(angle: float) -> float:
+    """
+    wrap an angle (in degrees) to -180..180.
+    """
+    return (angle + 180.0) % 360.0 - 180.0
+
+
+class HubAimer:
+    """
+    aims the turret at the hub from the robot's pose.
+
+    the hub positions are worked out once from the tags around them. the angle from
+    odometry is always the base, so the setpoint doesn't jump between cycles with
+    and without a new camera frame. a tag the camera sees only corrects it: the
+    difference between where the tag says the hub was and where odometry said it
+    was, both at the time the frame was captured. the correction is held until
+    the next frame, or until it's `correction_timeout` seconds old.
+
+    turret angles are in degrees, 0 is the front of the robot and positive is CCW.
+
+    members
+    -------
+    `set_alliance(alliance)` to choose which hub to aim at
+    `turret_angle(pose, lead)` gets the turret setpoint for a field-relative pose
+    `observe(target, pose, turret_angle, timestamp)` to correct the aim with a tag seen at `timestamp`
+    `distance(pose)` gets how far the hub is from a field-relative pose
+    """
+
+    __slots__ = (
+        "red_goal",
+        "blue_goal",
+        "goal",
+        "min_angle",
+        "max_angle",
+        "tag_positions",
+        "correction",
+        "correction_time",
+        "correction_timeout",
+    )
+
+    def __init__(
+        self,
+        layout: AprilTagFieldLayout,
+        min_angle: float,
+        max_angle: float,
+        correction_timeout: float,
+    ):
+        self.red_goal = tag_centroid(layout, AprilTagConstants.RED_HUB_TAGS)
+        self.blue_goal = tag_centroid(layout, AprilTagConstants.BLUE_HUB_TAGS)
+        # `None` until we know our alliance
+        self.goal: Optional[tuple[float, float]] = None
+
+        self.min_angle = min_angle
+        self.max_angle = max_angle
+
+        # field x, y of every hub tag, to work out where the hub is from one of them
+        self.tag_positions: dict[int, tuple[float, float]] = {}
+        for tag_id in AprilTagConstants.RED_HUB_TAGS + AprilTagConstants.BLUE_HUB_TAGS:
+            if (pose := layout.getTagPose(tag_id)) is not None:
+                self.tag_positions[tag_id] = (pose.X(), pose.Y())
+
+        self.correction = 0.0
+        self.correction_time = 0.0
+        self.correction_timeout = correction_timeout
+
+    def set_alliance(self, alliance: Optional[DriverStation.Alliance]) -> None:
+        if alliance == DriverStation.Alliance.kRed:
+            self.goal = self.red_goal
+        elif alliance == DriverStation.Alliance.kBlue:
+            self.goal = self.blue_goal
+        else:
+            self.goal = None
+
+    def goal_for(self, x: float) -> tuple[float, float]:
+        if self.goal is not None:
+            return self.goal
+
+        # no alliance yet, aim at whichever hub is closer.
+        # both hubs sit on the same line across the field, so comparing x is enough
+        red = self.red_goal
+        blue = self.blue_goal
+        return red if abs(red[0] - x) < abs(blue[0] - x) else blue
+
+    def distance(self, pose: Pose2d) -> float:
+        """
+        how far (in meters) the hub is from `pose`.
+        """
+        x = pose.X()
+        goal_x, goal_y = self.goal_for(x)
+        return hypot(goal_x - x, goal_y - pose.Y())
+
+    def hub_angle(self, pose: Pose2d) -> float:
+        """
+        the turret angle (in degrees, -180 to 180) that points at the hub from
+        `pose`, ignoring the turret's limits and any correction.
+        """
+        x = pose.X()
+        y = pose.Y()
+        goal_x, goal_y = self.goal_for(x)
+
+        field_angle = atan2(goal_y - y, goal_x - x)
+        return wrap_degrees(degrees(field_angle - pose.rotation().radians()))
+
+    def observe(
+        self,
+        target: PhotonTrackedTarget,
+        pose: Pose2d,
+        turret_angle: float,
+        timestamp: float,
+    ) -> None:
+        """
+        correct the aim with a hub tag seen at `timestamp` (FPGA time, in seconds).
+
+        `pose` and `turret_angle` are where the robot and turret were at that time.
+        """
+        if (tag := self.tag_positions.get(target.fiducialId)) is None:
+            return
+
+        # the tag isn't the middle of the hub. from where odometry puts the
+        # robot, work out how far around from the tag the hub is
+        x = pose.X()
+        y = pose.Y()
+        goal_x, goal_y = self.goal_for(x)
+        hub_from_tag = degrees(
+            atan2(goal_y - y, goal_x - x) - atan2(tag[1] - y, tag[0] - x)
+        )
+
+        # photonvision's yaw is positive to the right, turret angles are CCW
+        seen = turret_angle - target.getYaw() + hub_from_tag
+        self.correction = wrap_degrees(seen - self.hub_angle(pose))
+        self.correction_time = timestamp
+
+    def turret_angle(self, pose: Pose2d, lead: float = 0.0) -> float:
+        """
+        the turret angle (in degrees) that points at the hub from `pose`, within the turret's limits.
+
+        `lead` (in degrees) is added before limiting, for shooting while moving.
+        """
+        relative = self.hub_angle(pose) + lead
+        if Timer.getFPGATimestamp() - self.correction_time < self.correction_timeout:
+            relative += self.correction
+        return max(self.min_angle, min(self.max_angle, wrap_degrees(relative)))
@@ -1,48 +1,150 @@
-from photonlibpy.targeting import PhotonTrackedTarget
 from commands2 import Subsystem
-from rev import SparkLowLevel, SparkMax
+from rev import (
+    ClosedLoopSlot,
+    MAXMotionConfig,
+    PersistMode,
+    ResetMode,
+    SparkLowLevel,
+    SparkMax,
+    SparkMaxConfig,
+)
+from wpilib import Timer
 
-from config import PIDMotorConfig
+from config import PIDMotorConfig, TurretConfig
+from constants import TurretConstants
+from src.history import TimeHistory
+from src.subsystems.motors import MotorConfigurator
+from src.subsystems.sensors import SensorSnapshot
 
 
 class Turret(Subsystem):
+    """
+    the turret, in degrees from straight ahead (counterclockwise positive).
+
+    the spark does all the position control itself: its encoder reports degrees,
+    soft limits keep it inside `MIN_ANGLE_DEG`-`MAX_ANGLE_DEG` even if the code
+    asks for more, and with `motion_profile` it follows a MAXMotion trapezoid to
+    each setpoint instead of jumping at it.
+
+    members
+    -------
+    `set_position(angle)` to turn to an angle in degrees
+    `rotate(speed)` to turn at a duty cycle
+    `at_target()` whether it's settled on the last `set_position()`, for gating shots
+    `get_position()` gets this cycle's angle in degrees
+    """
+
     MIN_ANGLE_DEG = -90.0
     MAX_ANGLE_DEG = 90.0
 
-    def __init__(self, config: PIDMotorConfig):
+    def __init__(
+        self,
+        config: PIDMotorConfig,
+        control: TurretConfig,
+        sensors: SensorSnapshot,
+        motors: MotorConfigurator,
+        history_size: int = 100,
+    ):
         self.motor = SparkMax(config.port, SparkLowLevel.MotorType.kBrushless)
+        spark_config = motors.add(self.motor, motors.config.turret)
+
+        # positions in degrees and velocities in degrees per second from here on,
+        # for everything: readings, setpoints, soft limits and the profile
+        encoder = spark_config.encoder
+        encoder.positionConversionFactor(TurretConstants.DEGREES_PER_ROTATION)
+        encoder.velocityConversionFactor(TurretConstants.DEGREES_PER_ROTATION / 60)
+
+        soft_limit = spark_config.softLimit
+        soft_limit.forwardSoftLimit(self.MAX_ANGLE_DEG)
+        soft_limit.forwardSoftLimitEnabled(True)
+        soft_limit.reverseSoftLimit(self.MIN_ANGLE_DEG)
+        soft_limit.reverseSoftLimitEnabled(True)
+
+        pid = config.pid
+        spark_config.closedLoop.pid(pid.kP, pid.kI, pid.kD)
+        profile = spark_config.closedLoop.maxMotion
+        profile.cruiseVelocity(control.max_velocity)
+        profile.maxAcceleration(control.max_acceleration)
+        profile.positionMode(
+            MAXMotionConfig.MAXMotionPositionMode.kMAXMotionTrapezoidal
+        )
+        self.control_type = (
+            SparkLowLevel.ControlType.kMAXMotionPositionControl
+            if control.motion_profile
+            else SparkLowLevel.ControlType.kPosition
+        )
+        self.tolerance = control.tolerance
+        self.velocity_tolerance = control.velocity_tolerance
 
+        # the turret has no absolute encoder, so it has to start pointing straight ahead
         self.encoder = self.motor.getEncoder()
-        self.encoder_offset = self.encoder.getPosition()
+        self.encoder.setPosition(0)
+        # refreshed once per cycle by the snapshot
+        self.reading = sensors.track(self.motor)
 
         self.controller = self.motor.getClosedLoopController()
+        # what we last asked for, for logging. only one is in use at a time
+        self.commanded_speed = 0.0
+        self.commanded_angle: float | None = None
+
+        # where the turret was pointing each cycle, for latency compensation
+        self.history = TimeHistory(history_size, 1)
 
     def set_position(self, angle: float):
         """
         set the position of the turret. takes an angle in degrees.
         """
-        self.controller.setSetpoint(angle, SparkLowLevel.ControlType.kPosition)
+        self.commanded_speed = 0.0
+        self.commanded_angle = angle
+        self.controller.setSetpoint(angle, self.control_type, ClosedLoopSlot.kSlot0)
+
+    def set_pid(self, kP: float, kI: float, kD: float) -> None:
+        """
+        change the gains of the onboard position controller while running.
+        """
+        spark_config = SparkMaxConfig()
+        spark_config.closedLoop.pid(kP, kI, kD)
+        # async so the loop doesn't wait on the spark to acknowledge it
+        self.motor.configureAsync(
+            spark_config,
+            ResetMode.kNoResetSafeParameters,
+            PersistMode.kNoPersistParameters,
+        )
 
     def get_position(self) -> float:
+        return self.reading.position
+
+    def at_target(self) -> bool:
+        """
+        whether the turret is within `tolerance` of the last `set_position()` angle,
+        and has stopped moving. always false while it's being turned by hand.
+        """
+        target = self.commanded_angle
+        reading = self.reading
         return (
-            self.encoder.getPosition() - self.encoder_offset
-        )  # TODO: need to set up conversion
+            target is not None
+            and abs(reading.position - target) <= self.tolerance
+            and abs(reading.velocity) <= self.velocity_tolerance
+        )
+
+    def get_position_at(self, timestamp: float) -> float:
+        """
+        where the turret was at `timestamp` (FPGA time, in seconds).
+
+        falls back to the current position if nothing has been recorded yet.
+        """
+        position = self.history.sample(timestamp)
+        return self.get_position() if position is None else position
 
     def rotate(self, speed: float):
+        self.commanded_speed = speed
+        self.commanded_angle = None
         self.motor.set(speed)
 
     def stop(self):
+        self.commanded_speed = 0.0
+        self.commanded_angle = None
         self.motor.stopMotor()
 
-    def aim_at_target(self, target: PhotonTrackedTarget):
-        yaw_deg: int | float = target.getYaw()
-        current_angle = self.get_position()
-
-        # if the current moves the wrong way move this to current_angle - yaw_deg.
-        desired_angle = max(
-            self.MIN_ANGLE_DEG, min(self.MAX_ANGLE_DEG, current_angle + yaw_deg)
-        )
-        self.set_position(desired_angle)
-
-    # def periodic(self):
-    #     self.motor.set(self.controller.calculate(self.get_position()))
+    def periodic(self):
+        self.history.record(Timer.getFPGATimestamp(), self.get_position())
@@ -1,54 +1,464 @@
-from typing import NamedTuple, Optional
+from collections import deque
+from math import radians, sqrt
+from operator import attrgetter
+from threading import Thread
+from time import sleep
+from typing import Callable, NamedTuple, Optional
 
-from photonlibpy import EstimatedRobotPose, PhotonCamera, PhotonPoseEstimator
+from photonlibpy import PhotonCamera, PhotonPoseEstimator
 from photonlibpy.targeting import PhotonPipelineResult, PhotonTrackedTarget
 from robotpy_apriltag import AprilTagField, AprilTagFieldLayout
-from wpimath.geometry import Pose2d
+from wpilib import reportWarning
+from wpimath.geometry import Pose2d, Rotation3d, Transform3d, Translation3d
 
-from constants import Chassis
+from config import CameraConfig, PhotonVisionConfig
+from src.mailbox import Mailbox
 
 
 class PhotonPoseEstimation(NamedTuple):
     pose: Pose2d
     timestamp: float
+    # how much to trust it: x and y in meters, heading in radians
+    std_devs: tuple[float, float, float]
 
-    @classmethod
-    def from_estimation(cls, estimate: EstimatedRobotPose):
-        return cls(
-            pose=estimate.estimatedPose.toPose2d(),
-            timestamp=estimate.timestampSeconds,
+
+def camera_distance(target: PhotonTrackedTarget) -> float:
+    """
+    how far (in meters) a target is from the camera that saw it.
+    """
+    to_target = target.bestCameraToTarget
+    return sqrt(
+        to_target.x * to_target.x
+        + to_target.y * to_target.y
+        + to_target.z * to_target.z
+    )
+
+
+def robot_to_camera(config: CameraConfig) -> Transform3d:
+    return Transform3d(
+        Translation3d(config.x, config.y, config.z),
+        Rotation3d(radians(config.roll), radians(config.pitch), radians(config.yaw)),
+    )
+
+
+class EstimateWeighting:
+    """
+    works out how much odometry should trust a vision estimate.
+
+    more tags make a better solve, and every tag gets noisier the further away it
+    is, so the std devs start from the single or multi tag values and grow with
+    the square of the average tag distance. single tags that are too far away
+    aren't worth using at all.
+
+    for multi tag solves, distances are measured from where the solve put the
+    camera to the tags' field positions, which are plain floats looked up by id.
+    going through each target's transform costs about a microsecond per tag.
+
+    members
+    -------
+    `std_devs(targets, camera)` gets the std devs for an estimate, `None` to reject it
+    """
+
+    __slots__ = (
+        "single_tag",
+        "multi_tag",
+        "distance_scale",
+        "single_tag_max_distance",
+        "tag_positions",
+    )
+
+    def __init__(self, config: PhotonVisionConfig, layout: AprilTagFieldLayout):
+        self.single_tag = config.single_tag_std_devs
+        self.multi_tag = config.multi_tag_std_devs
+        self.distance_scale = config.distance_scale
+        self.single_tag_max_distance = config.single_tag_max_distance
+
+        # indexed by tag id, `None` for ids the field doesn't have
+        tags = layout.getTags()
+        self.tag_positions: list[Optional[tuple[float, float, float]]] = [None] * (
+            max((tag.ID for tag in tags), default=0) + 1
         )
+        for tag in tags:
+            pose = tag.pose
+            self.tag_positions[tag.ID] = (pose.X(), pose.Y(), pose.Z())
 
+    def _multi_tag_distance(
+        self, targets: list[PhotonTrackedTarget], camera: Transform3d
+    ) -> float:
+        camera_x = camera.x
+        camera_y = camera.y
+        camera_z = camera.z
+        positions = self.tag_positions
+        known = len(positions)
 
-class Vision:
-    __slots__ = ("camera", "pose_estimator")
+        total_distance = 0.0
+        for target in targets:
+            tag_id = target.fiducialId
+            position = positions[tag_id] if 0 <= tag_id < known else None
+            if position is None:
+                total_distance += camera_distance(target)
+                continue
+            tag_x, tag_y, tag_z = position
+            dx = tag_x - camera_x
+            dy = tag_y - camera_y
+            dz = tag_z - camera_z
+            total_distance += sqrt(dx * dx + dy * dy + dz * dz)
+        return total_distance / len(targets)
+
+    def std_devs(
+        self, targets: list[PhotonTrackedTarget], camera: Optional[Transform3d]
+    ) -> Optional[tuple[float, float, float]]:
+        """
+        `targets` are every target in the frame. `camera` is where the multi tag
+        solve put the camera on the field, or `None` if there wasn't one and only
+        the least ambiguous target was used.
+        """
+        if camera is not None:
+            distance = self._multi_tag_distance(targets, camera)
+            x, y, heading = self.multi_tag
+        else:
+            # the same target photonlib picks for a single tag estimate
+            best = None
+            for target in targets:
+                ambiguity = target.poseAmbiguity
+                if ambiguity != -1 and (best is None or ambiguity < best.poseAmbiguity):
+                    best = target
+            if best is None:
+                return None
+            distance = camera_distance(best)
+            if distance > self.single_tag_max_distance:
+                return None
+            x, y, heading = self.single_tag
+
+        scale = 1.0 + distance * distance / self.distance_scale
+        return (x * scale, y * scale, heading * scale)
+
+
+class VisionWorker:
+    """
+    reads one camera and estimates poses on its own thread.
+
+    the newest frame goes through a latest-value `Mailbox`, and every estimate goes
+    into a bounded queue, which can be shared with the other cameras' workers. if
+    the main loop falls behind, the oldest estimates are dropped and counted in
+    `dropped`.
+
+    an exception from photonlib or the estimator is counted in `errors` and the
+    worker keeps polling, so one bad frame doesn't end vision for the match.
+
+    members
+    -------
+    `start()` and `stop()` to run and join the thread
+    `take_latest()` gets the newest frame if there's a new one (main thread)
+    """
 
-    def __init__(self, camera_name: str):
-        self.camera = PhotonCamera(camera_name)
-        self.pose_estimator = PhotonPoseEstimator(
-            AprilTagFieldLayout.loadField(AprilTagField.kDefaultField),
-            Chassis.CAMERA_POSITION,
+    __slots__ = (
+        "camera",
+        "estimate_result",
+        "poll_period",
+        "latest",
+        "estimates",
+        "dropped",
+        "errors",
+        "last_error",
+        "running",
+        "thread",
+    )
+
+    def __init__(
+        self,
+        camera: PhotonCamera,
+        estimate_result: Callable[
+            [PhotonPipelineResult], Optional[PhotonPoseEstimation]
+        ],
+        estimates: deque[PhotonPoseEstimation],
+        poll_period: float,
+    ):
+        self.camera = camera
+        self.estimate_result = estimate_result
+        self.poll_period = poll_period
+
+        self.latest: Mailbox[PhotonPipelineResult] = Mailbox()
+        self.estimates = estimates
+        # only this worker's thread writes these
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = ""
+
+        self.running = False
+        self.thread: Thread | None = None
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+        self.running = True
+        self.thread = Thread(
+            target=self._run, name=f"vision worker {self.camera.getName()}", daemon=True
         )
+        self.thread.start()
 
-    def estimate_position(self) -> Optional[PhotonPoseEstimation]:
+    def stop(self) -> None:
+        if self.thread is None:
+            return
+        self.running = False
+        self.thread.join()
+        self.thread = None
+
+    def _run(self) -> None:
+        while self.running:
+            try:
+                self._poll()
+            except Exception as error:
+                self.errors += 1
+                # the same error every poll would flood the console
+                message = repr(error)
+                if message != self.last_error:
+                    self.last_error = message
+                    reportWarning(
+                        f"vision: {self.camera.getName()} worker error: {message}"
+                    )
+            sleep(self.poll_period)
+
+    def _poll(self) -> None:
+        estimates = self.estimates
+        results = self.camera.getAllUnreadResults()
+        if not results:
+            return
+        results.sort(key=PhotonPipelineResult.getTimestampSeconds)
+        for result in results:
+            if estimation := self.estimate_result(result):
+                # a full deque silently pushes out the oldest entry
+                if len(estimates) == estimates.maxlen:
+                    self.dropped += 1
+                estimates.append(estimation)
+        self.latest.post(results[-1])
+
+    def take_latest(self) -> Optional[PhotonPipelineResult]:
+        return self.latest.take()
+
+
+class Camera:
+    """
+    one camera, with its own pose estimator (it knows where the camera is on the
+    robot) and the frames it read this cycle.
+
+    members
+    -------
+    `read()` to get this camera's unread frames, oldest first, into `results`
+    `estimate_result(result)` to estimate the robot pose from one of its frames
+    """
+
+    __slots__ = ("index", "camera", "pose_estimator", "weighting", "results", "worker")
+
+    def __init__(
+        self,
+        index: int,
+        config: CameraConfig,
+        field_layout: AprilTagFieldLayout,
+        weighting: EstimateWeighting,
+    ):
+        self.index = index
+        self.camera = PhotonCamera(config.name)
+        self.pose_estimator = PhotonPoseEstimator(field_layout, robot_to_camera(config))
+        self.weighting = weighting
+        self.results: list[PhotonPipelineResult] = []
+        self.worker: VisionWorker | None = None
+
+    def read(self) -> list[PhotonPipelineResult]:
+        results = self.camera.getAllUnreadResults()
+        # frames come in the order they arrived, make sure it's the order they were taken
+        if len(results) > 1:
+            results.sort(key=PhotonPipelineResult.getTimestampSeconds)
+        self.results = results
+        return results
+
+    def estimate_result(
+        self, result: PhotonPipelineResult
+    ) -> Optional[PhotonPoseEstimation]:
         """
-        estimate the current position based on the most recent photonvision result.
+        estimate the robot position from a single frame.
+
+        prefers the coprocessor's multi-tag solve, and falls back to the least ambiguous
+        single tag when only one is visible.
         """
-        if not (result := self.get_latest_result()):
+        estimation = self.pose_estimator.estimateCoprocMultiTagPose(result)
+        camera = None
+        if estimation is not None:
+            # field to camera, the transform photonlib built the estimate from
+            camera = result.multitagResult.estimatedPose.best  # type: ignore[union-attr]
+        else:
+            estimation = self.pose_estimator.estimateLowestAmbiguityPose(result)
+            if estimation is None:
+                return None
+
+        # photonlib lists every target in the frame as used, even for one tag
+        std_devs = self.weighting.std_devs(estimation.targetsUsed, camera)
+        if std_devs is None:
             return None
+        return PhotonPoseEstimation(
+            estimation.estimatedPose.toPose2d(), estimation.timestampSeconds, std_devs
+        )
 
-        estimation = self.pose_estimator.estimateCoprocMultiTagPose(result)
 
-        return PhotonPoseEstimation.from_estimation(estimation) if estimation else None
+class Vision:
+    """
+    reads every camera once per cycle and caches what they got.
+
+    `update()` must be called exactly once per cycle, before anything reads from
+    vision. every other method only looks at the cache, so any number of
+    consumers can share the same frames.
+
+    each camera is handled on its own, with its own place on the robot. in
+    threaded mode every camera gets a `VisionWorker`, so they read and estimate in
+    parallel off the main thread (photonlib mostly waits on networktables, which
+    lets go of the GIL), and `update()` only picks up what they produced. in that
+    mode each camera's cache holds just its newest frame, plus every estimate
+    since the last cycle.
+
+    either way, the work done in the loop grows with the number of new frames.
+    a camera that has nothing new costs one empty read.
+
+    members
+    -------
+    `update()` to read every camera and estimate a pose for every new frame
+    `set_threaded(threaded)` to switch between threaded and synchronous mode
+    `cameras` every camera, in the order of `[[vision.cameras]]`
+    `get_estimates()` gets every pose estimate from this cycle, oldest first
+    `estimate_position()` gets the newest pose estimate from this cycle
+    `get_latest_result()` gets the newest frame from the aiming camera this cycle
+    `get_latest_targets()` gets the targets in that frame
+    `dropped()` and `skipped()` count what the workers lost to a slow loop
+    `errors()` counts exceptions the workers caught
+    """
+
+    __slots__ = (
+        "field_layout",
+        "cameras",
+        "estimates",
+        "queue",
+        "threaded",
+        "poll_period",
+    )
+
+    def __init__(self, config: PhotonVisionConfig):
+        self.field_layout = AprilTagFieldLayout.loadField(AprilTagField.kDefaultField)
+        weighting = EstimateWeighting(config, self.field_layout)
+        self.cameras = tuple(
+            Camera(index, camera, self.field_layout, weighting)
+            for index, camera in enumerate(config.cameras)
+        )
+
+        self.estimates: list[PhotonPoseEstimation] = []
+        # every worker pushes into this one, so collecting doesn't look at each camera
+        self.queue: deque[PhotonPoseEstimation] = deque(maxlen=config.queue_size)
+
+        self.poll_period = config.poll_period
+        self.threaded = False
+        self.set_threaded(config.threaded)
+
+    def set_threaded(self, threaded: bool) -> None:
+        """
+        switch between estimating on the worker threads and in the main loop.
+        """
+        # the cameras and estimators aren't thread safe, so the workers
+        # have to be fully stopped before the main loop touches them
+        for camera in self.cameras:
+            if threaded:
+                if camera.worker is None:
+                    camera.worker = VisionWorker(
+                        camera.camera,
+                        camera.estimate_result,
+                        self.queue,
+                        self.poll_period,
+                    )
+                camera.worker.start()
+            elif camera.worker is not None:
+                camera.worker.stop()
+                # its last frame would show up as new if it's started again
+                camera.worker.take_latest()
+
+        if threaded != self.threaded:
+            # anything still queued is from before the switch, and would get
+            # fused after (and out of order with) what the new mode estimates
+            self.queue.clear()
+            self.estimates = []
+        self.threaded = threaded
+
+    def update(self) -> None:
+        """
+        read every unread frame from the cameras and estimate a pose from each one.
+        """
+        if self.threaded:
+            self._collect_from_workers()
+            return
+
+        estimates: list[PhotonPoseEstimation] = []
+        for camera in self.cameras:
+            for result in camera.read():
+                if estimation := camera.estimate_result(result):
+                    estimates.append(estimation)
+        self._set_estimates(estimates)
+
+    def _collect_from_workers(self) -> None:
+        for camera in self.cameras:
+            latest = camera.worker.take_latest()  # type: ignore[union-attr]
+            camera.results = [latest] if latest is not None else []
+
+        estimates: list[PhotonPoseEstimation] = []
+        queue = self.queue
+        # the workers only ever append, so this can't empty out from under us
+        while queue:
+            estimates.append(queue.popleft())
+        self._set_estimates(estimates)
+
+    def _set_estimates(self, estimates: list[PhotonPoseEstimation]) -> None:
+        # each camera's are in order already, but they interleave with each other
+        if len(self.cameras) > 1 and len(estimates) > 1:
+            estimates.sort(key=attrgetter("timestamp"))
+        self.estimates = estimates
+
+    def get_estimates(self) -> list[PhotonPoseEstimation]:
+        """
+        every pose estimate from this cycle, from every camera, oldest first.
+        """
+        return self.estimates
+
+    def estimate_position(self) -> Optional[PhotonPoseEstimation]:
+        """
+        the newest pose estimate from this cycle. can be `None`.
+        """
+        return self.estimates[-1] if self.estimates else None
 
     def get_latest_result(self) -> Optional[PhotonPipelineResult]:
         """
-        gets the single latest result from the photonvision pipeline. can be `None`.
+        gets the newest result from the aiming (first) camera this cycle. can be `None`.
         """
-        results = self.camera.getAllUnreadResults()
-        return results[0] if len(results) > 0 else None
+        if not self.cameras:
+            return None
+        results = self.cameras[0].results
+        return results[-1] if results else None
 
     def get_latest_targets(self) -> Optional[list[PhotonTrackedTarget]]:
         results = self.get_latest_result()
         if results:
             return results.getTargets()
+
+    def dropped(self) -> int:
+        """
+        estimates the workers had to throw away because the loop didn't collect them.
+        """
+        return sum(camera.worker.dropped for camera in self.cameras if camera.worker)
+
+    def errors(self) -> int:
+        """
+        exceptions the workers caught and carried on from.
+        """
+        return sum(camera.worker.errors for camera in self.cameras if camera.worker)
+
+    def skipped(self) -> int:
+        """
+        frames the workers replaced before the loop picked them up.
+        """
+        return sum(
+            camera.worker.latest.skipped for camera in self.cameras if camera.worker
+        )
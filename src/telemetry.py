@@ -0,0 +1,131 @@
+from typing import Any, Callable
+
+from ntcore import NetworkTableInstance
+
+from config import TelemetryConfig
+
+
+class Channel:
+    """
+    a single value sent to networktables.
+
+    the publisher is created once, so setting a value never looks up a key. a value
+    is only sent every `every` cycles, and only if it changed since it was last sent.
+
+    members
+    -------
+    `set(value)` to publish a value, call it every cycle
+    `due()` counts down the decimation, `True` on cycles where a value would be sent
+    `send(value)` to publish a value without touching the decimation
+    """
+
+    __slots__ = ("setter", "every", "countdown", "last", "essential", "enabled")
+
+    def __init__(self, setter: Callable[[Any], Any], every: int, essential: bool):
+        self.setter = setter
+        self.every = max(1, every)
+        # send on the very first call
+        self.countdown = 1
+        self.last: Any = None
+        self.essential = essential
+        self.enabled = True
+
+    def due(self) -> bool:
+        """
+        use this to skip working out a value that won't be sent this cycle.
+        """
+        if not self.enabled:
+            return False
+        self.countdown -= 1
+        if self.countdown > 0:
+            return False
+        self.countdown = self.every
+        return True
+
+    def send(self, value: Any) -> None:
+        if value == self.last:
+            return
+        self.last = value
+        self.setter(value)
+
+    def set(self, value: Any) -> None:
+        if self.due():
+            self.send(value)
+
+
+class Telemetry:
+    """
+    every value the robot reports while running, published with typed NT4 topics.
+
+    create channels once at startup and keep them around. at the competition level
+    only essential channels are sent, the rest are skipped before any work is done.
+
+    members
+    -------
+    `double(name)`, `integer(name)`, `boolean(name)` and `string(name)` to create a typed channel
+    `struct(name, type)` to create a channel for a wpilib struct type, like `Pose2d`
+    `custom(name, setter)` to rate limit anything else, like a `Field2d`
+    `set_competition(competition)` to shed nonessential channels, or bring them back
+    """
+
+    __slots__ = ("table", "channels", "competition", "scale")
+
+    def __init__(self, config: TelemetryConfig, period: float = 0.02):
+        """
+        `period` is how often (in seconds) values get set. a channel's `every` is
+        always counted in 20ms loops, and gets scaled to match.
+        """
+        self.table = NetworkTableInstance.getDefault().getTable("telemetry")
+        self.channels: dict[str, Channel] = {}
+        self.competition = config.competition
+        self.scale = 0.02 / period
+
+    def _add(
+        self, name: str, setter: Callable[[Any], Any], every: int, essential: bool
+    ) -> Channel:
+        if name in self.channels:
+            raise ValueError(f"telemetry channel {name!r} already exists")
+
+        channel = Channel(setter, round(every * self.scale), essential)
+        channel.enabled = essential or not self.competition
+        self.channels[name] = channel
+        return channel
+
+    def double(self, name: str, every: int = 1, essential: bool = False) -> Channel:
+        publisher = self.table.getDoubleTopic(name).publish()
+        return self._add(name, publisher.set, every, essential)
+
+    def integer(self, name: str, every: int = 1, essential: bool = False) -> Channel:
+        publisher = self.table.getIntegerTopic(name).publish()
+        return self._add(name, publisher.set, every, essential)
+
+    def boolean(self, name: str, every: int = 1, essential: bool = False) -> Channel:
+        publisher = self.table.getBooleanTopic(name).publish()
+        return self._add(name, publisher.set, every, essential)
+
+    def string(self, name: str, every: int = 1, essential: bool = False) -> Channel:
+        publisher = self.table.getStringTopic(name).publish()
+        return self._add(name, publisher.set, every, essential)
+
+    def struct(
+        self, name: str, struct_type: type, every: int = 1, essential: bool = False
+    ) -> Channel:
+        publisher = self.table.getStructTopic(name, struct_type).publish()
+        return self._add(name, publisher.set, every, essential)
+
+    def custom(
+        self,
+        name: str,
+        setter: Callable[[Any], Any],
+        every: int = 1,
+        essential: bool = False,
+    ) -> Channel:
+        """
+        a channel that hands its value to `setter` instead of a publisher.
+        """
+        return self._add(name, setter, every, essential)
+
+    def set_competition(self, competition: bool) -> None:
+        self.competition = competition
+        for channel in self.channels.values():
+            channel.enabled = channel.essential or not competition
@@ -0,0 +1,139 @@
+from array import array
+from math import pi
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+from struct import Struct
+from typing import Iterable
+
+from wpimath.geometry import Pose2d, Rotation2d
+
+# a trajectory file is this header, then `count` rows of `COLUMNS` float32s.
+# rows are evenly spaced `dt` seconds apart, starting at t = 0, except the last
+# one, which is at the end of the trajectory
+HEADER = Struct("<4sHHIf")
+MAGIC = b"TRAJ"
+VERSION = 1
+
+# columns of a row. everything is field relative: meters, radians, m/s and rad/s.
+# the heading is unwrapped, so it can be interpolated without caring about +-pi
+T, X, Y, HEADING, VX, VY, OMEGA = range(7)
+COLUMNS = 7
+
+SUFFIX = ".traj"
+
+
+def rotate_row(row: array, field_length: float, field_width: float) -> None:
+    """
+    turn a row 180 degrees about the center of the field, in place.
+
+    paths are written from the blue alliance wall. the field is rotationally
+    symmetric, so this is the same path from the red side.
+    """
+    row[X] = field_length - row[X]
+    row[Y] = field_width - row[Y]
+    row[HEADING] += pi
+    row[VX] = -row[VX]
+    row[VY] = -row[VY]
+
+
+def pack(dt: float, rows: Iterable[Iterable[float]]) -> bytes:
+    """
+    encode evenly spaced rows (in `COLUMNS` order) into the trajectory file format.
+    """
+    data = array("f")
+    count = 0
+    for row in rows:
+        data.extend(row)
+        count += 1
+    if len(data) != count * COLUMNS:
+        raise ValueError(f"every row needs {COLUMNS} columns")
+    return HEADER.pack(MAGIC, VERSION, COLUMNS, count, dt) + data.tobytes()
+
+
+class PackedTrajectory:
+    """
+    a trajectory made by `tools/generate_trajectories.py`, memory mapped from disk.
+
+    nothing gets parsed or copied at load, and samples are evenly spaced in time,
+    so finding the row for a time is just a division.
+
+    members
+    -------
+    `duration` how long the trajectory takes, in seconds
+    `sample_into(t, out)` to write the interpolated row at `t` seconds into `out`
+    `initial_pose()` gets where the trajectory starts
+    """
+
+    __slots__ = ("name", "file", "map", "data", "count", "dt", "duration")
+
+    def __init__(self, path: Path):
+        self.name = path.stem
+        self.file = open(path, "rb")
+        self.map = mmap(self.file.fileno(), 0, access=ACCESS_READ)
+
+        magic, version, columns, count, dt = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION or columns != COLUMNS:
+            raise ValueError(f"{path.name} isn't a version {VERSION} trajectory")
+        if count < 1:
+            raise ValueError(f"{path.name} has no samples")
+
+        self.data = memoryview(self.map)[HEADER.size :].cast("f")
+        self.count = count
+        self.dt = dt
+        # the last row can be less than `dt` after the one before it
+        self.duration = self.data[(count - 1) * COLUMNS + T]
+
+    def sample_into(self, t: float, out: array) -> None:
+        """
+        write the row at `t` seconds into `out`, interpolating between samples.
+        times past either end are clamped to it.
+        """
+        data = self.data
+        last = self.count - 1
+        if t <= 0.0:
+            index, fraction = 0, 0.0
+        elif t >= self.duration:
+            index, fraction = last, 0.0
+        else:
+            dt = self.dt
+            position = t / dt
+            index = int(position)
+            if index < last - 1:
+                fraction = position - index
+            else:
+                # the last segment ends at `duration`, which can be short of `dt`
+                index = last - 1
+                start = index * dt
+                fraction = (t - start) / (self.duration - start)
+
+        start = index * COLUMNS
+        if fraction == 0.0:
+            for column in range(COLUMNS):
+                out[column] = data[start + column]
+            return
+
+        end = start + COLUMNS
+        for column in range(COLUMNS):
+            before = data[start + column]
+            out[column] = before + (data[end + column] - before) * fraction
+
+    def initial_pose(self) -> Pose2d:
+        data = self.data
+        return Pose2d(data[X], data[Y], Rotation2d(data[HEADING]))
+
+    def close(self) -> None:
+        self.data.release()
+        self.map.close()
+        self.file.close()
+
+
+def load_trajectories(directory: Path) -> dict[str, PackedTrajectory]:
+    """
+    map every trajectory file in `directory`, keyed by name.
+    """
+    if not directory.is_dir():
+        return {}
+    return {
+        path.stem: PackedTrajectory(path)
+        for path in sorted(directory.glob(f"*{SUFFIX}"))
+    }
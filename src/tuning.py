@@ -0,0 +1,97 @@
+from typing import Callable
+
+from ntcore import (
+    DoubleEntry,
+    EventFlags,
+    NetworkTableInstance,
+    NetworkTableListenerPoller,
+)
+
+from config import PIDConfig, TuningConfig
+
+
+class TunedController:
+    """
+    the networktables entries for one controller's gains.
+    """
+
+    __slots__ = ("entries", "apply")
+
+    def __init__(
+        self,
+        entries: tuple[DoubleEntry, DoubleEntry, DoubleEntry],
+        apply: Callable[[float, float, float], None],
+    ):
+        self.entries = entries
+        self.apply = apply
+
+    def push(self) -> None:
+        kP, kI, kD = (entry.get() for entry in self.entries)
+        self.apply(kP, kI, kD)
+
+
+class PIDTuner:
+    """
+    lets pid gains be changed from networktables while the robot runs.
+
+    every controller's gains show up under `tuning/<name>/` as kP, kI and kD. editing
+    one (from a dashboard) pushes all three straight to the controller, no redeploy
+    needed. nothing is saved, put the final numbers into `config.toml`.
+
+    only runs when `[tuning] enabled` is set. otherwise nothing gets published and
+    `update()` returns immediately.
+
+    members
+    -------
+    `add(name, gains, apply)` to expose a controller, `apply(kP, kI, kD)` sets its gains
+    `update()` to push any changed gains to their controllers, call it once per cycle
+    """
+
+    __slots__ = ("enabled", "table", "poller", "controllers")
+
+    def __init__(self, config: TuningConfig):
+        self.enabled = config.enabled
+        instance = NetworkTableInstance.getDefault()
+        self.table = instance.getTable("tuning")
+        self.poller = NetworkTableListenerPoller(instance) if self.enabled else None
+        # keyed by topic name, which is what change events carry
+        self.controllers: dict[str, TunedController] = {}
+
+    def add(
+        self,
+        name: str,
+        gains: PIDConfig,
+        apply: Callable[[float, float, float], None],
+    ) -> None:
+        if self.poller is None:
+            return
+
+        table = self.table.getSubTable(name)
+        entries = []
+        for key, value in (("kP", gains.kP), ("kI", gains.kI), ("kD", gains.kD)):
+            entry = table.getDoubleTopic(key).getEntry(value)
+            entry.set(value)
+            entries.append(entry)
+
+        controller = TunedController(tuple(entries), apply)  # type: ignore[arg-type]
+        for entry in entries:
+            self.poller.addListener(entry, EventFlags.kValueAll)
+            self.controllers[entry.getTopic().getName()] = controller
+
+    def update(self) -> None:
+        if self.poller is None:
+            return
+
+        events = self.poller.readQueue()
+        if not events:
+            return
+
+        # several gains can change at once, only push each controller once
+        changed: set[TunedController] = set()
+        for event in events:
+            if (data := event.data) is not None and (
+                controller := self.controllers.get(data.topic.getName())
+            ):
+                changed.add(controller)
+        for controller in changed:
+            controller.push()
@@ -0,0 +1,19 @@
+# shared setup for the tests.
+#
+#     pytest tests
+#
+# everything runs in wpilib simulation with the clock paused, so no robot is needed
+import sys
+from pathlib import Path
+
+import pytest
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+
+import hal.simulation  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def simulation():
+    hal.simulation.pauseTiming()
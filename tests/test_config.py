@@ -0,0 +1,67 @@
+import msgspec
+
+from config import CameraConfig, ConfigFile, _remove_at, _unknown_keys
+
+
+def validation_error(data: dict) -> msgspec.ValidationError:
+    try:
+        msgspec.convert(data, ConfigFile)
+    except msgspec.ValidationError as error:
+        return error
+    raise AssertionError("expected the data to be invalid")
+
+
+def test_unknown_keys():
+    data = {
+        "gyro_prot": 1,
+        "gyro_port": 1,
+        "logger": {"max_flies": 10},
+        "vision": {"cameras": [{"name": "front"}, {"nmae": "back"}]},
+    }
+    assert _unknown_keys(data, ConfigFile) == [
+        "$.gyro_prot",
+        "$.logger.max_flies",
+        "$.vision.cameras[1].nmae",
+    ]
+
+
+def test_unknown_keys_of_a_valid_config():
+    assert _unknown_keys({"vision": {"cameras": [{"name": "front"}]}}, ConfigFile) == []
+
+
+def test_remove_a_bad_value():
+    data = {"gyro_port": "one", "history_size": 50}
+    assert _remove_at(data, validation_error(data))
+    assert data == {"history_size": 50}
+
+
+def test_remove_a_bad_nested_value():
+    data = {"logger": {"batch_size": 0, "max_files": 10}}
+    assert _remove_at(data, validation_error(data))
+    assert data == {"logger": {"max_files": 10}}
+
+
+def test_remove_inside_an_array():
+    data = {"vision": {"cameras": [{"name": "front"}, {"name": 3, "x": 0.1}]}}
+    assert _remove_at(data, validation_error(data))
+    assert data == {"vision": {"cameras": [{"name": "front"}, {"x": 0.1}]}}
+    # what's left decodes, with the default filled back in
+    decoded = msgspec.convert(data, ConfigFile)
+    assert decoded.vision.cameras[1] == CameraConfig(name="main", x=0.1)
+
+
+def test_remove_a_whole_array_item():
+    data = {"vision": {"cameras": [{"name": "front"}, "back"]}}
+    assert _remove_at(data, validation_error(data))
+    assert data == {"vision": {"cameras": [{"name": "front"}]}}
+
+
+def test_remove_nothing():
+    data = {"gyro_port": 1}
+    assert not _remove_at(
+        data, msgspec.ValidationError("Object missing required field")
+    )
+    assert not _remove_at(
+        data, msgspec.ValidationError("bad - at `$.logger.max_files`")
+    )
+    assert data == {"gyro_port": 1}
@@ -0,0 +1,65 @@
+from array import array
+from math import pi
+
+import pytest
+
+from src.history import TimeHistory
+
+
+def test_empty():
+    history = TimeHistory(4, 2)
+    out = array("d", (7.0, 7.0))
+    assert history.sample(1.0) is None
+    assert not history.sample_into(1.0, out)
+    assert list(out) == [7.0, 7.0]
+    assert history.oldest_timestamp() is None
+
+
+def test_interpolates_between_samples():
+    history = TimeHistory(4, 2)
+    history.record(1.0, 0.0, 10.0)
+    history.record(2.0, 4.0, 20.0)
+    assert history.sample(1.25, 0) == pytest.approx(1.0)
+    assert history.sample(1.5, 1) == pytest.approx(15.0)
+    # exactly on a sample
+    assert history.sample(2.0, 0) == 4.0
+
+
+def test_clamps_outside_the_range():
+    history = TimeHistory(4, 1)
+    history.record(1.0, 3.0)
+    history.record(2.0, 5.0)
+    assert history.sample(0.0) == 3.0
+    assert history.sample(9.0) == 5.0
+
+
+def test_ignores_out_of_order_samples():
+    history = TimeHistory(4, 1)
+    history.record(2.0, 1.0)
+    history.record(1.0, 9.0)
+    history.record(2.0, 9.0)
+    assert len(history) == 1
+    assert history.sample(2.0) == 1.0
+
+
+def test_overwrites_the_oldest_when_full():
+    history = TimeHistory(3, 1)
+    for step in range(5):
+        history.record(float(step), float(step * 10))
+    assert len(history) == 3
+    assert history.oldest_timestamp() == 2.0
+    assert history.newest_timestamp() == 4.0
+    # still searches correctly across the wrap
+    assert history.sample(3.5) == pytest.approx(35.0)
+    assert history.sample(0.0) == 20.0
+
+
+def test_angles_go_the_short_way_around():
+    history = TimeHistory(4, 2, angular=(1,))
+    history.record(0.0, 3.0, 3.0)
+    history.record(1.0, -3.0, -3.0)
+    out = array("d", (0.0, 0.0))
+    assert history.sample_into(0.5, out)
+    assert out[0] == pytest.approx(0.0)
+    # halfway between 3 and -3 rad across +-pi, not through 0
+    assert abs(out[1]) == pytest.approx(pi)
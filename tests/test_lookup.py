@@ -0,0 +1,30 @@
+import pytest
+
+from src.lookup import InterpolatingTable
+
+
+def test_needs_a_point():
+    with pytest.raises(ValueError):
+        InterpolatingTable([])
+
+
+def test_interpolates_unsorted_points():
+    table = InterpolatingTable([(3.0, 30.0), (1.0, 10.0), (2.0, 40.0)])
+    assert len(table) == 3
+    assert table.get(1.5) == pytest.approx(25.0)
+    assert table.get(2.5) == pytest.approx(35.0)
+    assert table.get(2.0) == 40.0
+
+
+def test_clamps_outside_the_table():
+    table = InterpolatingTable([(1.0, 10.0), (2.0, 20.0)])
+    assert table.get(-5.0) == 10.0
+    assert table.get(5.0) == 20.0
+    assert table.get(2.0) == 20.0
+
+
+def test_single_point():
+    table = InterpolatingTable([(1.0, 10.0)])
+    assert table.get(0.0) == 10.0
+    assert table.get(1.0) == 10.0
+    assert table.get(2.0) == 10.0
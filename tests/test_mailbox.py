@@ -0,0 +1,48 @@
+from threading import Thread
+
+from src.mailbox import Mailbox
+
+
+def test_empty():
+    mailbox: Mailbox[int] = Mailbox()
+    assert mailbox.take() is None
+    assert mailbox.skipped == 0
+
+
+def test_each_value_is_taken_once():
+    mailbox: Mailbox[str] = Mailbox()
+    mailbox.post("a")
+    assert mailbox.take() == "a"
+    assert mailbox.take() is None
+    mailbox.post("b")
+    assert mailbox.take() == "b"
+    assert mailbox.skipped == 0
+
+
+def test_only_the_newest_value_is_kept():
+    mailbox: Mailbox[int] = Mailbox()
+    for value in range(5):
+        mailbox.post(value)
+    assert mailbox.take() == 4
+    assert mailbox.skipped == 4
+
+
+def test_across_threads():
+    mailbox: Mailbox[int] = Mailbox()
+    posts = 10_000
+
+    def write():
+        for value in range(1, posts + 1):
+            mailbox.post(value)
+
+    writer = Thread(target=write)
+    writer.start()
+    taken = []
+    while writer.is_alive() or not taken or taken[-1] != posts:
+        if (value := mailbox.take()) is not None:
+            taken.append(value)
+    writer.join()
+
+    # never repeated or out of order, and everything is accounted for
+    assert taken == sorted(set(taken))
+    assert len(taken) + mailbox.skipped == posts
@@ -0,0 +1,68 @@
+from math import atan2, degrees
+
+import pytest
+
+from config import MovingShotConfig
+from src.moving_shot import MovingShot, generate, is_current
+
+# a constant time of flight makes every cell easy to check by hand
+FLIGHT = 1.0
+CONFIG = MovingShotConfig(
+    min_distance=1.0,
+    max_distance=5.0,
+    distance_step=1.0,
+    max_speed=2.0,
+    speed_step=1.0,
+    time_of_flight=[(0.0, FLIGHT), (10.0, FLIGHT)],
+)
+RPM_POINTS = [(0.0, 1000.0), (10.0, 6000.0)]
+
+
+@pytest.fixture(scope="module")
+def shot() -> MovingShot:
+    return MovingShot(generate(CONFIG, RPM_POINTS))
+
+
+def test_standing_still(shot):
+    shot.solve(3.0, 0.0, 0.0)
+    assert shot.lead == pytest.approx(0.0)
+    assert shot.rpm == pytest.approx(2500.0)
+
+
+def test_moving_towards_the_hub(shot):
+    # the ball carries 1m further, so it's shot like from 2m
+    shot.solve(3.0, 1.0, 0.0)
+    assert shot.lead == pytest.approx(0.0, abs=1e-5)
+    assert shot.rpm == pytest.approx(2000.0)
+
+
+def test_moving_across_the_hub(shot):
+    # moving left, so aim right of the hub
+    shot.solve(3.0, 0.0, 1.0)
+    assert shot.lead == pytest.approx(degrees(atan2(-1.0, 3.0)), abs=1e-4)
+    assert shot.rpm == pytest.approx(1000.0 + 500.0 * (10.0**0.5), rel=1e-5)
+
+
+def test_interpolates_between_cells(shot):
+    shot.solve(2.0, 0.0, 0.0)
+    low = shot.rpm
+    shot.solve(3.0, 0.0, 0.0)
+    high = shot.rpm
+    shot.solve(2.25, 0.0, 0.0)
+    assert shot.rpm == pytest.approx(low + (high - low) * 0.25)
+
+
+def test_clamps_outside_the_grid(shot):
+    shot.solve(5.0, 2.0, -2.0)
+    edge = (shot.lead, shot.rpm)
+    shot.solve(50.0, 9.0, -9.0)
+    assert (shot.lead, shot.rpm) == pytest.approx(edge)
+
+
+def test_stale_grids_are_spotted():
+    data = generate(CONFIG, RPM_POINTS)
+    assert is_current(data, CONFIG, RPM_POINTS)
+    assert not is_current(data, CONFIG, [(0.0, 1000.0), (10.0, 7000.0)])
+    assert not is_current(b"", CONFIG, RPM_POINTS)
+    with pytest.raises(ValueError):
+        MovingShot(data[:-4])
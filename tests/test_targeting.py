@@ -0,0 +1,166 @@
+from math import atan2, degrees
+
+import pytest
+from hal import AllianceStationID
+from photonlibpy.targeting import PhotonTrackedTarget
+from robotpy_apriltag import AprilTagField, AprilTagFieldLayout
+from wpilib import DriverStation, Timer
+from wpilib.simulation import DriverStationSim
+from wpimath.geometry import Pose2d, Rotation2d
+
+from src.subsystems.targeting import (
+    HubAimer,
+    TargetSelector,
+    tag_centroid,
+    wrap_degrees,
+)
+
+RED_TAG = 10
+OTHER_RED_TAG = 5
+BLUE_TAG = 26
+NOT_A_HUB_TAG = 14
+
+LAYOUT = AprilTagFieldLayout.loadField(AprilTagField.kDefaultField)
+
+
+def target(tag_id: int, yaw: float, pitch: float = 0.0) -> PhotonTrackedTarget:
+    return PhotonTrackedTarget(yaw=yaw, pitch=pitch, fiducialId=tag_id)
+
+
+def set_alliance(station: AllianceStationID) -> None:
+    DriverStationSim.setAllianceStationId(station)
+    DriverStationSim.notifyNewData()
+
+
+@pytest.fixture
+def red():
+    set_alliance(AllianceStationID.kRed1)
+    yield
+    set_alliance(AllianceStationID.kUnknown)
+
+
+def test_picks_the_target_closest_to_the_center(red):
+    selector = TargetSelector(0.7)
+    best = target(RED_TAG, 3.0, 4.0)
+    assert selector.select([target(OTHER_RED_TAG, 10.0), best]) is best
+
+
+def test_only_our_hub_counts(red):
+    selector = TargetSelector(0.7)
+    assert selector.select([target(BLUE_TAG, 0.0), target(NOT_A_HUB_TAG, 0.0)]) is None
+    ours = target(RED_TAG, 20.0)
+    assert selector.select([target(BLUE_TAG, 0.0), ours]) is ours
+    # and not the -1 of a non-fiducial target
+    assert selector.select([target(-1, 0.0)]) is None
+
+
+def test_both_hubs_count_without_an_alliance():
+    set_alliance(AllianceStationID.kUnknown)
+    selector = TargetSelector(0.7)
+    blue = target(BLUE_TAG, 1.0)
+    assert selector.select([target(RED_TAG, 5.0), blue]) is blue
+
+
+def test_keeps_the_current_target_unless_another_is_clearly_better(red):
+    selector = TargetSelector(0.7)
+    first = target(RED_TAG, 10.0)
+    assert selector.select([first]) is first
+
+    # a bit closer isn't enough to switch
+    current = target(RED_TAG, 10.0)
+    assert selector.select([current, target(OTHER_RED_TAG, 8.0)]) is current
+
+    # but less than 0.7 of the distance is
+    better = target(OTHER_RED_TAG, 6.0)
+    assert selector.select([target(RED_TAG, 10.0), better]) is better
+    # which then becomes the one kept
+    kept = target(OTHER_RED_TAG, 9.0)
+    assert selector.select([target(RED_TAG, 8.0), kept]) is kept
+
+
+def test_losing_the_current_target(red):
+    selector = TargetSelector(0.7)
+    selector.select([target(RED_TAG, 1.0)])
+    other = target(OTHER_RED_TAG, 15.0)
+    assert selector.select([other]) is other
+    assert selector.select([]) is None
+
+
+def test_alliance_changes(red):
+    selector = TargetSelector(0.7)
+    assert not selector.update_alliance()
+    selector.select([target(RED_TAG, 1.0)])
+
+    set_alliance(AllianceStationID.kBlue2)
+    assert selector.update_alliance()
+    assert selector.select([target(RED_TAG, 1.0)]) is None
+    blue = target(BLUE_TAG, 1.0)
+    assert selector.select([blue]) is blue
+
+
+def red_aimer() -> HubAimer:
+    aimer = HubAimer(LAYOUT, -180.0, 180.0, 0.5)
+    aimer.set_alliance(DriverStation.Alliance.kRed)
+    return aimer
+
+
+def seen_from(pose: Pose2d, turret_angle: float, tag_id: int) -> PhotonTrackedTarget:
+    """
+    the tag as a camera on the turret would report it from `pose`.
+    photonvision's yaw is positive to the right
+    """
+    tag = LAYOUT.getTagPose(tag_id).toPose2d()
+    bearing = degrees(atan2(tag.Y() - pose.Y(), tag.X() - pose.X()))
+    relative = bearing - pose.rotation().degrees() - turret_angle
+    return target(tag_id, -wrap_degrees(relative))
+
+
+def test_a_tag_corrects_the_aim_onto_the_hub():
+    aimer = red_aimer()
+    actual = Pose2d(9.0, 3.0, Rotation2d.fromDegrees(20.0))
+    # odometry's heading has drifted 6 degrees
+    believed = Pose2d(9.0, 3.0, Rotation2d.fromDegrees(26.0))
+    on_target = aimer.hub_angle(actual)
+    turret_angle = aimer.turret_angle(believed)
+    assert turret_angle == pytest.approx(on_target - 6.0)
+
+    now = Timer.getFPGATimestamp()
+    aimer.observe(seen_from(actual, turret_angle, RED_TAG), believed, turret_angle, now)
+    assert aimer.turret_angle(believed) == pytest.approx(on_target)
+
+
+def test_the_correction_is_the_same_from_any_hub_tag():
+    aimer = red_aimer()
+    actual = Pose2d(10.0, 5.5, Rotation2d.fromDegrees(-30.0))
+    believed = Pose2d(10.0, 5.5, Rotation2d.fromDegrees(-33.0))
+    on_target = aimer.hub_angle(actual)
+    now = Timer.getFPGATimestamp()
+    for tag_id in (RED_TAG, OTHER_RED_TAG, 2):
+        aimer.observe(seen_from(actual, 15.0, tag_id), believed, 15.0, now)
+        assert aimer.turret_angle(believed) == pytest.approx(on_target)
+
+
+def test_old_corrections_are_dropped():
+    aimer = red_aimer()
+    actual = Pose2d(9.0, 3.0, Rotation2d.fromDegrees(20.0))
+    believed = Pose2d(9.0, 3.0, Rotation2d.fromDegrees(26.0))
+    stale = Timer.getFPGATimestamp() - 1.0
+    aimer.observe(seen_from(actual, 0.0, RED_TAG), believed, 0.0, stale)
+    assert aimer.turret_angle(believed) == pytest.approx(aimer.hub_angle(believed))
+
+
+def test_tags_away_from_the_hubs_are_ignored():
+    aimer = red_aimer()
+    pose = Pose2d(9.0, 3.0, Rotation2d())
+    aimer.observe(target(NOT_A_HUB_TAG, 12.0), pose, 0.0, Timer.getFPGATimestamp())
+    assert aimer.turret_angle(pose) == pytest.approx(aimer.hub_angle(pose))
+
+
+def test_hub_centroid():
+    x, y = tag_centroid(LAYOUT, (9, 10))
+    assert (x, y) == pytest.approx((12.519, (3.679 + 4.035) / 2), abs=1e-3)
+
+
+def test_hub_centroid_without_its_tags():
+    with pytest.raises(ValueError, match=r"\[40, 41\]"):
+        tag_centroid(LAYOUT, (40, 41))
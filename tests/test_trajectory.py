@@ -0,0 +1,109 @@
+from array import array
+from math import pi
+from pathlib import Path
+
+import pytest
+
+from src.trajectory import (
+    COLUMNS,
+    HEADING,
+    OMEGA,
+    T,
+    VX,
+    VY,
+    X,
+    Y,
+    PackedTrajectory,
+    pack,
+    rotate_row,
+)
+
+
+def row(t: float, x: float) -> tuple[float, ...]:
+    return (t, x, 1.0, 0.5 * x, 2.0, 0.0, 0.0)
+
+
+def load(tmp_path: Path, dt: float, rows: list[tuple[float, ...]]) -> PackedTrajectory:
+    path = tmp_path / "test.traj"
+    path.write_bytes(pack(dt, rows))
+    return PackedTrajectory(path)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "bad.traj"
+    path.write_bytes(b"NOPE" + bytes(16))
+    with pytest.raises(ValueError):
+        PackedTrajectory(path)
+    with pytest.raises(ValueError):
+        pack(0.02, [(1.0, 2.0)])
+
+
+def test_samples_rows_and_between_them(tmp_path):
+    trajectory = load(tmp_path, 0.5, [row(0.5 * i, float(i)) for i in range(5)])
+    assert trajectory.duration == 2.0
+    out = array("d", bytes(8 * COLUMNS))
+
+    trajectory.sample_into(1.0, out)
+    assert list(out) == list(row(1.0, 2.0))
+
+    trajectory.sample_into(0.75, out)
+    assert out[T] == pytest.approx(0.75)
+    assert out[X] == pytest.approx(1.5)
+    assert out[HEADING] == pytest.approx(0.75)
+    assert out[Y] == 1.0
+    assert out[VX] == 2.0
+    trajectory.close()
+
+
+def test_clamps_to_either_end(tmp_path):
+    trajectory = load(tmp_path, 0.5, [row(0.5 * i, float(i)) for i in range(5)])
+    out = array("d", bytes(8 * COLUMNS))
+
+    trajectory.sample_into(-1.0, out)
+    assert out[X] == 0.0
+    trajectory.sample_into(trajectory.duration, out)
+    assert out[X] == 4.0
+    trajectory.sample_into(10.0, out)
+    assert out[X] == 4.0
+
+    pose = trajectory.initial_pose()
+    assert (pose.X(), pose.Y(), pose.rotation().radians()) == (0.0, 1.0, 0.0)
+    trajectory.close()
+
+
+def test_single_row(tmp_path):
+    trajectory = load(tmp_path, 0.5, [row(0.0, 3.0)])
+    out = array("d", bytes(8 * COLUMNS))
+    trajectory.sample_into(0.2, out)
+    assert out[X] == 3.0
+    trajectory.close()
+
+
+def test_shorter_last_segment(tmp_path):
+    # like the generator writes them: the last row is at the real end, 0.1s after
+    # the one before it instead of a whole `dt`
+    rows = [row(0.0, 0.0), row(0.5, 1.0), row(1.0, 2.0), row(1.1, 3.0)]
+    trajectory = load(tmp_path, 0.5, rows)
+    assert trajectory.duration == pytest.approx(1.1)
+    out = array("d", bytes(8 * COLUMNS))
+
+    trajectory.sample_into(1.05, out)
+    assert out[T] == pytest.approx(1.05)
+    assert out[X] == pytest.approx(2.5)
+    # the final row gets commanded at the end, not only after `dt` more
+    trajectory.sample_into(trajectory.duration, out)
+    assert out[X] == 3.0
+    trajectory.sample_into(0.75, out)
+    assert out[X] == pytest.approx(1.5)
+    trajectory.close()
+
+
+def test_rotate_to_the_red_side():
+    sample = array("d", (1.0, 2.0, 3.0, 0.5, 1.5, -0.5, 0.25))
+    rotate_row(sample, 16.0, 8.0)
+    assert sample[T] == 1.0
+    assert (sample[X], sample[Y]) == (14.0, 5.0)
+    assert sample[HEADING] == pytest.approx(0.5 + pi)
+    assert (sample[VX], sample[VY]) == (-1.5, 0.5)
+    # turning the same way, seen from above
+    assert sample[OMEGA] == 0.25
@@ -0,0 +1,77 @@
+# measure how long the robot takes to boot, with and without pint.
+#
+#     python tools/benchmark_startup.py            # time `import constants`
+#     python tools/benchmark_startup.py --robot    # time import through `robotInit()`
+#
+# every run happens in a fresh interpreter so nothing is cached between them.
+# "units" is the old behaviour (pint evaluated at import), "compiled" loads
+# `constants_generated.py`.
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from statistics import median
+
+root = Path(__file__).resolve().parent.parent
+
+CHILD = """\
+import json
+import sys
+import time
+
+start = time.perf_counter()
+import constants
+
+timings = {"constants": time.perf_counter() - start}
+
+if %(robot)r:
+    import robot
+
+    timings["import"] = time.perf_counter() - start
+    instance = robot.Robot()
+    instance.robotInit()
+    timings["robotInit"] = time.perf_counter() - start
+
+timings["pint_loaded"] = "pint" in sys.modules
+print(json.dumps(timings))
+"""
+
+
+def run_once(mode: str, robot: bool) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD % {"robot": robot}],
+        cwd=root,
+        env={**os.environ, "CONSTANTS_MODE": mode},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # the robot prints plenty on its own, the timings are always the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    robot = "--robot" in sys.argv
+    runs = int(sys.argv[sys.argv.index("--runs") + 1]) if "--runs" in sys.argv else 5
+
+    results: dict[str, dict[str, list[float]]] = {}
+    for mode in ("units", "compiled"):
+        samples: dict[str, list[float]] = {}
+        for _ in range(runs):
+            timings = run_once(mode, robot)
+            if timings.pop("pint_loaded") and mode == "compiled":
+                print("warning: pint was loaded in compiled mode")
+            for stage, seconds in timings.items():
+                samples.setdefault(stage, []).append(seconds)
+        results[mode] = samples
+
+    print(f"{'stage':<12}{'units (ms)':>14}{'compiled (ms)':>16}{'saved (ms)':>14}")
+    for stage in results["units"]:
+        before = median(results["units"][stage]) * 1000
+        after = median(results["compiled"][stage]) * 1000
+        print(f"{stage:<12}{before:>14.1f}{after:>16.1f}{before - after:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# compile `unit_constants.py` into `constants_generated.py`.
+#
+# run this on your laptop (not the robot) after changing any mechanical
+# constant, and commit the result:
+#
+#     python tools/compile_constants.py
+#
+# pass `--check` to fail instead of writing when the generated file is stale.
+import sys
+from hashlib import sha256
+from pathlib import Path
+from pprint import pformat
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+
+from unit_constants import evaluate  # noqa: E402
+
+source_path = root.joinpath("unit_constants.py")
+output_path = root.joinpath("constants_generated.py")
+
+TEMPLATE = """\
+# generated by tools/compile_constants.py from unit_constants.py. do not edit.
+# values are plain floats in the units listed in `unit_constants.EXPORTS`.
+
+SOURCE_HASH = {source_hash!r}
+
+VALUES = {values}
+"""
+
+
+def render() -> str:
+    return TEMPLATE.format(
+        # must match `constants.source_hash()`
+        source_hash=sha256(source_path.read_bytes()).hexdigest(),
+        values=pformat(evaluate(), sort_dicts=False),
+    )
+
+
+def main() -> int:
+    rendered = render()
+
+    if "--check" in sys.argv:
+        current = output_path.read_text() if output_path.exists() else ""
+        if current != rendered:
+            print(f"{output_path.name} is out of date")
+            return 1
+        print(f"{output_path.name} is up to date")
+        return 0
+
+    output_path.write_text(rendered)
+    print(f"wrote {output_path.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
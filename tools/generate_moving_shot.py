@@ -0,0 +1,39 @@
+# solve the shoot-on-the-move grid from the [moving_shot] and [shooter] tables in
+# `config.toml`, and write it to `moving_shot.grid`.
+#
+# the robot can solve it at boot if the file is stale, but that needs numpy and
+# slows down startup. run this on your laptop after changing either table, and
+# commit the result:
+#
+#     python tools/generate_moving_shot.py
+#
+# pass `--check` to fail instead of writing when the grid is stale.
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+
+from config import config  # noqa: E402
+from src.moving_shot import generate, is_current  # noqa: E402
+
+output_path = root.joinpath("moving_shot.grid")
+
+
+def main() -> int:
+    if "--check" in sys.argv:
+        current = output_path.read_bytes() if output_path.exists() else b""
+        if not is_current(current, config.moving_shot, config.shooter.table):
+            print(f"out of date: {output_path.name}")
+            return 1
+        print("moving shot grid is up to date")
+        return 0
+
+    packed = generate(config.moving_shot, config.shooter.table)
+    output_path.write_bytes(packed)
+    print(f"wrote {output_path.name} ({len(packed)} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# generate the packed autonomous trajectories from `trajectories/routines.toml`.
+#
+# generating is far too slow to do on the roborio at autonomous init, so run
+# this on your laptop after changing a routine, and commit the result:
+#
+#     python tools/generate_trajectories.py
+#
+# pass `--check` to fail instead of writing when any generated file is stale.
+import sys
+import tomllib
+from math import ceil, cos, radians, sin
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+
+from wpimath.geometry import Pose2d, Rotation2d  # noqa: E402
+from wpimath.trajectory import TrajectoryConfig, TrajectoryGenerator  # noqa: E402
+
+from constants import Chassis  # noqa: E402
+from src.trajectory import SUFFIX, pack  # noqa: E402
+
+directory = root.joinpath("trajectories")
+source_path = directory.joinpath("routines.toml")
+
+# one row per loop cycle
+DT = 0.02
+
+
+def generate(routine: dict) -> bytes:
+    config = TrajectoryConfig(routine["max_velocity"], routine["max_acceleration"])
+    config.setKinematics(Chassis.KINEMATICS)
+
+    waypoints = [
+        Pose2d(x, y, Rotation2d.fromDegrees(direction))
+        for x, y, direction in routine["waypoints"]
+    ]
+    trajectory = TrajectoryGenerator.generateTrajectory(waypoints, config)
+    duration = trajectory.totalTime()
+
+    start_heading = radians(routine.get("start_heading", 0.0))
+    turn = radians(routine.get("end_heading", 0.0)) - start_heading
+    omega = turn / duration if duration > 0 else 0.0
+
+    # the last row lands exactly on the end, even if that's less than DT after the one before
+    count = ceil(duration / DT) + 1
+    rows = []
+    for index in range(count):
+        t = min(index * DT, duration)
+        state = trajectory.sample(t)
+        pose = state.pose
+        # the generator's rotation is the direction of travel, not where the robot faces
+        direction = pose.rotation().radians()
+        velocity = state.velocity
+        rows.append(
+            (
+                t,
+                pose.X(),
+                pose.Y(),
+                start_heading + omega * t,
+                velocity * cos(direction),
+                velocity * sin(direction),
+                omega,
+            )
+        )
+    return pack(DT, rows)
+
+
+def main() -> int:
+    with open(source_path, "rb") as source:
+        routines = tomllib.load(source)
+
+    stale = []
+    for name, routine in routines.items():
+        output_path = directory.joinpath(name + SUFFIX)
+        packed = generate(routine)
+
+        if "--check" in sys.argv:
+            current = output_path.read_bytes() if output_path.exists() else b""
+            if current != packed:
+                stale.append(output_path.name)
+            continue
+
+        output_path.write_bytes(packed)
+        print(f"wrote {output_path.name} ({len(packed)} bytes)")
+
+    # anything left over belongs to a routine that no longer exists
+    leftover = sorted(
+        path.name for path in directory.glob(f"*{SUFFIX}") if path.stem not in routines
+    )
+
+    if "--check" in sys.argv:
+        if stale or leftover:
+            print(f"out of date: {', '.join(stale + leftover)}")
+            return 1
+        print("trajectories are up to date")
+        return 0
+
+    for name in leftover:
+        directory.joinpath(name).unlink()
+        print(f"removed {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
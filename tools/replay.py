@@ -0,0 +1,212 @@
+# replay a match log through the robot code in simulation, as fast as the cpu allows.
+#
+#     python tools/replay.py logs/cycles-*.msgpack                  # outputs to stdout
+#     python tools/replay.py logs/cycles-*.msgpack --out run.jsonl  # outputs to a file
+#     python tools/replay.py logs/cycles-*.msgpack --limit 500      # only the first 500 cycles
+#
+# every logged cycle's driver station state, controller, sensor snapshot and
+# camera frames are fed back into `Robot`. the sim clock is stepped straight to
+# each logged timestamp instead of waiting out the period.
+#
+# one line of json is written per cycle (the pose and every commanded output),
+# so running two versions of the code over the same log and diffing the outputs
+# shows exactly what changed. throughput goes to stderr at the end.
+import sys
+from contextlib import redirect_stdout
+from pathlib import Path
+from time import perf_counter
+from typing import BinaryIO
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+
+import hal  # noqa: E402
+import hal.simulation  # noqa: E402
+import msgspec  # noqa: E402
+from photonlibpy.packet import Packet  # noqa: E402
+from photonlibpy.targeting import PhotonPipelineResult  # noqa: E402
+from wpilib import Timer  # noqa: E402
+from wpilib.simulation import DriverStationSim  # noqa: E402
+
+from src.cycle_log import (  # noqa: E402
+    CycleRecord,
+    DriverStationFrame,
+    OutputFrame,
+    output_frame,
+    read_log,
+)
+
+# the most buttons the driver station reports for a single controller
+MAX_BUTTONS = 32
+
+
+class ReplayOutput(msgspec.Struct):
+    cycle: int
+    timestamp: float
+    x: float
+    y: float
+    heading: float  # radians
+    outputs: OutputFrame
+
+
+def alliance_station(frame: DriverStationFrame) -> hal.AllianceStationID:
+    if frame.alliance < 0 or not frame.location:
+        return hal.AllianceStationID.kUnknown
+    # red 1-3 come first, then blue 1-3
+    return hal.AllianceStationID(1 + frame.alliance * 3 + frame.location - 1)
+
+
+def apply_driver_station(record: CycleRecord, port: int) -> None:
+    driver_station = record.driver_station
+    DriverStationSim.setEnabled(driver_station.enabled)
+    DriverStationSim.setAutonomous(driver_station.autonomous)
+    DriverStationSim.setAllianceStationId(alliance_station(driver_station))
+
+    controller = record.controller
+    DriverStationSim.setJoystickAxisCount(port, len(controller.axes))
+    for axis, value in enumerate(controller.axes):
+        DriverStationSim.setJoystickAxis(port, axis, value)
+    DriverStationSim.setJoystickButtonCount(port, MAX_BUTTONS)
+    DriverStationSim.setJoystickButtons(port, controller.buttons)
+    DriverStationSim.setJoystickPOVCount(port, 1)
+    DriverStationSim.setJoystickPOV(port, 0, controller.pov)
+    DriverStationSim.notifyNewData()
+
+
+def decode_frames(
+    record: CycleRecord, frames: list[list[PhotonPipelineResult]]
+) -> None:
+    """
+    refill each camera's list in `frames` with what it saw this cycle.
+    """
+    for camera_frames in frames:
+        camera_frames.clear()
+    for frame in record.vision:
+        # a camera that's no longer configured
+        if frame.packet is None or frame.camera >= len(frames):
+            continue
+        result = PhotonPipelineResult.photonStruct.unpack(Packet(frame.packet))
+        result.ntReceiveTimestampMicros = frame.received_us
+        frames[frame.camera].append(result)
+
+
+def replay(paths: list[str], out: BinaryIO, limit: int | None) -> None:
+    # must happen before the robot exists, nothing should see real time
+    hal.simulation.pauseTiming()
+
+    import robot
+
+    # the other rate slots only run from the real notifier, not `_loopFunc()`
+    instance = robot.Robot(multi_rate=False)
+    instance.robotInit()
+    core = instance.core
+    # replaying shouldn't write a log of its own
+    instance.logger.enabled = False
+
+    # the snapshot gets filled from the log, so the robot mustn't read devices
+    instance.sensors_update = lambda: None
+    sensors = core.sensors
+    turret = core.turret
+
+    # each camera hands back whatever frames the log has from it for this cycle
+    core.vision.set_threaded(False)
+    frames: list[list[PhotonPipelineResult]] = []
+    for camera in core.vision.cameras:
+        camera_frames: list[PhotonPipelineResult] = []
+        frames.append(camera_frames)
+        camera.camera.getAllUnreadResults = lambda camera_frames=camera_frames: list(
+            camera_frames
+        )
+
+    port = core.driver.port
+    encoder = msgspec.json.Encoder()
+    first_timestamp = last_timestamp = None
+    cycles = 0
+
+    start = perf_counter()
+    for path in paths:
+        with open(path, "rb") as file:
+            for record in read_log(file):
+                if limit is not None and cycles >= limit:
+                    break
+
+                # jump the clock straight to when this cycle ran
+                step = round((record.timestamp - Timer.getFPGATimestamp()) * 1e6)
+                if step > 0:
+                    hal.simulation.stepTimingAsync(step)
+
+                apply_driver_station(record, port)
+                decode_frames(record, frames)
+
+                logged = record.sensors
+                wheels = sensors.wheel_positions
+                wheels.frontLeft = logged.front_left
+                wheels.frontRight = logged.front_right
+                wheels.rearLeft = logged.rear_left
+                wheels.rearRight = logged.rear_right
+                sensors.gyro_angle = logged.gyro_angle
+                sensors.timestamp = record.timestamp
+                turret.reading.position = logged.turret_position
+
+                # the same mode handling and periodic calls the real loop makes
+                instance._loopFunc()
+
+                pose = core.pose
+                out.write(
+                    encoder.encode(
+                        ReplayOutput(
+                            record.cycle,
+                            record.timestamp,
+                            pose.X(),
+                            pose.Y(),
+                            pose.rotation().radians(),
+                            output_frame(core),
+                        )
+                    )
+                )
+                out.write(b"\n")
+
+                if first_timestamp is None:
+                    first_timestamp = record.timestamp
+                last_timestamp = record.timestamp
+                cycles += 1
+    elapsed = perf_counter() - start
+
+    if not cycles:
+        print("no cycles in the log", file=sys.stderr)
+        return
+
+    match_time = last_timestamp - first_timestamp  # type: ignore[operator]
+    print(
+        f"{cycles} cycles in {elapsed:.2f}s: {cycles / elapsed:.0f} cycles/s, "
+        f"{match_time / elapsed:.1f}x real time",
+        file=sys.stderr,
+    )
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    out_path = None
+    limit = None
+    if "--out" in args:
+        index = args.index("--out")
+        out_path = args[index + 1]
+        del args[index : index + 2]
+    if "--limit" in args:
+        index = args.index("--limit")
+        limit = int(args[index + 1])
+        del args[index : index + 2]
+
+    if not args:
+        print("usage: python tools/replay.py LOG... [--out FILE] [--limit N]")
+        sys.exit(1)
+
+    out = open(out_path, "wb") if out_path else sys.stdout.buffer
+    # the robot prints to stdout, keep that out of the outputs
+    with redirect_stdout(sys.stderr):
+        replay(args, out, limit)
+    out.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# mechanical constants, written with real units.
+#
+# this is the source of truth, but the robot never imports it directly:
+# building a pint registry takes seconds on the roborio. run
+# `python tools/compile_constants.py` after editing this file to regenerate
+# `constants_generated.py`, which `constants.py` loads as plain floats.
+from math import sqrt, pi
+
+from pint import UnitRegistry
+
+units = UnitRegistry()
+
+
+class VortexMotorConstants:
+    FREE_SPEED = 5676 * units.rpm
+    ENCODER_RESOLUTION = (
+        42 * units.counts / units.revolution
+    )  # in counts per revolution
+
+
+class TurretConstants:
+    ## motor rotations per turret rotation
+    GEAR_RATIO = 25 * units.dimensionless
+    ## how far the turret turns per motor rotation
+    DEGREES_PER_ROTATION = (
+        units.Quantity(360 * units.degree) / GEAR_RATIO
+    ) / units.revolution
+
+
+class AprilTagConstants:
+    # this is necessary to make it not angry
+    APRILTAG_WIDTH = units.Quantity(8.125 * units.inch).to(units.meter)
+
+    # TODO: add other stuff like locations
+
+
+class Chassis:
+    # body
+    LENGTH = units.Quantity(0.82 * units.meter)
+    WIDTH = units.Quantity(0.67 * units.meter)
+
+    # wheel and track
+    WHEEL_RADIUS = units.Quantity(5 * units.inch).to(units.meter)
+    WHEEL_DIAMETER = WHEEL_RADIUS * 2  # in meters
+    WHEEL_CIRCUMFERENCE = WHEEL_DIAMETER * pi
+
+    ## distance between left and right wheels, in meters
+    TRACK_WIDTH = units.Quantity(5 * units.inch).to(units.meter)
+    ## distance from front wheels to back wheels, in meters
+    WHEEL_BASE = units.Quantity(5 * units.inch).to(units.meter)
+    ## gear ratio of the drivetrain. from the kitbot datasheet
+    GEAR_RATIO = 8.450 * units.dimensionless
+
+    # derived from other things
+    LINEAR_SPEED = ((WHEEL_RADIUS * VortexMotorConstants.FREE_SPEED) / GEAR_RATIO).to(
+        units.mps
+    )  # in m/s
+    ROBOT_RADIUS = (
+        sqrt(((LENGTH.magnitude / 2) ** 2) + ((WIDTH.magnitude / 2) ** 2))
+    ) * units.meter  # in meters
+    ANGULAR_SPEED = (LINEAR_SPEED / ROBOT_RADIUS).to(units("rad/s"))  # in rad/s
+    ## distance a wheel travels per motor rotation
+    METERS_PER_ROTATION = (WHEEL_CIRCUMFERENCE / GEAR_RATIO) / units.revolution
+
+
+# the unit every constant gets stored in once the units are stripped.
+# anything listed here must convert cleanly, so a typo'd unit fails the compile
+# instead of silently shipping the wrong number
+EXPORTS: dict[type, dict[str, str]] = {
+    VortexMotorConstants: {
+        "FREE_SPEED": "rpm",
+        "ENCODER_RESOLUTION": "count / revolution",
+    },
+    TurretConstants: {
+        "GEAR_RATIO": "dimensionless",
+        "DEGREES_PER_ROTATION": "degree / revolution",
+    },
+    AprilTagConstants: {
+        "APRILTAG_WIDTH": "meter",
+    },
+    Chassis: {
+        "LENGTH": "meter",
+        "WIDTH": "meter",
+        "WHEEL_RADIUS": "meter",
+        "WHEEL_DIAMETER": "meter",
+        "WHEEL_CIRCUMFERENCE": "meter",
+        "TRACK_WIDTH": "meter",
+        "WHEEL_BASE": "meter",
+        "GEAR_RATIO": "dimensionless",
+        "LINEAR_SPEED": "meter / second",
+        "ROBOT_RADIUS": "meter",
+        "ANGULAR_SPEED": "radian / second",
+        "METERS_PER_ROTATION": "meter / revolution",
+    },
+}
+
+
+def evaluate() -> dict[str, dict[str, float]]:
+    """
+    convert every exported constant to its plain float value.
+
+    raises `pint.DimensionalityError` if a constant can't be expressed in its unit.
+    """
+    return {
+        namespace.__name__: {
+            name: float(getattr(namespace, name).to(unit).magnitude)
+            for name, unit in exported.items()
+        }
+        for namespace, exported in EXPORTS.items()
+    }